@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Minimal asyncio HTTP/1.1 client and server
+Used by the asyncio Horizons proxy and the async Horizons client so that
+neither needs a thread per pending request or any extra dependency.
+
+The client keeps a small pool of keep-alive connections per host. The
+server handles keep-alive connections and passes each request to an
+async handler coroutine.
+"""
+
+import asyncio
+import json
+import ssl
+from email.parser import BytesParser
+from email.policy import HTTP
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+class HTTPResponse:
+    """Response returned by AsyncHTTPClient.request"""
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def text(self):
+        return self.body.decode('utf-8', errors='replace')
+
+class Request:
+    """Request passed to a server handler"""
+
+    def __init__(self, method, target, headers, body, peer=None):
+        self.method = method
+        self.target = target
+        self.headers = headers
+        self.body = body
+        self.peer = peer
+
+        parts = urlsplit(target)
+        self.path = parts.path
+        self.query_string = parts.query
+        # Like Flask's dict(request.args): first value wins
+        self.args = {}
+        for key, value in parse_qsl(parts.query, keep_blank_values=True):
+            self.args.setdefault(key, value)
+
+def parse_form(content_type, body):
+    """
+    Fields of a form body (multipart/form-data or URL-encoded)
+
+    Returns:
+        Dictionary of field name -> text (first value wins)
+    """
+    if content_type.split(';', 1)[0].strip().lower() == 'application/x-www-form-urlencoded':
+        fields = {}
+        for key, value in parse_qsl(body.decode('utf-8', 'replace'), keep_blank_values=True):
+            fields.setdefault(key, value)
+        return fields
+    message = BytesParser(policy=HTTP).parsebytes(
+        b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body)
+    fields = {}
+    if message.is_multipart():
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            if name is not None:
+                fields.setdefault(name, (part.get_payload(decode=True) or b'').decode('utf-8', 'replace'))
+    return fields
+
+async def _read_headers(reader):
+    """Read header lines up to the blank line; returns a lower-cased dict"""
+    headers = {}
+    total = 0
+    while True:
+        line = await reader.readline()
+        total += len(line)
+        if total > MAX_HEADER_BYTES:
+            raise ValueError("Header section too large")
+        if not line:
+            raise asyncio.IncompleteReadError(b'', None)
+        line = line.decode('latin-1').rstrip('\r\n')
+        if not line:
+            return headers
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+async def _read_body(reader, headers, until_eof):
+    """Read a message body framed by chunked encoding or Content-Length"""
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        chunks = []
+        size = 0
+        while True:
+            line = await reader.readline()
+            chunk_size = int(line.split(b';', 1)[0].strip() or b'0', 16)
+            if chunk_size == 0:
+                # Skip trailers
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            size += chunk_size
+            if size > MAX_BODY_BYTES:
+                raise ValueError("Body too large")
+            chunks.append(await reader.readexactly(chunk_size))
+            await reader.readline()
+
+    if 'content-length' in headers:
+        length = int(headers['content-length'])
+        if length > MAX_BODY_BYTES:
+            raise ValueError("Body too large")
+        return await reader.readexactly(length)
+
+    if until_eof:
+        chunks = []
+        size = 0
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                return b''.join(chunks)
+            size += len(data)
+            if size > MAX_BODY_BYTES:
+                raise ValueError("Body too large")
+            chunks.append(data)
+    return b''
+
+class AsyncHTTPClient:
+    """
+    HTTP/1.1 client with per-host keep-alive connection reuse
+
+    Args:
+        timeout: Default timeout in seconds for a whole request
+        max_idle_per_host: Idle connections kept open per host
+    """
+
+    def __init__(self, timeout=30, max_idle_per_host=8):
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self._idle = {}
+        self._ssl = ssl.create_default_context()
+
+    async def _connect(self, scheme, host, port):
+        """Return (reader, writer, reused) for the host"""
+        idle = self._idle.get((scheme, host, port), [])
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=self._ssl if scheme == 'https' else None,
+            limit=MAX_HEADER_BYTES)
+        return reader, writer, False
+
+    def _release(self, key, reader, writer):
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.max_idle_per_host:
+            idle.append((reader, writer))
+        else:
+            writer.close()
+
+    async def request(self, method, url, params=None, body=None, headers=None, timeout=None):
+        """
+        Send one HTTP request
+
+        Args:
+            method: HTTP method ('GET', 'POST', ...)
+            url: Absolute http(s) URL
+            params: Optional dictionary of query parameters
+            body: Optional request body (bytes, str or dict for a form)
+            headers: Optional dictionary of extra request headers
+            timeout: Timeout in seconds (defaults to the client timeout)
+
+        Returns:
+            HTTPResponse
+        """
+        return await asyncio.wait_for(
+            self._request(method, url, params, body, headers or {}),
+            timeout if timeout is not None else self.timeout)
+
+    async def _request(self, method, url, params, body, headers):
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        host = parts.hostname
+        port = parts.port or (443 if scheme == 'https' else 80)
+        target = parts.path or '/'
+        query = parts.query
+        if params:
+            query = (query + '&' if query else '') + urlencode(params)
+        if query:
+            target += '?' + query
+
+        if isinstance(body, dict):
+            body = urlencode(body)
+            headers.setdefault('Content-Type', 'application/x-www-form-urlencoded')
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {parts.netloc}",
+                 "Accept-Encoding: identity", "Connection: keep-alive"]
+        for name, value in headers.items():
+            lines.append(f"{name}: {value}")
+        if body is not None:
+            lines.append(f"Content-Length: {len(body)}")
+        payload = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + (body or b'')
+
+        key = (scheme, host, port)
+        for attempt in range(2):
+            reader, writer, reused = await self._connect(scheme, host, port)
+            try:
+                writer.write(payload)
+                await writer.drain()
+
+                status_line = await reader.readline()
+                if not status_line:
+                    raise ConnectionResetError("Connection closed before response")
+                version, status = status_line.decode('latin-1').split(None, 2)[:2]
+                response_headers = await _read_headers(reader)
+                close = (response_headers.get('connection', '').lower() == 'close'
+                         or version == 'HTTP/1.0')
+                framed = ('content-length' in response_headers
+                          or 'chunked' in response_headers.get('transfer-encoding', '').lower())
+                response_body = await _read_body(reader, response_headers, until_eof=not framed)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                # A reused keep-alive connection may have been closed by the server
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+
+            if close or not framed:
+                writer.close()
+            else:
+                self._release(key, reader, writer)
+            return HTTPResponse(int(status), response_headers, response_body)
+
+    async def close(self):
+        """Close all idle connections"""
+        for idle in self._idle.values():
+            for _, writer in idle:
+                writer.close()
+        self._idle.clear()
+
+def _reason(status):
+    try:
+        return HTTPStatus(status).phrase
+    except ValueError:
+        return 'Unknown'
+
+def json_response(status, payload, headers=None):
+    """Build a (status, headers, body) tuple with a JSON body"""
+    response_headers = {'Content-Type': 'application/json'}
+    response_headers.update(headers or {})
+    return status, response_headers, json.dumps(payload).encode('utf-8')
+
+async def _handle_connection(reader, writer, handler):
+    peer = writer.get_extra_info('peername')
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line or not request_line.strip():
+                break
+            method, target, version = request_line.decode('latin-1').split()
+            headers = await _read_headers(reader)
+            body = await _read_body(reader, headers, until_eof=False)
+
+            status, response_headers, response_body = await handler(
+                Request(method, target, headers, body, peer))
+            if isinstance(response_body, str):
+                response_body = response_body.encode('utf-8')
+
+            keep_alive = (version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close') \
+                or headers.get('connection', '').lower() == 'keep-alive'
+
+            lines = [f"{version} {status} {_reason(status)}"]
+            for name, value in response_headers.items():
+                lines.append(f"{name}: {value}")
+            lines.append(f"Content-Length: {len(response_body)}")
+            lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + response_body)
+            await writer.drain()
+
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    except asyncio.CancelledError:
+        # Server shutting down; drop the connection quietly
+        pass
+    finally:
+        writer.close()
+
+async def start_server(handler, host='0.0.0.0', port=5000, backlog=4096):
+    """
+    Start an HTTP server that passes every request to handler
+
+    Args:
+        handler: Coroutine function taking a Request and returning a
+                 (status, headers, body) tuple
+        host: Interface to listen on
+        port: Port to listen on
+        backlog: Listen backlog for pending connections
+
+    Returns:
+        asyncio.Server
+    """
+    return await asyncio.start_server(
+        lambda r, w: _handle_connection(r, w, handler),
+        host, port, backlog=backlog, limit=MAX_HEADER_BYTES)
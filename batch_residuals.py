@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+Batch O-C Residual Runner
+Fetch, parse and compute residuals for a whole manifest of observations
+across a process pool
+
+The manifest is a CSV file with one observation per row:
+
+    object,observatory,epoch,ra,dec
+    1004083,G96,2025 12 19.007280,11 05 53.640,+05 24 55.44
+    1004083,703,2025 12 19.011342,11 05 53.912,+05 24 52.10
+
+(epoch is an MPC timestamp; ra/dec are sexagesimal, space- or
+colon-separated). Instead of a manifest, --observations selects the rows
+from MPC 80-column or ADES (PSV/XML) files through an ObservationIndex
+(observations_io.py), by object, observatory and epoch range. Rows are grouped by object and observatory, split into
+chunks of at most --chunk-size epochs, and each chunk is one work unit:
+a batched TLIST fetch (fetch_ephemeris_rows, so the response cache and
+HORIZONS_SPK_KERNELS apply) followed by the vectorized residual engine
+and error-ellipse screening (error_ellipse.py).
+Results are merged back into manifest order whatever order the chunks
+finish in.
+
+With --memo, residuals are remembered per observation and orbit solution
+(residual_memo.py): a rerun only fetches and computes the observations
+that are new or whose object has a new solution, and running statistics
+per object and solution are updated instead of recomputed.
+
+Requires: numpy
+
+Usage:
+    python batch_residuals.py <manifest.csv> [-o results.csv] [-j WORKERS] [--chunk-size N]
+        [--threshold SIGMA] [--store DIR] [--memo [FILE]]
+    python batch_residuals.py --observations FILE [--observations FILE ...] [--object DESIGNATION]
+        [--observatory CODE] [--since EPOCH] [--until EPOCH] [--target ID] [options as above]
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from error_ellipse import DEFAULT_THRESHOLD, screen_records
+from jpl_horizons_query import convert_mpc_timestamp, fetch_ephemeris_rows, make_record
+from residual_engine import calculate_residuals
+from residual_memo import (DEFAULT_DB_PATH as DEFAULT_MEMO_PATH, RESULT_FIELDS, STAT_FIELDS,
+                          ResidualMemo, manifest_fingerprints)
+from sexagesimal import degrees_to_dms, degrees_to_hms, parse_ra_dec
+from time_scales import mpc_to_utc
+
+DEFAULT_CHUNK_SIZE = 200
+
+MANIFEST_COLUMNS = ('object', 'observatory', 'epoch', 'ra', 'dec')
+
+RESULT_COLUMNS = (
+    'object', 'observatory', 'epoch', 'obs_ra', 'obs_dec', 'calc_ra', 'calc_dec',
+    'ra_residual', 'dec_residual', 'total_separation', 'mahalanobis', 'p_value', 'outlier',
+    'solution', 'error',
+)
+
+def read_manifest(path):
+    """
+    Read a residual manifest
+
+    Args:
+        path: CSV file with object, observatory, epoch, ra, dec columns
+
+    Returns:
+        List of row dictionaries, in file order
+    """
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in MANIFEST_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise Exception(f"Manifest is missing columns: {', '.join(missing)}")
+        return [{column: row[column].strip() for column in MANIFEST_COLUMNS} for row in reader]
+
+def observations_manifest(paths, designation=None, observatory=None, jd_min=None, jd_max=None,
+                          target=None):
+    """
+    Manifest rows for observations selected from MPC 80-column / ADES files
+
+    The files are streamed into an ObservationIndex (observations_io.py),
+    whose object, station and epoch indexes answer the selection. Epochs
+    are written with 8 decimals of a day (about 1 ms), positions to 0.0001 s
+    of RA and 0.001" of Dec.
+
+    Args:
+        paths: Observation files (format detected per file)
+        designation: Only this object, as named in the files (e.g. 'C/2025 N1')
+        observatory: Only this MPC observatory code
+        jd_min, jd_max: Inclusive UTC Julian Date range
+        target: Horizons COMMAND for the rows (default: each row's designation)
+
+    Returns:
+        List of row dictionaries (see read_manifest), in file order
+    """
+    from observations_io import ObservationIndex, jd_to_mpc_timestamp
+
+    index = ObservationIndex.from_files(paths)
+    columns = index.columns(index.select(designation, observatory, jd_min, jd_max))
+    if not len(columns['jd_utc']):
+        return []
+    ra = degrees_to_hms(columns['ra_deg'], precision=4, sep=' ')
+    dec = degrees_to_dms(columns['dec_deg'], precision=3, sep=' ')
+    return [
+        {'object': target or name, 'observatory': station, 'epoch': jd_to_mpc_timestamp(jd, 8),
+         'ra': r, 'dec': d}
+        for name, station, jd, r, d in zip(columns['designation'], columns['station'],
+                                           columns['jd_utc'].tolist(), ra, dec)
+    ]
+
+def plan_work_units(manifest, chunk_size=DEFAULT_CHUNK_SIZE, indices=None):
+    """
+    Group manifest rows into work units
+
+    Args:
+        manifest: List of row dictionaries (see read_manifest)
+        chunk_size: Maximum number of rows per unit
+        indices: Rows to plan (default: all)
+
+    Returns:
+        List of (object, observatory, row_indices) tuples; the rows of a unit
+        share one object and observatory and are sorted by epoch
+    """
+    groups = defaultdict(list)
+    for index in range(len(manifest)) if indices is None else indices:
+        row = manifest[index]
+        groups[(row['object'], row['observatory'])].append(index)
+
+    units = []
+    for (object_id, observatory), indices in groups.items():
+        indices.sort(key=lambda i: manifest[i]['epoch'])
+        for start in range(0, len(indices), chunk_size):
+            units.append((object_id, observatory, indices[start:start + chunk_size]))
+    return units
+
+def run_work_unit(object_id, observatory, rows):
+    """
+    Fetch the ephemeris for one work unit and compute its residuals
+
+    Runs in a worker process.
+
+    Args:
+        object_id: SPK-ID or object name
+        observatory: MPC observatory code
+        rows: List of (epoch, ra, dec) tuples
+
+    Returns:
+        Dictionary of result columns (arrays / lists, one entry per row)
+    """
+    center = observatory if observatory.startswith('@') else f'@{observatory}'
+    utc_times = [convert_mpc_timestamp(epoch) for epoch, _, _ in rows]
+    obs_ra, obs_dec = parse_ra_dec([ra for _, ra, _ in rows], [dec for _, _, dec in rows])
+
+    ephemeris = fetch_ephemeris_rows(object_id, center, utc_times)
+    records = [make_record(row) for row in ephemeris]
+    calc_ra = np.array([record.ra_deg for record in records])
+    calc_dec = np.array([record.dec_deg for record in records])
+
+    ra_res, dec_res, total_sep = calculate_residuals(obs_ra, obs_dec, calc_ra, calc_dec)
+    screening = screen_records(ra_res, dec_res, records)
+    return {
+        'obs_ra': obs_ra,
+        'obs_dec': obs_dec,
+        'calc_ra': calc_ra,
+        'calc_dec': calc_dec,
+        'ra_residual': ra_res,
+        'dec_residual': dec_res,
+        'total_separation': total_sep,
+        'mahalanobis': screening['distance'],
+        'p_value': screening['p_value'],
+        'solution': [row.get('solution', '') for row in ephemeris],
+    }
+
+def _run_chunk(unit_id, object_id, observatory, rows):
+    """Worker entry point; failures are returned rather than raised"""
+    try:
+        return unit_id, run_work_unit(object_id, observatory, rows), None
+    except Exception as e:
+        return unit_id, None, str(e)
+
+class ResidualTable:
+    """Preallocated result columns in manifest order"""
+
+    def __init__(self, manifest):
+        n = len(manifest)
+        self.manifest = manifest
+        self.numeric = {
+            name: np.full(n, np.nan)
+            for name in ('obs_ra', 'obs_dec', 'calc_ra', 'calc_dec',
+                         'ra_residual', 'dec_residual', 'total_separation',
+                         'mahalanobis', 'p_value')
+        }
+        self.solution = [''] * n
+        self.error = [''] * n
+        self.memo_hits = 0
+        self.memo_problems = {}
+
+    def merge(self, indices, result, error):
+        """Store one work unit's result at its manifest positions"""
+        if error is not None:
+            for i in indices:
+                self.error[i] = error
+            return
+        for name, column in self.numeric.items():
+            column[indices] = result[name]
+        for i, solution in zip(indices, result['solution']):
+            self.solution[i] = solution
+
+    def outliers(self, threshold=DEFAULT_THRESHOLD):
+        """Boolean array of rows beyond threshold sigma of their error ellipse"""
+        with np.errstate(invalid='ignore'):
+            return self.numeric['mahalanobis'] > threshold
+
+    def write_csv(self, path, threshold=DEFAULT_THRESHOLD):
+        """Write the results in manifest order"""
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(RESULT_COLUMNS)
+            columns = {name: column.tolist() for name, column in self.numeric.items()}
+            outliers = self.outliers(threshold).tolist()
+            for i, row in enumerate(self.manifest):
+                writer.writerow([
+                    row['object'], row['observatory'], row['epoch'],
+                    *(f"{columns[name][i]:.8f}" for name in ('obs_ra', 'obs_dec', 'calc_ra', 'calc_dec')),
+                    *(f"{columns[name][i]:.3f}" for name in ('ra_residual', 'dec_residual', 'total_separation',
+                                                             'mahalanobis')),
+                    f"{columns['p_value'][i]:.3e}",
+                    int(outliers[i]), self.solution[i], self.error[i],
+                ])
+
+    def append_to_store(self, store):
+        """
+        Append the successful rows to a ResidualStore, one part per object/solution
+
+        Returns:
+            Number of rows appended
+        """
+        groups = defaultdict(list)
+        for i, row in enumerate(self.manifest):
+            if not self.error[i]:
+                groups[(row['object'], self.solution[i] or 'unknown')].append(i)
+
+        for (object_id, solution), indices in groups.items():
+            jd_utc = np.add(*mpc_to_utc([self.manifest[i]['epoch'] for i in indices]))
+            observatory = [self.manifest[i]['observatory'] for i in indices]
+            columns = {name: column[indices] for name, column in self.numeric.items()}
+            store.append(object_id, solution, dict(columns, jd_utc=jd_utc, observatory=observatory))
+        return sum(len(indices) for indices in groups.values())
+
+def current_solutions(object_ids):
+    """
+    Current solution of each object, probed from Horizons once per run
+
+    When the probe fails (e.g. offline), the newest solution in the
+    ephemeris store is used instead.
+
+    Returns:
+        Tuple of (dictionary of object -> solution or None, dictionary of
+        object -> reason the probe could not be used)
+    """
+    from ephemeris_store import get_default_store
+    from jpl_horizons_query import probe_solution
+
+    store = get_default_store()
+    solutions, problems = {}, {}
+    for object_id in object_ids:
+        try:
+            solutions[object_id] = probe_solution(object_id)
+            if solutions[object_id] is None:
+                problems[object_id] = "Horizons response names no solution; memo not used"
+        except Exception as e:
+            solution = store.current_solution(object_id) if store is not None else None
+            solutions[object_id] = solution
+            problems[object_id] = (f"solution probe failed ({str(e)}); " +
+                                   (f"assuming stored solution {solution}" if solution else "memo not used"))
+    return solutions, problems
+
+def _apply_memo(table, memo, prints, solutions):
+    """
+    Fill the rows memoized for their object's current solution
+
+    Returns:
+        List of the row indices still to compute
+    """
+    by_object = defaultdict(list)
+    for i, row in enumerate(table.manifest):
+        by_object[row['object']].append(i)
+
+    pending = []
+    for object_id, indices in by_object.items():
+        solution = solutions.get(object_id)
+        found = memo.lookup([prints[i] for i in indices], solution) if solution else {}
+        for i in indices:
+            result = found.get(prints[i])
+            if result is None:
+                pending.append(i)
+                continue
+            for name, column in table.numeric.items():
+                column[i] = result[name]
+            table.solution[i] = solution
+            table.memo_hits += 1
+    return pending
+
+def _record_unit(memo, object_id, observatory, indices, result, prints, jd_utc):
+    """Memoize one work unit's residuals, grouped by the solution of each row"""
+    groups = defaultdict(list)
+    for k, solution in enumerate(result['solution']):
+        groups[solution].append(k)
+    for solution, rows in groups.items():
+        memo.record(object_id, observatory, solution,
+                    [prints[indices[k]] for k in rows], jd_utc[[indices[k] for k in rows]],
+                    {name: np.asarray(result[name])[rows] for name in RESULT_FIELDS})
+
+def run_batch(manifest, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None, memo=None):
+    """
+    Compute residuals for every manifest row across a process pool
+
+    Args:
+        manifest: List of row dictionaries (see read_manifest)
+        workers: Number of worker processes (default: CPU count)
+        chunk_size: Maximum number of rows per work unit
+        progress: Optional callback(done_rows, total_rows)
+        memo: Optional ResidualMemo; rows memoized for their object's
+            current solution are not recomputed and new residuals are
+            added to it
+
+    Returns:
+        ResidualTable in manifest order
+    """
+    table = ResidualTable(manifest)
+    pending = None
+    if memo is not None:
+        prints, jd_utc = manifest_fingerprints(manifest)
+        solutions, table.memo_problems = current_solutions(dict.fromkeys(row['object'] for row in manifest))
+        pending = _apply_memo(table, memo, prints, solutions)
+    units = plan_work_units(manifest, chunk_size, pending)
+    done = table.memo_hits
+    if progress is not None and done:
+        progress(done, len(manifest))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_run_chunk, unit_id, object_id, observatory,
+                        [(manifest[i]['epoch'], manifest[i]['ra'], manifest[i]['dec']) for i in indices])
+            for unit_id, (object_id, observatory, indices) in enumerate(units)
+        ]
+        for future in as_completed(futures):
+            unit_id, result, error = future.result()
+            indices = units[unit_id][2]
+            table.merge(indices, result, error)
+            if memo is not None and error is None:
+                _record_unit(memo, units[unit_id][0], units[unit_id][1], indices, result, prints, jd_utc)
+            done += len(indices)
+            if progress is not None:
+                progress(done, len(manifest))
+
+    return table
+
+def main(argv=None):
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Batch O-C residuals for a manifest of observations")
+    parser.add_argument('manifest', nargs='?', help="CSV with object, observatory, epoch, ra, dec columns")
+    parser.add_argument('--observations', metavar='FILE', action='append',
+                        help="Select the observations from MPC 80-column or ADES files instead "
+                             "of a manifest (repeatable)")
+    parser.add_argument('--object', metavar='DESIGNATION', help="With --observations: only this object")
+    parser.add_argument('--observatory', metavar='CODE', help="With --observations: only this observatory")
+    parser.add_argument('--since', metavar='EPOCH',
+                        help="With --observations: only from this MPC timestamp (YYYY MM DD.ddd) on")
+    parser.add_argument('--until', metavar='EPOCH',
+                        help="With --observations: only up to this MPC timestamp")
+    parser.add_argument('--target', metavar='ID',
+                        help="With --observations: Horizons COMMAND for the selected observations "
+                             "(default: their designation)")
+    parser.add_argument('-o', '--output', default='batch_residuals_results.csv', help="Results CSV")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Maximum observations per work unit")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Mahalanobis distance (sigma) that flags an outlier (default: %(default)s)")
+    parser.add_argument('--store', metavar='DIR',
+                        help="Also append the results to a residual store (residual_store.py)")
+    parser.add_argument('--memo', metavar='FILE', nargs='?',
+                        const=os.environ.get('HORIZONS_RESIDUAL_MEMO', DEFAULT_MEMO_PATH),
+                        help="Reuse and extend memoized residuals (residual_memo.py; "
+                             "default file: $HORIZONS_RESIDUAL_MEMO or ~/.cache/horizons/residuals.sqlite)")
+    args = parser.parse_args(argv)
+    if (args.manifest is None) == (args.observations is None):
+        parser.error("give either a manifest or --observations")
+    selection = {'--object': args.object, '--observatory': args.observatory, '--since': args.since,
+                 '--until': args.until, '--target': args.target}
+    if args.observations is None and any(value is not None for value in selection.values()):
+        parser.error(f"{', '.join(k for k, v in selection.items() if v is not None)} "
+                     f"can only be used with --observations")
+    limits = []
+    for option, epoch in (('--since', args.since), ('--until', args.until)):
+        try:
+            limits.append(float(np.add(*mpc_to_utc([epoch]))[0]) if epoch is not None else None)
+        except ValueError as e:
+            parser.error(f"{option}: {str(e)}")
+
+    print("="*70)
+    print("BATCH O-C RESIDUALS")
+    print("="*70)
+
+    try:
+        if args.observations is not None:
+            manifest = observations_manifest(args.observations, args.object, args.observatory,
+                                             *limits, target=args.target)
+        else:
+            manifest = read_manifest(args.manifest)
+    except Exception as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+    if args.observations is not None and not manifest:
+        print("ERROR: No observations selected", file=sys.stderr)
+        sys.exit(1)
+
+    units = plan_work_units(manifest, args.chunk_size)
+    print(f"Observations: {len(manifest):,}")
+    print(f"Work units:   {len(units):,} (up to {args.chunk_size} epochs each)")
+    print(f"Workers:      {args.workers}")
+    print()
+
+    def progress(done, total):
+        print(f"\r  {done:,}/{total:,} observations", end='', flush=True)
+
+    start = time.perf_counter()
+    memo = ResidualMemo(args.memo) if args.memo else None
+    table = run_batch(manifest, args.workers, args.chunk_size, progress, memo)
+    elapsed = time.perf_counter() - start
+    print()
+
+    table.write_csv(args.output, args.threshold)
+    if args.store:
+        from residual_store import ResidualStore
+        stored = table.append_to_store(ResidualStore(args.store))
+
+    failed = sum(1 for error in table.error if error)
+    separation = table.numeric['total_separation']
+    valid = separation[np.isfinite(separation)]
+
+    print()
+    print(f"Elapsed:        {elapsed:.2f} s")
+    print(f"Throughput:     {len(manifest) / elapsed if elapsed > 0 else 0:,.0f} observations/s")
+    print(f"Failed:         {failed:,}")
+    if memo is not None:
+        print(f"Memo hits:      {table.memo_hits:,} "
+              f"({len(manifest) - table.memo_hits:,} fetched and computed)")
+        for object_id, problem in table.memo_problems.items():
+            print(f"WARNING: {object_id}: {problem}", file=sys.stderr)
+    if valid.size:
+        print(f"RMS separation: {np.sqrt(np.mean(valid**2)):.3f} arcsec")
+        print(f"Max separation: {valid.max():.3f} arcsec")
+    print(f"Outliers:       {int(table.outliers(args.threshold).sum()):,} "
+          f"(beyond {args.threshold:g} sigma of the error ellipse)")
+    print(f"✓ Results saved to: {args.output}")
+    if args.store:
+        print(f"✓ {stored:,} rows appended to residual store: {args.store}")
+    if memo is not None:
+        print(f"✓ Residuals memoized in: {args.memo}")
+        print()
+        print("Running statistics (all memoized observations, arcsec):")
+        for object_id in dict.fromkeys(row['object'] for row in manifest):
+            for (_, solution), fields in memo.running_stats(object_id).items():
+                ra, dec, sep = (fields[name] for name in STAT_FIELDS)
+                print(f"  {object_id} {solution}: n={sep.count:,}  mean RA {ra.mean:+.3f}  "
+                      f"mean Dec {dec.mean:+.3f}  RMS separation {sep.rms:.3f}")
+    print("="*70)
+
+    if failed:
+        for i, error in enumerate(table.error):
+            if error:
+                print(f"First error (row {i + 1}): {error}", file=sys.stderr)
+                break
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite
+Measures the parsing, time conversion and residual functions and the
+proxy servers on synthetic data
+
+Each benchmark reports throughput (operations per second), median and
+99th percentile latency of one call, and peak Python memory of one call
+(tracemalloc, measured in a separate untimed run). Horizons responses of
+1 to 1,000,000 rows come from horizons_replay.synthesize_response(); the
+proxy benchmarks run jpl_horizons_server.py (Flask) and the asyncio proxy
+against an in-process replay server, so no network is used.
+
+Results can be saved as a baseline and later runs compared against it;
+--compare exits with status 1 when any benchmark is slower than the
+baseline by more than --threshold.
+
+Usage:
+    python benchmarks.py [--filter NAME] [--max-size N] [--min-time S]
+        [--save-baseline FILE] [--compare FILE] [--threshold 0.10]
+"""
+
+import argparse
+import asyncio
+import gc
+import io
+import json
+import platform
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+BENCHMARKS = []
+
+def benchmark(name, sizes=(None,)):
+    """
+    Register a benchmark
+
+    The decorated function takes a size and returns (fn, ops): fn() is
+    timed, and one call performs `ops` operations. Setup done before
+    returning is not timed.
+    """
+    def register(setup):
+        for size in sizes:
+            BENCHMARKS.append((name if size is None else f"{name}[{size}]", setup, size))
+        return setup
+    return register
+
+def _observations(n, seed=44):
+    """Synthetic observed/calculated positions (degrees)"""
+    rng = np.random.default_rng(seed)
+    calc_ra = rng.uniform(0.0, 360.0, n)
+    calc_dec = np.degrees(np.arcsin(rng.uniform(-1.0, 1.0, n)))
+    obs_ra = calc_ra + rng.normal(0.0, 1.0, n) / 3600.0
+    obs_dec = calc_dec + rng.normal(0.0, 1.0, n) / 3600.0
+    return obs_ra, obs_dec, calc_ra, calc_dec
+
+def _sexagesimal_columns(n):
+    from sexagesimal import degrees_to_dms, degrees_to_hms
+    obs_ra, obs_dec, _, _ = _observations(n)
+    return degrees_to_hms(obs_ra, sep=' '), degrees_to_dms(obs_dec, sep=' ')
+
+@benchmark('parse_ra_dec.scalar')
+def bench_parse_ra_dec_scalar(_):
+    from comet_residuals_analysis import parse_ra_dec
+    return (lambda: parse_ra_dec("11 05 53.640", "+05 24 55.44")), 1
+
+@benchmark('parse_ra_dec.vector', sizes=(1000, 100000, 1000000))
+def bench_parse_ra_dec_vector(n):
+    from sexagesimal import parse_ra_dec
+    ra, dec = _sexagesimal_columns(n)
+    return (lambda: parse_ra_dec(ra, dec)), n
+
+@benchmark('convert_mpc_timestamp')
+def bench_convert_mpc_timestamp(_):
+    from jpl_horizons_query import convert_mpc_timestamp
+    return (lambda: convert_mpc_timestamp("2025 12 19.007280")), 1
+
+@benchmark('mpc_to_jd.tdb', sizes=(1000, 100000, 1000000))
+def bench_mpc_to_jd(n):
+    from time_scales import mpc_to_jd
+    rng = np.random.default_rng(44)
+    days = rng.uniform(1.0, 28.99, n)
+    months = rng.integers(1, 13, n)
+    timestamps = [f"2025 {m:02d} {d:09.6f}" for m, d in zip(months.tolist(), days.tolist())]
+    return (lambda: mpc_to_jd(timestamps, 'tdb')), n
+
+@benchmark('two_body.radec', sizes=(1000, 100000, 1000000))
+def bench_two_body_radec(n):
+    from two_body import OrbitalElements, TwoBodyOrbit
+    orbit = TwoBodyOrbit(OrbitalElements(
+        epoch=2460894.5, e=6.139422831829797, q=1.356418761995381, tp=2460977.982217866,
+        node=322.1566239181344, peri=128.0096924001076, inc=175.1130917268881, solution=None))
+    jd_tdb = np.linspace(2460800.5, 2461200.5, n)
+    return (lambda: orbit.radec(jd_tdb)), n
+
+@benchmark('parse_ephemeris', sizes=(1, 1000, 100000, 1000000))
+def bench_parse_ephemeris(n):
+    from horizons_replay import synthesize_response
+    from jpl_horizons_query import parse_ephemeris
+    text = synthesize_response({}, rows=n)
+    return (lambda: parse_ephemeris(text)), n
+
+@benchmark('iter_ephemeris_records', sizes=(1000, 100000, 1000000))
+def bench_iter_ephemeris_records(n):
+    from horizons_replay import synthesize_response
+    from jpl_horizons_query import iter_ephemeris_records
+    text = synthesize_response({}, rows=n)
+
+    def run():
+        for _ in iter_ephemeris_records(io.StringIO(text)):
+            pass
+    return run, n
+
+@benchmark('calculate_residuals.scalar')
+def bench_calculate_residuals_scalar(_):
+    from comet_residuals_analysis import calculate_residuals
+    return (lambda: calculate_residuals(166.4735, 5.41540, 166.4732, 5.41532)), 1
+
+@benchmark('calculate_residuals.vector', sizes=(1000, 100000, 1000000))
+def bench_calculate_residuals_vector(n):
+    from residual_engine import calculate_residuals
+    obs_ra, obs_dec, calc_ra, calc_dec = _observations(n)
+    return (lambda: calculate_residuals(obs_ra, obs_dec, calc_ra, calc_dec)), n
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+class _BackgroundLoop:
+    """Event loop in a daemon thread, for servers the benchmark talks to"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+def _start_replay_server():
+    """Synthesizing replay server in a background loop; returns its URL"""
+    from async_http import start_server
+    from horizons_replay import ReplayServer
+
+    background = _BackgroundLoop()
+    port = _free_port()
+    background.run(start_server(ReplayServer({}, synthesize=True), '127.0.0.1', port))
+    return f"http://127.0.0.1:{port}/api/horizons", background
+
+def _proxy_load(url, requests):
+    """Load-test url; returns (fn, ops) where fn reports its own latencies"""
+    from horizons_replay import load_test
+
+    def run():
+        return asyncio.run(load_test(url, requests=requests, concurrency=32, distinct=50))
+    return run, requests
+
+@benchmark('proxy.flask', sizes=(2000,))
+def bench_proxy_flask(requests):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    import jpl_horizons_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    upstream, _ = _start_replay_server()
+    jpl_horizons_server.HORIZONS_URL = upstream
+    port = _free_port()
+    server = make_server('127.0.0.1', port, jpl_horizons_server.app, threaded=True,
+                         request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return _proxy_load(f"http://127.0.0.1:{port}/api/horizons", requests)
+
+@benchmark('proxy.async', sizes=(5000,))
+def bench_proxy_async(requests):
+    from async_http import start_server
+    from horizons_async_proxy import HorizonsProxy
+
+    upstream, background = _start_replay_server()
+    port = _free_port()
+    proxy = HorizonsProxy(upstream, max_upstream=32)
+    background.run(start_server(proxy, '127.0.0.1', port))
+    return _proxy_load(f"http://127.0.0.1:{port}/api/horizons", requests)
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def run_benchmark(setup, size, min_time=1.0, min_runs=3):
+    """
+    Time one benchmark
+
+    Returns:
+        Dictionary with ops_per_sec, p50_ms, p99_ms, peak_bytes and runs
+    """
+    fn, ops = setup(size)
+
+    if setup in (bench_proxy_flask, bench_proxy_async):
+        # Load tests measure their own per-request latency
+        result = fn()
+        return {'ops_per_sec': result['rps'], 'p50_ms': result['p50_ms'],
+                'p99_ms': result['p99_ms'], 'peak_bytes': None, 'runs': 1,
+                'errors': sum(v for k, v in result['statuses'].items() if k != 200)}
+
+    # Peak memory of one call, in an untimed run
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = []
+    deadline = time.perf_counter() + min_time
+    while len(timings) < min_runs or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    timings.sort()
+    median = _percentile(timings, 0.50)
+    return {
+        'ops_per_sec': ops / median if median > 0 else float('inf'),
+        'p50_ms': median * 1000,
+        'p99_ms': _percentile(timings, 0.99) * 1000,
+        'peak_bytes': peak,
+        'runs': len(timings),
+    }
+
+def compare(results, baseline, threshold):
+    """
+    Compare throughput with a baseline
+
+    Returns:
+        List of (name, baseline_ops, current_ops, change) for benchmarks
+        slower than the baseline by more than threshold
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base or not base.get('ops_per_sec'):
+            continue
+        change = result['ops_per_sec'] / base['ops_per_sec'] - 1.0
+        result['change'] = change
+        if change < -threshold:
+            regressions.append((name, base['ops_per_sec'], result['ops_per_sec'], change))
+    return regressions
+
+def _format_bytes(value):
+    if value is None:
+        return 'n/a'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024 or unit == 'GB':
+            return f"{value:.0f} {unit}" if unit == 'B' else f"{value:.1f} {unit}"
+        value /= 1024.0
+
+def main(argv=None):
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Benchmark suite')
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--max-size', type=int, default=1000000, help='skip larger sizes')
+    parser.add_argument('--min-time', type=float, default=1.0, help='seconds per benchmark')
+    parser.add_argument('--save-baseline', metavar='FILE', help='write results as a baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare with a saved baseline')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='slowdown reported as a regression (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    print("="*90)
+    print("BENCHMARKS")
+    print("="*90)
+    print(f"{'Benchmark':<36} {'ops/sec':>14} {'p50 (ms)':>10} {'p99 (ms)':>10} {'peak mem':>10}  change")
+    print("-"*90)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for name, setup, size in BENCHMARKS:
+        if args.filter not in name or (size is not None and size > args.max_size):
+            continue
+        try:
+            result = run_benchmark(setup, size, args.min_time)
+        except ImportError as e:
+            print(f"{name:<36} skipped ({e})")
+            continue
+        results[name] = result
+
+        change = ''
+        if baseline is not None:
+            base = baseline.get('results', {}).get(name)
+            if base and base.get('ops_per_sec'):
+                change = f"{100.0 * (result['ops_per_sec'] / base['ops_per_sec'] - 1.0):+.1f}%"
+        print(f"{name:<36} {result['ops_per_sec']:>14,.0f} {result['p50_ms']:>10.3f} "
+              f"{result['p99_ms']:>10.3f} {_format_bytes(result['peak_bytes']):>10}  {change}")
+
+    print("="*90)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({
+                'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results,
+            }, f, indent=2)
+        print(f"✓ Baseline saved to: {args.save_baseline}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"REGRESSIONS (slower than baseline by more than {100 * args.threshold:.0f}%):")
+            for name, base_ops, ops, change in regressions:
+                print(f"  {name:<34} {base_ops:>14,.0f} -> {ops:>14,.0f} ops/sec ({100 * change:+.1f}%)")
+            sys.exit(1)
+        print(f"✓ No regressions against {args.compare}")
+
+if __name__ == '__main__':
+    main()
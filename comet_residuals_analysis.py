@@ -8,6 +8,8 @@ import requests
 from datetime import datetime
 import math
 
+from horizons_cache import get_default_cache, is_offline
+
 def query_horizons(command, center, time_str):
     """
     Query JPL Horizons API with proper parameters
@@ -20,7 +22,9 @@ def query_horizons(command, center, time_str):
     Returns:
         Response text from Horizons API
     """
-    base_url = "https://ssd.jpl.nasa.gov/api/horizons.api"
+    from jpl_horizons_query import HORIZONS_API_URL, local_response
+
+    base_url = HORIZONS_API_URL
 
     params = {
         'format': 'text',
@@ -42,13 +46,56 @@ def query_horizons(command, center, time_str):
     print(f"Time: {time_str}")
     print()
 
+    local = local_response(params)
+    if local is not None:
+        print("✓ Using local SPK kernels")
+        print()
+        return local
+
+    cache = get_default_cache()
+    if cache is not None:
+        cached = cache.get(params)
+        if cached is not None:
+            print("✓ Using cached Horizons response")
+            print()
+            return cached
+
+    if is_offline():
+        raise Exception("Response not in cache and HORIZONS_OFFLINE=1 is set")
+
     response = requests.get(base_url, params=params)
 
     if response.status_code != 200:
         raise Exception(f"API request failed with status {response.status_code}: {response.text}")
 
+    if cache is not None:
+        cache.put(params, response.text)
+
     return response.text
 
+def query_horizons_batch(command, center, time_strs):
+    """
+    Query JPL Horizons for many observation times with batched TLIST requests
+
+    Args:
+        command: SPK-ID of the object (e.g., '1004083;')
+        center: Observer location code (e.g., '@G96')
+        time_strs: List of UT times in format 'YYYY-MM-DD HH:MM:SS'
+
+    Returns:
+        List of parsed ephemeris rows (dicts with 'ra_icrf', 'dec_icrf', ...),
+        one per entry in time_strs
+    """
+    from jpl_horizons_query import fetch_ephemeris_rows
+
+    print("Querying JPL Horizons API (batched)...")
+    print(f"Object: {command}")
+    print(f"Observer: {center}")
+    print(f"Times: {len(time_strs)}")
+    print()
+
+    return fetch_ephemeris_rows(command, center, time_strs)
+
 def parse_ra_dec(ra_str, dec_str):
     """
     Convert RA/Dec strings to decimal degrees
@@ -103,6 +150,9 @@ def calculate_residuals(obs_ra_deg, obs_dec_deg, calc_ra_deg, calc_dec_deg):
     return ra_residual_arcsec, dec_residual_arcsec, total_separation_arcsec
 
 def main():
+    from error_ellipse import LEVEL_NAMES, ellipse_columns, screen
+    from jpl_horizons_query import make_record, parse_ephemeris_row
+
     # Step 1: Query JPL Horizons for calculated position
     print("="*80)
     print("COMET C/2025 N1 (ATLAS) - SOLUTION 44 RESIDUALS ANALYSIS")
@@ -169,15 +219,12 @@ def main():
             print(f"Calculated Dec: {calc_dec_str}")
             print()
 
-            # Look for POS_3sigma in the line or nearby
-            pos_3sigma = None
-            for part in parts:
-                try:
-                    val = float(part)
-                    if 0.01 < val < 100:  # Reasonable range for 3-sigma in arcseconds
-                        pos_3sigma = val
-                except:
-                    pass
+            # 3-sigma error ellipse (SMAA_3sig, SMIA_3sig, Theta) from the same row
+            try:
+                calc_record = make_record(parse_ephemeris_row(data_line))
+                smaa_3sig, smia_3sig, theta = (float(c[0]) for c in ellipse_columns([calc_record]))
+            except Exception:
+                smaa_3sig = smia_3sig = theta = float('nan')
 
             # Step 2: Define observed position
             print("OBSERVED POSITION (from December 19 MPEC):")
@@ -209,21 +256,29 @@ def main():
             print(f"Total separation: {total_sep:10.3f} arcsec = {total_sep/3600.0:.6f}°")
             print()
 
-            if pos_3sigma:
-                print(f"JPL 3-sigma uncertainty: {pos_3sigma:.3f} arcsec")
-                sigma_ratio = total_sep / pos_3sigma
-                print(f"Residual / 3-sigma: {sigma_ratio:.1f}×")
+            screening = screen([ra_res], [dec_res], [smaa_3sig], [smia_3sig], [theta])
+            distance = float(screening['distance'][0])
+            if not math.isnan(distance):
+                sigma_ratio = float(screening['ellipse_ratio'][0])
+                print(f"JPL 3-sigma error ellipse: {smaa_3sig:.3f} × {smia_3sig:.3f} arcsec, "
+                      f"PA {theta:.1f}°")
+                print(f"Along major / minor axis: {float(screening['along_major'][0]):+.3f} / "
+                      f"{float(screening['along_minor'][0]):+.3f} arcsec")
+                print(f"Mahalanobis distance: {distance:.2f} sigma "
+                      f"(p = {float(screening['p_value'][0]):.3g})")
+                print(f"Residual / 3-sigma ellipse: {sigma_ratio:.1f}×")
                 print()
 
-                if total_sep > pos_3sigma:
+                if screening['outlier'][0]:
                     print("⚠️  VERDICT: SOLUTION 44 FAILED")
                     print(f"   The observed position is {sigma_ratio:.1f}× beyond the 3-sigma")
-                    print(f"   predicted error margin. This is a statistically significant")
-                    print(f"   prediction failure.")
+                    print(f"   predicted error ellipse "
+                          f"({LEVEL_NAMES[int(screening['level'][0])]}). This is a")
+                    print(f"   statistically significant prediction failure.")
                 else:
                     print("✓ VERDICT: Within predicted uncertainty")
             else:
-                print("Note: Could not extract POS_3sigma from response")
+                print("Note: Could not extract the 3-sigma error ellipse from response")
                 print("      Manual verification needed")
 
             print()
@@ -10,6 +10,10 @@ Instructions:
 2. Extract the calculated RA, Dec, and POS_3sigma values
 3. Enter them below in the CALCULATED DATA section
 4. Run this script: python3 comet_residuals_manual_entry.py
+
+Each run also appends its result to the residual store
+(residual_store.py, requires numpy) under OBJECT_DESIGNATION / SOLUTION,
+so results from many runs can be queried together.
 """
 
 import math
@@ -21,6 +25,8 @@ OBS_RA_HMS = "11 05 53.640"  # 11h 05m 53.640s
 OBS_DEC_DMS = "+05 24 55.44"  # +05° 24' 55.44"
 OBS_TIME = "2025-12-19 01:21:40 UT"
 OBSERVER = "G96 (Mt. Lemmon Survey)"
+OBSERVATORY_CODE = "G96"
+OBJECT_DESIGNATION = "C/2025 N1"
 
 # =============================================================================
 # CALCULATED DATA (from JPL Horizons Solution 44)
@@ -38,6 +44,12 @@ CALC_DEC_DMS = "+XX XX XX.XX"  # Format: "+DD MM SS.SS"
 # 3-sigma positional uncertainty from Horizons (arcseconds)
 POS_3SIGMA = None  # arcseconds (e.g., 0.31)
 
+# Orbit solution the calculated position came from
+SOLUTION = "JPL#44"
+
+# Directory of the columnar residual store (None to disable)
+RESIDUAL_STORE_DIR = "residual_store"
+
 # =============================================================================
 # CALCULATION FUNCTIONS
 # =============================================================================
@@ -153,6 +165,39 @@ def calculate_residuals(obs_ra_deg, obs_dec_deg, calc_ra_deg, calc_dec_deg):
 
     return ra_residual_arcsec, dec_residual_arcsec, total_separation_arcsec
 
+def append_to_store(obs_ra_deg, obs_dec_deg, calc_ra_deg, calc_dec_deg,
+                    ra_res, dec_res, total_sep):
+    """
+    Append this run's residual to the columnar residual store
+
+    Returns:
+        Path of the new part file, or None if numpy is not installed
+    """
+    try:
+        from observations_io import iso_to_jd
+        from residual_store import ResidualStore
+    except ImportError:
+        return None
+
+    jd_utc = iso_to_jd(OBS_TIME.replace(' UT', '').replace(' ', 'T'))
+    columns = {
+        'jd_utc': jd_utc,
+        'observatory': OBSERVATORY_CODE,
+        'obs_ra': obs_ra_deg,
+        'obs_dec': obs_dec_deg,
+        'calc_ra': calc_ra_deg,
+        'calc_dec': calc_dec_deg,
+        'ra_residual': ra_res,
+        'dec_residual': dec_res,
+        'total_separation': total_sep,
+    }
+    if POS_3SIGMA:
+        # A single 3-sigma value is a circular error ellipse
+        columns.update(smaa_3sig=POS_3SIGMA, smia_3sig=POS_3SIGMA, theta=0.0,
+                       mahalanobis=3.0 * total_sep / POS_3SIGMA,
+                       p_value=math.exp(-0.5 * (3.0 * total_sep / POS_3SIGMA) ** 2))
+    return ResidualStore(RESIDUAL_STORE_DIR).append(OBJECT_DESIGNATION, SOLUTION, columns)
+
 # =============================================================================
 # MAIN ANALYSIS
 # =============================================================================
@@ -321,6 +366,14 @@ def main():
             f.write(f"VERDICT: {'WITHIN' if total_sep <= POS_3SIGMA else 'OUTSIDE'} predicted uncertainty\n")
 
     print(f"\nResults saved to: {output_file}")
+
+    if RESIDUAL_STORE_DIR:
+        part = append_to_store(obs_ra_deg, obs_dec_deg, calc_ra_deg, calc_dec_deg,
+                               ra_res, dec_res, total_sep)
+        if part:
+            print(f"Appended to residual store: {part}")
+        else:
+            print("Residual store not updated (requires numpy)")
     print()
 
 if __name__ == "__main__":
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Local Ephemeris Interpolation
+Answer RA/Dec queries for arbitrary epochs from one coarse Horizons grid
+
+Instead of one Horizons call per observation time, the ephemeris is
+fetched once per observatory on an evenly stepped grid. QUANTITIES 1 and 3
+give both the position and its rates (dRA*cosD, d(DEC)/dt) at each grid
+node, which is enough to fit a cubic Hermite segment between neighbouring
+nodes. Interpolation is done on the unit direction vector, so it is not
+affected by the 0h/24h wrap or by proximity to the celestial poles.
+
+Every answer comes with an error bound. The grid is re-interpolated using
+only every second node and compared with the skipped nodes; cubic Hermite
+error scales with h^4, so the error on the full grid is estimated as 1/16
+of that discrepancy (times a safety factor), plus the effect of the
+printed precision of the rate columns.
+
+Requires: numpy
+
+Usage:
+    python ephemeris_interpolation.py <object_id> <observatory_code> <start> <stop> <step> <mpc_timestamp> [...]
+
+Example:
+    python ephemeris_interpolation.py 1004083 G96 "2025-12-18 12:00" "2025-12-19 12:00" "1 h" "2025 12 19.007280"
+"""
+
+import math
+import re
+import sys
+
+import numpy as np
+
+from jpl_horizons_query import build_range_params, stream_horizons
+from time_scales import date_to_jd
+
+ARCSEC_PER_RAD = 180.0 / math.pi * 3600.0
+
+# Safety factor applied to the step-halving (Richardson) error estimate
+SAFETY_FACTOR = 2.0
+
+# Resolution of the rate columns as printed by Horizons (arcsec/hr)
+RATE_RESOLUTION = 0.005
+
+_MONTHS = {m: i for i, m in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], start=1)}
+_HORIZONS_TIME_RE = re.compile(
+    r'(\d{4})-([A-Za-z]{3}|\d{1,2})-(\d{1,2})\s+(\d{1,2}):(\d{2})(?::(\d{2}(?:\.\d*)?))?')
+
+def horizons_time_to_jd(text):
+    """
+    Convert a Horizons table time ('2025-Dec-19 01:21:40.000') to JD
+
+    Args:
+        text: Time string as printed in the ephemeris table
+
+    Returns:
+        Julian Date (float)
+    """
+    match = _HORIZONS_TIME_RE.search(text)
+    if not match:
+        raise ValueError(f"Invalid Horizons time: {text}")
+    year, month, day, hours, minutes, seconds = match.groups()
+    month = _MONTHS[month.title()] if month.isalpha() else int(month)
+    return date_to_jd(int(year), month, int(day), int(hours), int(minutes), float(seconds or 0))
+
+def _unit_vectors(ra_deg, dec_deg):
+    ra = np.radians(ra_deg)
+    dec = np.radians(dec_deg)
+    cos_dec = np.cos(dec)
+    return np.stack([cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)], axis=-1)
+
+def _unit_vector_rates(ra_deg, dec_deg, dra_cosd, ddec_dt):
+    """Time derivative of the unit vector (per day) from rates in arcsec/hr"""
+    ra = np.radians(ra_deg)
+    dec = np.radians(dec_deg)
+    # arcsec/hr -> rad/day
+    ra_rate = np.asarray(dra_cosd, dtype=np.float64) * 24.0 / ARCSEC_PER_RAD
+    dec_rate = np.asarray(ddec_dt, dtype=np.float64) * 24.0 / ARCSEC_PER_RAD
+    east = np.stack([-np.sin(ra), np.cos(ra), np.zeros_like(ra)], axis=-1)
+    north = np.stack([-np.sin(dec) * np.cos(ra), -np.sin(dec) * np.sin(ra), np.cos(dec)], axis=-1)
+    return east * ra_rate[:, None] + north * dec_rate[:, None]
+
+def hermite_interpolate(jd_nodes, pos, vel, jd):
+    """
+    Evaluate piecewise cubic Hermite interpolation
+
+    Args:
+        jd_nodes: Node epochs (increasing)
+        pos: (n, k) values at the nodes
+        vel: (n, k) time derivatives at the nodes (per unit of jd)
+        jd: Array of epochs inside the nodes
+
+    Returns:
+        Tuple of ((m, k) interpolated values, segment index per epoch)
+    """
+    index = np.clip(np.searchsorted(jd_nodes, jd, side='right') - 1, 0, len(jd_nodes) - 2)
+    t0 = jd_nodes[index]
+    h = jd_nodes[index + 1] - t0
+    s = ((jd - t0) / h)[:, None]
+    s2 = s * s
+    s3 = s2 * s
+    h00 = 2 * s3 - 3 * s2 + 1
+    h10 = s3 - 2 * s2 + s
+    h01 = -2 * s3 + 3 * s2
+    h11 = s3 - s2
+    hh = h[:, None]
+    result = (h00 * pos[index] + h10 * hh * vel[index]
+              + h01 * pos[index + 1] + h11 * hh * vel[index + 1])
+    return result, index
+
+def _to_radec(vectors):
+    x, y, z = vectors[:, 0], vectors[:, 1], vectors[:, 2]
+    ra = np.degrees(np.arctan2(y, x)) % 360.0
+    dec = np.degrees(np.arctan2(z, np.hypot(x, y)))
+    return ra, dec
+
+def _separation_arcsec(a, b):
+    """Angle between (not necessarily unit) vectors in arcsec"""
+    cross = np.linalg.norm(np.cross(a, b), axis=-1)
+    dot = np.sum(a * b, axis=-1)
+    return np.arctan2(cross, dot) * ARCSEC_PER_RAD
+
+class InterpolatedEphemeris:
+    """
+    Piecewise cubic Hermite ephemeris for one object and observatory
+
+    Args:
+        jd: Grid epochs (JD, strictly increasing)
+        ra_deg, dec_deg: Positions at the grid epochs (degrees)
+        dra_cosd, ddec_dt: Rates at the grid epochs (arcsec/hr)
+        object_id, center, solution: Descriptive metadata
+    """
+
+    def __init__(self, jd, ra_deg, dec_deg, dra_cosd, ddec_dt,
+                 object_id=None, center=None, solution=None):
+        self.jd = np.asarray(jd, dtype=np.float64)
+        if self.jd.size < 2:
+            raise ValueError("At least two grid epochs are needed for interpolation")
+        if np.any(np.diff(self.jd) <= 0):
+            raise ValueError("Grid epochs must be strictly increasing")
+
+        self.object_id = object_id
+        self.center = center
+        self.solution = solution
+        self.pos = _unit_vectors(np.asarray(ra_deg, dtype=np.float64), np.asarray(dec_deg, dtype=np.float64))
+        self.vel = _unit_vector_rates(ra_deg, dec_deg, dra_cosd, ddec_dt)
+        self.segment_error_arcsec = self._estimate_segment_errors()
+
+    @classmethod
+    def from_records(cls, records, object_id=None, center=None, solution=None):
+        """Build from EphemerisRecord rows (see jpl_horizons_query.stream_horizons)"""
+        records = [r for r in records if r.dra_cosd is not None and r.ddec_dt is not None]
+        return cls(
+            [horizons_time_to_jd(r.utc_time) for r in records],
+            [r.ra_deg for r in records],
+            [r.dec_deg for r in records],
+            [r.dra_cosd for r in records],
+            [r.ddec_dt for r in records],
+            object_id=object_id, center=center, solution=solution,
+        )
+
+    def _estimate_segment_errors(self):
+        """Error bound (arcsec) for each grid segment"""
+        n_segments = self.jd.size - 1
+        h_hours = np.diff(self.jd) * 24.0
+
+        # Rate columns are rounded; the tangent error enters with weight <= 4/27
+        rate_term = 2.0 * (4.0 / 27.0) * h_hours * RATE_RESOLUTION
+
+        if self.jd.size < 3:
+            return np.full(n_segments, np.inf)
+
+        coarse = np.arange(0, self.jd.size, 2)
+        if coarse[-1] != self.jd.size - 1:
+            coarse = np.append(coarse, self.jd.size - 1)
+        skipped = np.setdiff1d(np.arange(self.jd.size), coarse)
+
+        predicted, _ = hermite_interpolate(self.jd[coarse], self.pos[coarse], self.vel[coarse], self.jd[skipped])
+        discrepancy = _separation_arcsec(predicted, self.pos[skipped])
+
+        # Each skipped node sits between fine segments (k-1, k); both inherit its estimate
+        richardson = np.zeros(n_segments)
+        for node, error in zip(skipped, discrepancy):
+            for segment in (node - 1, node):
+                if 0 <= segment < n_segments:
+                    richardson[segment] = max(richardson[segment], error)
+
+        # Segments not next to a skipped node take the largest estimate to their left
+        if skipped.size:
+            filled = np.maximum.accumulate(richardson)
+            richardson = np.where(richardson > 0, richardson, filled)
+
+        return SAFETY_FACTOR * richardson / 16.0 + rate_term
+
+    @property
+    def max_error_arcsec(self):
+        """Largest error bound over the whole grid"""
+        return float(np.max(self.segment_error_arcsec))
+
+    def radec(self, jd):
+        """
+        Interpolate RA/Dec at arbitrary epochs
+
+        Args:
+            jd: Array (or scalar) of Julian Dates inside the grid
+
+        Returns:
+            Tuple of arrays (ra_deg, dec_deg, error_bound_arcsec)
+        """
+        jd = np.atleast_1d(np.asarray(jd, dtype=np.float64))
+        if jd.size and (jd.min() < self.jd[0] or jd.max() > self.jd[-1]):
+            raise ValueError(
+                f"Epochs outside the interpolation grid ({self.jd[0]:.6f} - {self.jd[-1]:.6f})")
+
+        vectors, segment = hermite_interpolate(self.jd, self.pos, self.vel, jd)
+        ra, dec = _to_radec(vectors)
+        return ra, dec, self.segment_error_arcsec[segment]
+
+    def radec_mpc(self, mpc_timestamps):
+        """Interpolate RA/Dec at MPC timestamps (YYYY MM DD.dddddd)"""
+        from time_scales import mpc_to_utc
+        jd1, jd2 = mpc_to_utc(mpc_timestamps)
+        return self.radec(jd1 + jd2)
+
+def fetch_interpolated_ephemeris(object_id, observatory_code, start_time, stop_time, step_size='1 h'):
+    """
+    Fetch a coarse Horizons grid once and build an interpolator from it
+
+    Args:
+        object_id: SPK-ID or object name
+        observatory_code: MPC observatory code (e.g., 'G96')
+        start_time: UTC start of the grid ("YYYY-MM-DD HH:MM")
+        stop_time: UTC end of the grid
+        step_size: Horizons step size (e.g., '1 h', '30 m')
+
+    Returns:
+        InterpolatedEphemeris
+    """
+    center = observatory_code if observatory_code.startswith('@') else f'@{observatory_code}'
+    params = build_range_params(object_id, center, start_time, stop_time, step_size)
+
+    header = {}
+    records = list(stream_horizons(params, header))
+    if not records:
+        raise Exception("No ephemeris data found in response")
+
+    return InterpolatedEphemeris.from_records(
+        records, object_id=object_id, center=center, solution=header.get('solution'))
+
+def fetch_interpolators(object_id, observatory_codes, start_time, stop_time, step_size='1 h'):
+    """
+    Build one interpolator per observatory (one Horizons call each)
+
+    Returns:
+        Dictionary mapping observatory code to InterpolatedEphemeris
+    """
+    return {
+        code: fetch_interpolated_ephemeris(object_id, code, start_time, stop_time, step_size)
+        for code in dict.fromkeys(observatory_codes)
+    }
+
+def main():
+    """Main function"""
+    if len(sys.argv) < 7:
+        print(__doc__.split('Usage:', 1)[1].rstrip())
+        sys.exit(1)
+
+    object_id, observatory_code, start_time, stop_time, step_size = sys.argv[1:6]
+    mpc_timestamps = sys.argv[6:]
+
+    print("="*70)
+    print("INTERPOLATED EPHEMERIS")
+    print("="*70)
+    print()
+
+    try:
+        ephemeris = fetch_interpolated_ephemeris(object_id, observatory_code, start_time, stop_time, step_size)
+        ra, dec, error = ephemeris.radec_mpc(mpc_timestamps)
+    except Exception as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    from sexagesimal import degrees_to_dms, degrees_to_hms
+
+    if ephemeris.solution:
+        print(f"Solution:     {ephemeris.solution}")
+    print(f"Grid:         {ephemeris.jd.size} epochs, step {step_size}")
+    print(f"Max error:    {ephemeris.max_error_arcsec:.4f} arcsec")
+    print()
+    print(f"{'MPC Time':<20} {'RA (ICRF)':<16} {'DEC (ICRF)':<16} {'Error bound':<12}")
+    print("-"*70)
+    for timestamp, ra_text, dec_text, bound in zip(
+            mpc_timestamps, degrees_to_hms(ra, 4, ' '), degrees_to_dms(dec, 3, ' '), error):
+        print(f"{timestamp:<20} {ra_text:<16} {dec_text:<16} {bound:.4f}\"")
+    print("="*70)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+SQLite Ephemeris Store
+Parsed ephemeris rows kept on disk, indexed by (object, solution,
+observatory, epoch), so repeated lookups across sessions and processes
+never reach Horizons
+
+Rows live in one WITHOUT ROWID table whose primary key is that composite
+index, so a lookup is a single B-tree descent. Epochs are UTC Julian
+Dates; a requested time matches a stored row within EPOCH_TOLERANCE.
+The store remembers the newest orbit solution seen for each object and
+answers from that solution only: once Horizons reports a new solution,
+older rows stay in the database (for solution comparisons) but are no
+longer served. Rows of an older solution (e.g. from an SPK kernel or a
+replay recording) are stored without moving the object back to it.
+
+The database uses WAL journaling, so several processes (e.g. the
+batch_residuals.py workers) can read while one writes.
+
+Environment variables:
+    HORIZONS_EPHEMERIS_DB  Database file (default: ~/.cache/horizons/ephemeris.sqlite)
+    HORIZONS_NO_CACHE      Set to 1 to disable the store (as for the response cache)
+
+Usage:
+    python ephemeris_store.py                                  # statistics
+    python ephemeris_store.py nearest <object> <observatory> <JD>
+    python ephemeris_store.py range <object> <observatory> <JD start> <JD stop>
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from bisect import bisect_left
+
+from time_scales import date_to_jd
+
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'horizons', 'ephemeris.sqlite')
+
+# A requested time matches a stored epoch within 1 ms
+EPOCH_TOLERANCE = 0.001 / 86400.0
+
+# Above this many times, lookup() scans one epoch range instead of one query per time
+RANGE_LOOKUP_THRESHOLD = 32
+
+ROW_FIELDS = (
+    'utc_time', 'ra_icrf', 'dec_icrf', 'dra_cosd', 'ddec_dt',
+    'ra_3sigma', 'dec_3sigma', 'smaa_3sig', 'smia_3sig', 'theta',
+)
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS ephemeris (
+    object TEXT NOT NULL,
+    solution TEXT NOT NULL,
+    observatory TEXT NOT NULL,
+    epoch REAL NOT NULL,
+    {', '.join(f'{field} TEXT' for field in ROW_FIELDS)},
+    epoch_jd TEXT,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (object, solution, observatory, epoch)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS solutions (
+    object TEXT PRIMARY KEY,
+    solution TEXT NOT NULL,
+    seen_at REAL NOT NULL
+);
+"""
+
+_SELECT = f"SELECT epoch, {', '.join(ROW_FIELDS)}, solution, epoch_jd FROM ephemeris"
+_KEY = "WHERE object = ? AND solution = ? AND observatory = ?"
+
+def solution_number(solution):
+    """Number of a solution name ('JPL#44' -> 44), or None"""
+    match = re.search(r'#\s*(\d+)\s*$', solution or '')
+    return int(match.group(1)) if match else None
+
+def is_newer_solution(candidate, current):
+    """
+    True if solution name candidate supersedes current
+
+    Numbered solutions compare by number and always supersede unnumbered
+    names (e.g. an SPK file name); of two unnumbered names the latest seen
+    wins.
+    """
+    if not candidate or candidate == current:
+        return False
+    if current is None:
+        return True
+    new, old = solution_number(candidate), solution_number(current)
+    if old is not None:
+        return new is not None and new > old
+    return True
+
+def utc_to_jd(utc_time):
+    """UTC Julian Date of a 'YYYY-MM-DD HH:MM:SS.sss' time (as sent in TLIST)"""
+    date, _, clock = utc_time.strip().partition(' ')
+    year, month, day = (int(part) for part in date.split('-'))
+    hours, minutes, seconds = (clock.split(':') + ['0', '0', '0'])[:3] if clock else ('0', '0', '0')
+    return date_to_jd(year, month, day, int(hours), int(minutes), float(seconds))
+
+def _observatory(center):
+    """'@G96' and 'G96' are the same observatory"""
+    return center[1:] if center.startswith('@') else center
+
+def _row(record):
+    """Row dictionary in the shape of parse_ephemeris_row() plus solution/epoch_jd"""
+    row = {field: value for field, value in zip(ROW_FIELDS, record[1:]) if value is not None}
+    solution, epoch_jd = record[-2], record[-1]
+    row['solution'] = solution
+    if epoch_jd is not None:
+        row['epoch_jd'] = epoch_jd
+    return row
+
+class EphemerisStore:
+    """
+    SQLite store of parsed ephemeris rows
+
+    Args:
+        path: Database file (created if missing)
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as db:
+            db.executescript(_SCHEMA)
+
+    def _connection(self):
+        """One connection per thread and process (connections must not cross a fork)"""
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def current_solution(self, object_id):
+        """Newest solution name stored for an object, or None"""
+        record = self._connection().execute(
+            "SELECT solution FROM solutions WHERE object = ?", (object_id,)).fetchone()
+        return record[0] if record else None
+
+    def insert_rows(self, object_id, center, utc_times, rows, solution, epoch_jd=None):
+        """
+        Bulk-insert rows of one object and observatory
+
+        Args:
+            object_id: SPK-ID or object name, as queried
+            center: Observer location ('@G96' or 'G96')
+            utc_times: Requested UTC times, one per row
+            rows: Row dictionaries from parse_ephemeris
+            solution: Orbit solution name from the response header
+            epoch_jd: Solution epoch from the response header
+
+        Returns:
+            Number of rows written
+        """
+        if not solution:
+            # Rows that cannot be tied to a solution could go stale unnoticed
+            return 0
+        observatory = _observatory(center)
+        now = time.time()
+        records = [
+            (object_id, solution, observatory, utc_to_jd(utc_time),
+             *(row.get(field) for field in ROW_FIELDS), epoch_jd, now)
+            for utc_time, row in zip(utc_times, rows)
+        ]
+        placeholders = ', '.join('?' * (len(ROW_FIELDS) + 6))
+        db = self._connection()
+        with db:
+            db.executemany(f"INSERT OR REPLACE INTO ephemeris VALUES ({placeholders})", records)
+            self._advance_solution(db, object_id, solution, now)
+        return len(records)
+
+    def _advance_solution(self, db, object_id, solution, now):
+        record = db.execute("SELECT solution FROM solutions WHERE object = ?", (object_id,)).fetchone()
+        current = record[0] if record else None
+        if solution == current:
+            db.execute("UPDATE solutions SET seen_at = ? WHERE object = ?", (now, object_id))
+        elif is_newer_solution(solution, current):
+            db.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?)", (object_id, solution, now))
+
+    def advance_solution(self, object_id, solution):
+        """
+        Record a solution seen for an object (e.g. by a header probe)
+
+        Returns:
+            The object's current solution afterwards
+        """
+        db = self._connection()
+        with db:
+            self._advance_solution(db, object_id, solution, time.time())
+        return self.current_solution(object_id)
+
+    def lookup(self, object_id, center, utc_times, solution=None):
+        """
+        Stored rows for requested UTC times
+
+        Args:
+            object_id: SPK-ID or object name
+            center: Observer location
+            utc_times: UTC time strings ('YYYY-MM-DD HH:MM:SS.sss')
+            solution: Solution to read (default: the current one)
+
+        Returns:
+            Dictionary of utc_time -> row for the times found
+        """
+        solution = solution or self.current_solution(object_id)
+        if solution is None or not utc_times:
+            return {}
+        key = (object_id, solution, _observatory(center))
+        db = self._connection()
+        found = {}
+
+        if len(utc_times) <= RANGE_LOOKUP_THRESHOLD:
+            for utc_time in utc_times:
+                jd = utc_to_jd(utc_time)
+                record = db.execute(f"{_SELECT} {_KEY} AND epoch BETWEEN ? AND ? LIMIT 1",
+                                    key + (jd - EPOCH_TOLERANCE, jd + EPOCH_TOLERANCE)).fetchone()
+                if record is not None:
+                    found[utc_time] = _row(record)
+            return found
+
+        # Many times: one range scan, matched back by bisection
+        wanted = {utc_time: utc_to_jd(utc_time) for utc_time in utc_times}
+        records = db.execute(f"{_SELECT} {_KEY} AND epoch BETWEEN ? AND ? ORDER BY epoch",
+                             key + (min(wanted.values()) - EPOCH_TOLERANCE,
+                                    max(wanted.values()) + EPOCH_TOLERANCE)).fetchall()
+        epochs = [record[0] for record in records]
+        for utc_time, jd in wanted.items():
+            i = bisect_left(epochs, jd - EPOCH_TOLERANCE)
+            if i < len(epochs) and epochs[i] <= jd + EPOCH_TOLERANCE:
+                found[utc_time] = _row(records[i])
+        return found
+
+    def nearest(self, object_id, center, jd, solution=None, max_distance=None):
+        """
+        Stored row with the epoch closest to jd
+
+        Args:
+            max_distance: Largest acceptable |epoch - jd| in days (None: any)
+
+        Returns:
+            Row dictionary with 'epoch' (JD) and 'distance' (days), or None
+        """
+        solution = solution or self.current_solution(object_id)
+        if solution is None:
+            return None
+        key = (object_id, solution, _observatory(center))
+        db = self._connection()
+        candidates = [
+            db.execute(f"{_SELECT} {_KEY} AND epoch <= ? ORDER BY epoch DESC LIMIT 1", key + (jd,)).fetchone(),
+            db.execute(f"{_SELECT} {_KEY} AND epoch >= ? ORDER BY epoch ASC LIMIT 1", key + (jd,)).fetchone(),
+        ]
+        candidates = [record for record in candidates if record is not None]
+        if not candidates:
+            return None
+        record = min(candidates, key=lambda r: abs(r[0] - jd))
+        if max_distance is not None and abs(record[0] - jd) > max_distance:
+            return None
+        return dict(_row(record), epoch=record[0], distance=abs(record[0] - jd))
+
+    def range(self, object_id, center, jd_min, jd_max, solution=None):
+        """
+        Stored rows with jd_min <= epoch <= jd_max, in epoch order
+
+        Returns:
+            List of row dictionaries, each with 'epoch' (JD)
+        """
+        solution = solution or self.current_solution(object_id)
+        if solution is None:
+            return []
+        records = self._connection().execute(
+            f"{_SELECT} {_KEY} AND epoch BETWEEN ? AND ? ORDER BY epoch",
+            (object_id, solution, _observatory(center), jd_min, jd_max)).fetchall()
+        return [dict(_row(record), epoch=record[0]) for record in records]
+
+    def stats(self):
+        """Row counts per object, solution and observatory"""
+        return self._connection().execute(
+            "SELECT object, solution, observatory, COUNT(*), MIN(epoch), MAX(epoch) "
+            "FROM ephemeris GROUP BY object, solution, observatory").fetchall()
+
+_default_store = None
+
+def get_default_store():
+    """
+    Shared store configured from the environment
+
+    Returns:
+        EphemerisStore instance, or None if disabled
+    """
+    global _default_store
+    if os.environ.get('HORIZONS_NO_CACHE') == '1':
+        return None
+    if _default_store is None:
+        _default_store = EphemerisStore(os.environ.get('HORIZONS_EPHEMERIS_DB', DEFAULT_DB_PATH))
+    return _default_store
+
+def main():
+    """Show store statistics or run a nearest/range query"""
+    store = EphemerisStore(os.environ.get('HORIZONS_EPHEMERIS_DB', DEFAULT_DB_PATH))
+    args = sys.argv[1:]
+
+    if args and args[0] == 'nearest' and len(args) == 4:
+        row = store.nearest(args[1], args[2], float(args[3]))
+        if row is None:
+            print("No stored rows", file=sys.stderr)
+            sys.exit(1)
+        print(f"JD {row['epoch']:.6f} ({row['distance'] * 86400.0:.1f} s away), solution {row['solution']}")
+        print(f"  {row['utc_time']}  RA {row.get('ra_icrf')}  DEC {row.get('dec_icrf')}")
+        return
+
+    if args and args[0] == 'range' and len(args) == 5:
+        rows = store.range(args[1], args[2], float(args[3]), float(args[4]))
+        for row in rows:
+            print(f"{row['epoch']:.6f}  {row['utc_time']:<26} {row.get('ra_icrf', ''):<16} "
+                  f"{row.get('dec_icrf', ''):<16} {row['solution']}")
+        print(f"{len(rows)} rows")
+        return
+
+    if args:
+        print(__doc__.split('Usage:', 1)[1].rstrip())
+        sys.exit(1)
+
+    print(f"Database: {store.path}")
+    print(f"{'Object':<16} {'Solution':<16} {'Obs':<6} {'Rows':>10} {'First JD':>16} {'Last JD':>16}")
+    print("-"*86)
+    for object_id, solution, observatory, count, first, last in store.stats():
+        print(f"{object_id:<16} {solution:<16} {observatory:<6} {count:>10,} {first:>16.6f} {last:>16.6f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Async JPL Horizons Client
+Runs many Horizons queries concurrently without overloading JPL
+
+- Concurrency is bounded by an AIMD limit: it grows by about one slot per
+  window of fast responses and is halved when latency exceeds the target
+  or Horizons answers 429/503.
+- 429, 502, 503 and 504 responses, timeouts and connection errors are
+  retried with exponential backoff and full jitter (Retry-After is
+  honoured when present).
+- A circuit breaker opens after repeated failures so callers fail fast
+  while Horizons is down, then lets a single trial request through after
+  a cool-down.
+
+The response cache and local SPK backend are consulted first, exactly as
+in jpl_horizons_query.request_horizons(); query_batch() also answers
+epochs already in the ephemeris store.
+
+Usage:
+    python horizons_async_client.py <object_id> <observatory_code> <mpc_timestamp> [<mpc_timestamp> ...]
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+from async_http import AsyncHTTPClient
+from horizons_cache import get_default_cache, is_offline
+from jpl_horizons_query import (
+    HORIZONS_API_URL, build_params, check_one_solution, convert_mpc_timestamp, local_response,
+    pack_tlist, parse_ephemeris, stale_times, store_rows, stored_rows,
+)
+
+# HTTP statuses worth retrying
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# Statuses that signal overload and shrink the concurrency limit
+THROTTLE_STATUSES = (429, 503)
+
+class HorizonsError(Exception):
+    """A Horizons query failed"""
+
+class HorizonsHTTPError(HorizonsError):
+    """Horizons answered with a non-200 status"""
+
+    def __init__(self, status, text=''):
+        super().__init__(f"API request failed with status {status}")
+        self.status = status
+        self.text = text
+
+class HorizonsUnavailable(HorizonsError):
+    """The circuit breaker is open; Horizons is treated as down"""
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit adjusted by additive increase / multiplicative decrease
+
+    Args:
+        initial: Starting limit
+        minimum, maximum: Bounds of the limit
+        target_latency: Responses slower than this (seconds) count as congestion
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, target_latency=10.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.active = 0
+        self._condition = asyncio.Condition()
+        self._last_decrease = 0.0
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < int(self.limit))
+            self.active += 1
+
+    async def release(self):
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    def on_success(self, latency):
+        """Record a completed request"""
+        if latency > self.target_latency:
+            self.on_congestion(latency)
+        else:
+            # +1 per full window of successes
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+    def on_congestion(self, latency=None):
+        """Halve the limit, at most once per round trip"""
+        now = time.monotonic()
+        window = latency if latency is not None else self.target_latency
+        if now - self._last_decrease < window:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit / 2.0)
+
+class CircuitBreaker:
+    """
+    Fail fast after repeated upstream failures
+
+    Args:
+        failure_threshold: Consecutive failures that open the circuit
+        reset_timeout: Seconds to stay open before allowing a trial request
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def check(self):
+        """Raise HorizonsUnavailable unless a request may be sent now"""
+        state = self.state
+        if state == 'open' or (state == 'half-open' and self._trial_running):
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            raise HorizonsUnavailable(
+                f"JPL Horizons unavailable (circuit open, retry in {max(remaining, 0):.0f} s)")
+        if state == 'half-open':
+            self._trial_running = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_running or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._trial_running = False
+
+    def release_trial(self):
+        """End a trial request without an outcome (e.g. cancelled), so another may run"""
+        self._trial_running = False
+
+def backoff_delay(attempt, base=1.0, cap=60.0, retry_after=None):
+    """
+    Delay before retry number `attempt` (0-based)
+
+    Full jitter: uniform in [0, min(cap, base * 2**attempt)], but never
+    shorter than a Retry-After value given in seconds.
+    """
+    delay = random.uniform(0.0, min(cap, base * 2 ** attempt))
+    if retry_after:
+        try:
+            delay = max(delay, min(cap, float(retry_after)))
+        except ValueError:
+            pass
+    return delay
+
+class AsyncHorizonsClient:
+    """
+    Asyncio Horizons API client
+
+    Args:
+        url: Horizons API URL
+        max_concurrency: Upper bound of the adaptive concurrency limit
+        initial_concurrency: Starting concurrency limit
+        target_latency: Latency (seconds) above which the limit is reduced
+        max_retries: Retries per request after the first attempt
+        timeout: Timeout in seconds for one HTTP request
+        failure_threshold, reset_timeout: Circuit breaker settings
+    """
+
+    def __init__(self, url=HORIZONS_API_URL, max_concurrency=16, initial_concurrency=4,
+                 target_latency=10.0, max_retries=5, timeout=30,
+                 failure_threshold=5, reset_timeout=30.0):
+        self.url = url
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.http = AsyncHTTPClient(timeout=timeout, max_idle_per_host=max_concurrency)
+        self.limiter = AdaptiveLimiter(min(initial_concurrency, max_concurrency), 1,
+                                       max_concurrency, target_latency)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.requests = 0
+        self.retries = 0
+        self.cache_hits = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.http.close()
+
+    def stats(self):
+        """Counters and the current limiter/breaker state"""
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'cache_hits': self.cache_hits,
+            'concurrency_limit': int(self.limiter.limit),
+            'active': self.limiter.active,
+            'circuit': self.breaker.state,
+        }
+
+    async def _send(self, params):
+        """One HTTP attempt within the concurrency limit"""
+        self.breaker.check()
+        await self.limiter.acquire()
+        start = time.monotonic()
+        try:
+            # The circuit may have opened while this request was queued
+            if self.breaker.state == 'open':
+                self.breaker.check()
+            self.requests += 1
+            response = await self.http.request('GET', self.url, params=params, timeout=self.timeout)
+        except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError):
+            self.limiter.on_congestion()
+            self.breaker.record_failure()
+            raise
+        except ValueError:
+            # Malformed response (e.g. header section or body too large)
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Cancelled: no outcome, but the half-open trial must not stay claimed
+            self.breaker.release_trial()
+            raise
+        finally:
+            await self.limiter.release()
+
+        latency = time.monotonic() - start
+        if response.status in THROTTLE_STATUSES:
+            self.limiter.on_congestion(latency)
+        else:
+            self.limiter.on_success(latency)
+
+        if response.status >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    async def request(self, params, fresh=False):
+        """
+        Horizons response text for a parameter set (see build_params)
+
+        Args:
+            fresh: Do not answer from the response cache (the response is still stored)
+
+        Raises:
+            HorizonsHTTPError: non-retryable status, or retries exhausted
+            HorizonsUnavailable: circuit breaker open
+            HorizonsError: timeouts / connection errors after all retries
+        """
+        local = local_response(params)
+        if local is not None:
+            return local
+
+        cache = get_default_cache()
+        if cache is not None and not fresh:
+            cached = cache.get(params)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+
+        if is_offline():
+            raise HorizonsError("Response not in cache and HORIZONS_OFFLINE=1 is set")
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = await self._send(params)
+            except asyncio.TimeoutError:
+                error = HorizonsError("Request timed out")
+            except (OSError, asyncio.IncompleteReadError) as e:
+                error = HorizonsError(f"Request failed: {str(e)}")
+            except ValueError as e:
+                raise HorizonsError(f"Invalid response: {str(e)}") from e
+            else:
+                if response.status == 200:
+                    if cache is not None:
+                        cache.put(params, response.text)
+                    return response.text
+                error = HorizonsHTTPError(response.status, response.text)
+                if response.status not in RETRY_STATUSES:
+                    raise error
+                retry_after = response.headers.get('retry-after')
+
+            if attempt == self.max_retries:
+                raise error
+            self.retries += 1
+            await asyncio.sleep(backoff_delay(attempt, retry_after=retry_after))
+
+    async def query(self, object_id, observatory_code, mpc_timestamp):
+        """
+        Parsed ephemeris for one observation (see parse_ephemeris)
+        """
+        center = observatory_code if observatory_code.startswith('@') else f'@{observatory_code}'
+        params = build_params(object_id, center, [convert_mpc_timestamp(mpc_timestamp)])
+        return parse_ephemeris(await self.request(params))
+
+    async def query_batch(self, object_id, observatory_code, mpc_timestamps):
+        """
+        Parsed ephemeris rows for many epochs, with the TLIST requests in flight together
+
+        Stored rows of another solution than the one Horizons answers with
+        are requested again, as in fetch_ephemeris_rows.
+
+        Returns:
+            List of row dictionaries, one per timestamp
+        """
+        loop = asyncio.get_running_loop()
+        center = observatory_code if observatory_code.startswith('@') else f'@{observatory_code}'
+        utc_times = [convert_mpc_timestamp(t) for t in mpc_timestamps]
+        unique_times = sorted(set(utc_times))
+        # The ephemeris store is SQLite: keep its calls off the event loop
+        rows_by_time = await loop.run_in_executor(None, stored_rows, object_id, center, unique_times)
+
+        async def fetch(batch, fresh):
+            data = parse_ephemeris(await self.request(build_params(object_id, center, batch), fresh))
+            if len(data['rows']) != len(batch):
+                raise HorizonsError(
+                    f"Expected {len(batch)} ephemeris rows but Horizons returned {len(data['rows'])}")
+            await loop.run_in_executor(None, store_rows, object_id, center, batch, data)
+            extra = {key: data[key] for key in ('solution', 'epoch_jd') if key in data}
+            return {t: dict(row, **extra) for t, row in zip(batch, data['rows'])}, data.get('solution')
+
+        async def fetch_all(times, fresh=False):
+            solutions = []
+            for rows, solution in await asyncio.gather(
+                    *(fetch(batch, fresh) for batch in pack_tlist(object_id, center, times))):
+                rows_by_time.update(rows)
+                solutions.append(solution)
+            return solutions
+
+        fetched = await fetch_all([t for t in unique_times if t not in rows_by_time])
+        stale = stale_times(rows_by_time, unique_times, fetched)
+        if stale:
+            await fetch_all(stale, fresh=True)
+            check_one_solution(rows_by_time, unique_times)
+        return [dict(rows_by_time[t]) for t in utc_times]
+
+    async def query_many(self, queries):
+        """
+        Run many (object_id, observatory_code, mpc_timestamp) queries concurrently
+
+        Returns:
+            List in the order of queries; each entry is the parsed ephemeris
+            or the exception raised for that query
+        """
+        return await asyncio.gather(*(self.query(*q) for q in queries), return_exceptions=True)
+
+async def _run(object_id, observatory_code, timestamps):
+    async with AsyncHorizonsClient() as client:
+        start = time.perf_counter()
+        results = await client.query_many([(object_id, observatory_code, t) for t in timestamps])
+        elapsed = time.perf_counter() - start
+        stats = client.stats()
+
+    print(f"{'MPC Time':<20} {'RA (ICRF)':<16} {'DEC (ICRF)':<16} {'Solution'}")
+    print("-"*70)
+    failed = 0
+    for timestamp, result in zip(timestamps, results):
+        if isinstance(result, Exception):
+            failed += 1
+            print(f"{timestamp:<20} ERROR: {result}")
+        else:
+            print(f"{timestamp:<20} {result['ra_icrf']:<16} {result['dec_icrf']:<16} "
+                  f"{result.get('solution', 'N/A')}")
+    print("="*70)
+    print(f"Queries: {len(timestamps)} ({failed} failed) in {elapsed:.2f} s")
+    print(f"HTTP requests: {stats['requests']}, retries: {stats['retries']}, "
+          f"cache hits: {stats['cache_hits']}, final concurrency: {stats['concurrency_limit']}")
+    return failed
+
+def main():
+    """Main function"""
+    if len(sys.argv) < 4:
+        print(__doc__.split('Usage:', 1)[1].rstrip())
+        sys.exit(1)
+
+    print("="*70)
+    print("JPL HORIZONS ASYNC QUERY")
+    print("="*70)
+    failed = asyncio.run(_run(sys.argv[1], sys.argv[2], sys.argv[3:]))
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+JPL Horizons API Proxy (asyncio mode)
+Serves the same /api/horizons, /api/horizons_file.api and /health endpoints
+as jpl_horizons_server.py from a single asyncio event loop.
+
+Pending client connections cost no threads: every request waits on the
+event loop, and upstream calls to Horizons are limited by a per-host
+concurrency cap. Requests beyond the cap queue in arrival order instead of
+blocking a worker. Identical requests already in flight share one upstream
+call. /metrics and the Server-Timing header work as in jpl_horizons_server.py.
+
+Usage:
+    python horizons_async_proxy.py [--port 5000] [--max-upstream 8] [--cache]
+    python jpl_horizons_server.py --async
+"""
+
+import argparse
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from async_http import AsyncHTTPClient, json_response, start_server
+from horizons_cache import cache_key, get_default_cache
+from jpl_horizons_query import file_api_params, file_api_url
+from proxy_metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, ProxyMetrics, server_timing
+
+HORIZONS_URL = 'https://ssd.jpl.nasa.gov/api/horizons.api'
+
+# Default number of simultaneous upstream requests per host
+DEFAULT_MAX_UPSTREAM = 8
+
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+    'Access-Control-Allow-Headers': '*',
+}
+
+class UpstreamLimiter:
+    """
+    Per-host cap on concurrent upstream requests
+
+    Callers beyond the cap wait on the host's semaphore, which wakes them
+    in arrival order.
+    """
+
+    def __init__(self, max_per_host=DEFAULT_MAX_UPSTREAM):
+        self.max_per_host = max_per_host
+        self._semaphores = {}
+        self.active = 0
+        self.queued = 0
+
+    async def run(self, host, fn):
+        """Await fn() once a slot for host is free"""
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self.max_per_host)
+
+        self.queued += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        self.active += 1
+        try:
+            return await fn()
+        finally:
+            self.active -= 1
+            semaphore.release()
+
+class AsyncSingleFlight:
+    """Share one in-flight task between concurrent callers with the same key"""
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, fn):
+        """
+        Returns:
+            Tuple of (result, shared) where shared is True if another
+            caller started the call
+        """
+        task = self._tasks.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        # A client disconnecting must not cancel the call other clients share
+        return await asyncio.shield(task), shared
+
+class HorizonsProxy:
+    """
+    Request handler for the asyncio proxy
+
+    Args:
+        upstream_url: Horizons API URL to forward to (file API POSTs go to
+                      the file API next to it, see file_api_url)
+        max_upstream: Concurrent upstream requests allowed per host
+        timeout: Upstream timeout in seconds
+        recorder: Optional RecordingStore that saves every upstream response
+        cache: Optional HorizonsCache answering repeated queries
+    """
+
+    def __init__(self, upstream_url=HORIZONS_URL, max_upstream=DEFAULT_MAX_UPSTREAM, timeout=30,
+                 recorder=None, cache=None):
+        self.upstream_url = upstream_url
+        self.upstream_file_url = file_api_url(upstream_url)
+        self.recorder = recorder
+        self.cache = cache
+        self.metrics = ProxyMetrics()
+        self.upstream_host = urlsplit(upstream_url).netloc
+        self.timeout = timeout
+        self.client = AsyncHTTPClient(timeout=timeout, max_idle_per_host=max_upstream)
+        self.limiter = UpstreamLimiter(max_upstream)
+        self.inflight = AsyncSingleFlight()
+
+    async def fetch_upstream(self, params, form=None):
+        """
+        Forward a request to Horizons within the per-host limit
+
+        Args:
+            params: Query parameters (recorded under these for either API)
+            form: (content type, body) of a file API POST, forwarded as is
+
+        Returns:
+            Tuple of (status_code, response_text)
+        """
+        async def call():
+            with self.metrics.upstream() as upstream:
+                if form is None:
+                    response = await self.client.request('GET', self.upstream_url, params=params)
+                else:
+                    response = await self.client.request('POST', self.upstream_file_url, body=form[1],
+                                                         headers={'Content-Type': form[0]})
+                upstream.status = response.status
+            if self.recorder is not None:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.recorder.record, params, response.status, response.text)
+            return response.status, response.text
+
+        return await self.limiter.run(self.upstream_host, call)
+
+    async def query_horizons(self, request, timing):
+        """Proxy endpoint for JPL Horizons API (GET) and its file API (POST)"""
+        form = None
+        params = request.args
+        if request.method == 'POST':
+            form = (request.headers.get('content-type', ''), request.body)
+            try:
+                params = file_api_params(*form)
+            except ValueError as e:
+                return json_response(400, {'error': str(e)}, CORS_HEADERS)
+        loop = asyncio.get_running_loop()
+        if self.cache is not None:
+            cached = await loop.run_in_executor(None, self.cache.get, params)
+            if cached is not None:
+                timing['cache'] = 'hit'
+                headers = {'Content-Type': 'text/plain'}
+                headers.update(CORS_HEADERS)
+                return 200, headers, cached
+
+        timing['cache'] = 'miss'
+        start = time.perf_counter()
+        try:
+            (status_code, text), shared = await self.inflight.do(
+                cache_key(params), lambda: self.fetch_upstream(params, form))
+        except asyncio.TimeoutError:
+            return json_response(504, {'error': 'Request to JPL Horizons timed out'}, CORS_HEADERS)
+        except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+            return json_response(500, {'error': f'Request failed: {str(e)}'}, CORS_HEADERS)
+        finally:
+            timing['upstream'] = time.perf_counter() - start
+
+        if shared:
+            timing['cache'] = 'coalesced'
+        elif status_code == 200 and self.cache is not None:
+            await loop.run_in_executor(None, self.cache.put, params, text)
+
+        if status_code != 200:
+            return json_response(status_code, {
+                'error': f'JPL Horizons API error: {status_code}',
+                'details': text
+            }, CORS_HEADERS)
+
+        headers = {'Content-Type': 'text/plain'}
+        headers.update(CORS_HEADERS)
+        return 200, headers, text
+
+    async def health(self, request):
+        """Health check endpoint"""
+        return json_response(200, {
+            'status': 'ok',
+            'service': 'JPL Horizons Proxy',
+            'mode': 'asyncio',
+            'upstream_active': self.limiter.active,
+            'upstream_queued': self.limiter.queued,
+        }, CORS_HEADERS)
+
+    async def metrics_endpoint(self, request):
+        """Prometheus metrics endpoint"""
+        headers = {'Content-Type': METRICS_CONTENT_TYPE}
+        headers.update(CORS_HEADERS)
+        return 200, headers, self.metrics.render()
+
+    async def route(self, request, timing):
+        try:
+            if request.method == 'OPTIONS':
+                return 204, dict(CORS_HEADERS), b''
+            if request.method == 'GET' and request.path == '/api/horizons':
+                return await self.query_horizons(request, timing)
+            if request.method == 'POST' and request.path in ('/api/horizons_file', '/api/horizons_file.api'):
+                return await self.query_horizons(request, timing)
+            if request.method == 'GET' and request.path == '/health':
+                return await self.health(request)
+            if request.method == 'GET' and request.path == '/metrics':
+                return await self.metrics_endpoint(request)
+            return json_response(404, {'error': 'Not found'}, CORS_HEADERS)
+        except Exception as e:
+            return json_response(500, {'error': f'Server error: {str(e)}'}, CORS_HEADERS)
+
+    async def __call__(self, request):
+        start = time.perf_counter()
+        timing = {}
+        status, headers, body = await self.route(request, timing)
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        elapsed = time.perf_counter() - start
+        cache = timing.get('cache')
+        if cache is not None:
+            self.metrics.record_cache(cache)
+        headers['Server-Timing'] = server_timing(cache, upstream=timing.get('upstream'), total=elapsed)
+        self.metrics.record_response(request.path, status, len(body), elapsed)
+        return status, headers, body
+
+async def serve(host='0.0.0.0', port=5000, max_upstream=DEFAULT_MAX_UPSTREAM, timeout=30,
+                upstream_url=HORIZONS_URL, record_dir=None, use_cache=False):
+    """Run the asyncio proxy until cancelled"""
+    recorder = None
+    if record_dir:
+        from horizons_replay import RecordingStore
+        recorder = RecordingStore(record_dir)
+    cache = get_default_cache() if use_cache else None
+    proxy = HorizonsProxy(upstream_url, max_upstream, timeout, recorder, cache)
+    server = await start_server(proxy, host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await proxy.client.close()
+
+def main(argv=None):
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Asyncio JPL Horizons API proxy')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--max-upstream', type=int, default=DEFAULT_MAX_UPSTREAM,
+                        help='concurrent upstream requests per host (default: %(default)s)')
+    parser.add_argument('--timeout', type=float, default=30,
+                        help='upstream timeout in seconds (default: %(default)s)')
+    parser.add_argument('--upstream', default=HORIZONS_URL,
+                        help='Horizons API URL to forward to (default: %(default)s)')
+    parser.add_argument('--record', metavar='DIR',
+                        help='save every upstream response to DIR for horizons_replay.py')
+    parser.add_argument('--cache', action='store_true',
+                        help='answer repeated queries from the shared response cache')
+    args = parser.parse_args(argv)
+
+    print("="*70)
+    print("JPL Horizons API Proxy Server (asyncio)")
+    print("="*70)
+    print(f"\nStarting server on http://localhost:{args.port}")
+    print(f"Upstream: {args.upstream}")
+    print(f"Upstream concurrency cap: {args.max_upstream} per host")
+    if args.record:
+        print(f"Recording upstream responses to: {args.record}")
+    print("\nEndpoints:")
+    print(f"  - http://localhost:{args.port}/api/horizons  (Horizons API proxy)")
+    print(f"  - http://localhost:{args.port}/api/horizons_file.api  (file API proxy, POST)")
+    print(f"  - http://localhost:{args.port}/health        (Health check)")
+    print(f"  - http://localhost:{args.port}/metrics       (Prometheus metrics)")
+    print("\nPress Ctrl+C to stop the server")
+    print("="*70)
+    print()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_upstream, args.timeout,
+                          args.upstream, args.record, args.cache))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
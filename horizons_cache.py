@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Horizons Response Cache
+Persistent on-disk cache for JPL Horizons API responses
+
+Entries are content-addressed by a hash of the canonicalized query
+parameters, so the same ephemeris request is only downloaded once no
+matter how the parameters were ordered, quoted or time-formatted. The
+cache is bounded in size with least-recently-used eviction, and entries
+for an object are dropped as soon as a newer response shows that its
+orbit solution name has changed. Only complete ephemeris responses (with
+$$SOE and $$EOE markers) are stored, never Horizons error text.
+
+Environment variables:
+    HORIZONS_CACHE_DIR     Cache directory (default: ~/.cache/horizons)
+    HORIZONS_CACHE_MAX_MB  Size bound in megabytes (default: 256)
+    HORIZONS_NO_CACHE      Set to 1 to disable the cache
+    HORIZONS_OFFLINE       Set to 1 to never contact Horizons on a cache miss
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:     # Windows: solutions.json updates are not locked
+    fcntl = None
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'horizons')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_TIME_RE = re.compile(
+    r'(\d{4})-(\d{1,2}|[A-Za-z]{3})-(\d{1,2})(?:[ T](\d{1,2}):(\d{2})(?::(\d{2}(?:\.\d*)?))?)?'
+)
+_MONTHS = {m: i for i, m in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], start=1)}
+
+def _normalize_time(match):
+    """Rewrite one calendar time as 'YYYY-MM-DD HH:MM:SS.ssssss'"""
+    year, month, day, hours, minutes, seconds = match.groups()
+    month = _MONTHS.get(month.title(), None) if month.isalpha() else int(month)
+    if month is None:
+        return match.group(0)
+    return (f"{int(year):04d}-{month:02d}-{int(day):02d} "
+            f"{int(hours or 0):02d}:{int(minutes or 0):02d}:{float(seconds or 0):09.6f}")
+
+def _normalize_value(key, value):
+    """Strip quoting and whitespace differences from one parameter value"""
+    value = str(value).strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"" and value.count(value[0]) == 2:
+        value = value[1:-1].strip()
+
+    if key in ('TLIST', 'START_TIME', 'STOP_TIME'):
+        # Time lists may be quoted per entry; compare the times themselves
+        value = _TIME_RE.sub(_normalize_time, value)
+        value = ' '.join(part.strip("'\"") for part in value.replace("' '", "'\n'").split('\n'))
+    elif key not in ('COMMAND', 'CENTER'):
+        value = value.upper()
+
+    return ' '.join(value.split())
+
+def canonicalize_params(params):
+    """
+    Canonicalize a Horizons parameter set
+
+    Args:
+        params: Dictionary of Horizons query parameters
+
+    Returns:
+        Sorted list of (KEY, value) pairs with quoting, case and time
+        formatting normalized
+    """
+    canonical = {}
+    for key, value in params.items():
+        key = key.strip().upper()
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(str(v) for v in value)
+        canonical[key] = _normalize_value(key, value)
+    return sorted(canonical.items())
+
+def cache_key(params):
+    """
+    Content address for a Horizons query
+
+    Args:
+        params: Dictionary of Horizons query parameters
+
+    Returns:
+        Hex SHA-256 digest of the canonicalized parameters
+    """
+    payload = json.dumps(canonicalize_params(params), separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _object_of(params):
+    """Canonical object identifier (COMMAND) of a query"""
+    return dict(canonicalize_params(params)).get('COMMAND', '').rstrip(';').strip()
+
+def _solution_of(lines):
+    """Orbit solution name from the header lines of a response, or None"""
+    from jpl_horizons_query import iter_ephemeris_lines
+    header = {}
+    # Stops reading at the first ephemeris row
+    next(iter_ephemeris_lines(lines, header), None)
+    return header.get('solution')
+
+class DiscardEntry(Exception):
+    """Raise inside HorizonsCache.writer() to drop the entry without an error"""
+
+def _is_complete(lines):
+    """True if a response has an ephemeris table ($$SOE ... $$EOE)"""
+    started = False
+    for line in lines:
+        if not started:
+            started = '$$SOE' in line
+            if not started:
+                continue
+        if '$$EOE' in line:
+            return True
+    return False
+
+class HorizonsCache:
+    """
+    Size-bounded LRU cache of Horizons responses stored in a directory
+
+    Each entry is a pair of files, <key>.txt with the raw response and
+    <key>.json with its metadata. The file modification time records the
+    last use and drives eviction. solutions.json records the latest
+    solution name seen for each object.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key, suffix):
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def _load_solutions(self):
+        try:
+            with open(self._path('solutions', '.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_solutions(self, solutions):
+        fd, tmp = tempfile.mkstemp(prefix='solutions.', suffix='.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(solutions, f, indent=1, sort_keys=True)
+            os.replace(tmp, self._path('solutions', '.json'))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    @contextmanager
+    def _solutions_lock(self):
+        """Serialize read-modify-write of solutions.json across processes"""
+        with open(self._path('solutions', '.lock'), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load_meta(self, key):
+        try:
+            with open(self._path(key, '.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _remove(self, key):
+        for suffix in ('.txt', '.json'):
+            try:
+                os.remove(self._path(key, suffix))
+            except FileNotFoundError:
+                pass
+
+    def _entries(self):
+        """Yield (key, size, last_used) for every stored response"""
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.txt') and len(entry.name) == 68:
+                    stat = entry.stat()
+                    yield entry.name[:-4], stat.st_size, stat.st_mtime
+
+    def open(self, params):
+        """
+        Open a cached response for reading line by line
+
+        Args:
+            params: Dictionary of Horizons query parameters
+
+        Returns:
+            Text file object positioned at the start of the response, or
+            None on a miss
+        """
+        key = cache_key(params)
+        meta = self._load_meta(key)
+
+        if meta is not None and meta.get('solution'):
+            current = self._load_solutions().get(meta['object'])
+            if current and current != meta['solution']:
+                # A newer solution has been seen for this object
+                self._remove(key)
+
+        try:
+            f = open(self._path(key, '.txt'))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        os.utime(self._path(key, '.txt'))
+        self.hits += 1
+        return f
+
+    def get(self, params):
+        """
+        Look up a cached response
+
+        Args:
+            params: Dictionary of Horizons query parameters
+
+        Returns:
+            Response text, or None on a miss
+        """
+        f = self.open(params)
+        if f is None:
+            return None
+        with f:
+            return f.read()
+
+    @contextmanager
+    def writer(self, params):
+        """
+        Write a response into the cache incrementally
+
+        The entry is stored only if the with-block completes and the
+        response holds a complete ephemeris table; a response abandoned
+        part way through, or an error message, is discarded. Raising
+        DiscardEntry in the block drops the entry quietly.
+
+        Args:
+            params: Dictionary of Horizons query parameters
+
+        Yields:
+            Text file object to write the raw response to
+        """
+        key = cache_key(params)
+        fd, tmp = tempfile.mkstemp(prefix=key + '.', suffix='.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                yield f
+        except DiscardEntry:
+            os.remove(tmp)
+            return
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self._commit(params, key, tmp)
+
+    def put(self, params, response_text):
+        """
+        Store a response, invalidating entries from older solutions
+
+        Args:
+            params: Dictionary of Horizons query parameters
+            response_text: Raw response text from Horizons (not stored
+                           unless it holds an ephemeris table)
+        """
+        with self.writer(params) as f:
+            f.write(response_text)
+
+    def _commit(self, params, key, tmp):
+        """
+        Move a fully written response into place and record its metadata
+
+        Returns:
+            False if the response was discarded (no ephemeris table)
+        """
+        with open(tmp) as f:
+            complete = _is_complete(f)
+        if not complete:
+            os.remove(tmp)
+            return False
+
+        object_id = _object_of(params)
+        with open(tmp) as f:
+            solution = _solution_of(f)
+
+        if solution:
+            with self._solutions_lock():
+                solutions = self._load_solutions()
+                if solutions.get(object_id) != solution:
+                    if object_id in solutions:
+                        self.invalidate(object_id, keep_solution=solution)
+                    solutions[object_id] = solution
+                    self._save_solutions(solutions)
+
+        meta = {
+            'object': object_id,
+            'solution': solution,
+            'params': canonicalize_params(params),
+        }
+        with open(self._path(key, '.json'), 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path(key, '.txt'))
+
+        self.evict()
+        return True
+
+    def invalidate(self, object_id, keep_solution=None):
+        """
+        Drop cached responses for an object
+
+        Args:
+            object_id: Object identifier (COMMAND value)
+            keep_solution: Keep entries from this solution name
+
+        Returns:
+            Number of entries removed
+        """
+        object_id = object_id.rstrip(';').strip()
+        removed = 0
+        for key, _, _ in list(self._entries()):
+            meta = self._load_meta(key)
+            if meta and meta.get('object') == object_id and meta.get('solution') != keep_solution:
+                self._remove(key)
+                removed += 1
+        return removed
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes"""
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
+
+    def clear(self):
+        """Remove every cached response"""
+        for key, _, _ in list(self._entries()):
+            self._remove(key)
+
+_default_cache = None
+
+def get_default_cache():
+    """
+    Shared cache configured from the environment
+
+    Returns:
+        HorizonsCache instance, or None if caching is disabled
+    """
+    global _default_cache
+    if os.environ.get('HORIZONS_NO_CACHE') == '1':
+        return None
+    if _default_cache is None:
+        cache_dir = os.environ.get('HORIZONS_CACHE_DIR', DEFAULT_CACHE_DIR)
+        max_mb = float(os.environ.get('HORIZONS_CACHE_MAX_MB', DEFAULT_MAX_BYTES / (1024 * 1024)))
+        _default_cache = HorizonsCache(cache_dir, int(max_mb * 1024 * 1024))
+    return _default_cache
+
+def is_offline():
+    """True if Horizons must not be contacted on a cache miss"""
+    return os.environ.get('HORIZONS_OFFLINE') == '1'
+
+def main():
+    """Show cache statistics or clear the cache"""
+    cache = HorizonsCache(os.environ.get('HORIZONS_CACHE_DIR', DEFAULT_CACHE_DIR))
+
+    if len(sys.argv) > 1 and sys.argv[1] == 'clear':
+        cache.clear()
+        print(f"✓ Cleared {cache.cache_dir}")
+        return
+
+    entries = list(cache._entries())
+    total = sum(size for _, size, _ in entries)
+    print(f"Cache directory: {cache.cache_dir}")
+    print(f"Entries:         {len(entries)}")
+    print(f"Size:            {total / (1024 * 1024):.2f} MB")
+    for object_id, solution in sorted(cache._load_solutions().items()):
+        print(f"  {object_id:<20} {solution}")
+
+if __name__ == '__main__':
+    main()
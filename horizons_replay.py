@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Horizons Record/Replay
+Stand-in for the JPL Horizons API, for offline and load testing
+
+Recording: run either proxy with --record DIR and every upstream response
+is saved under DIR (one JSON file per canonical query, see cache_key).
+
+Replay: `serve` answers /api/horizons (GET) and the file API
+/api/horizons_file.api (POST of a batch input file, matched by the same
+parameter set) from the recordings, with optional
+injected latency, random error responses and a throughput cap, so the
+proxies, query scripts and batch clients can be exercised with no network.
+With --synthesize, queries that were never recorded get a generated
+ephemeris table instead of a 404.
+
+`load` drives any Horizons-compatible endpoint (the replay server, either
+proxy) with concurrent requests and reports throughput and latency.
+
+Usage:
+    python jpl_horizons_server.py --record recordings/
+    python horizons_replay.py serve recordings/ [--port 5001] [--latency-ms 200]
+        [--jitter-ms 50] [--error-rate 0.02] [--error-status 503] [--max-rps 500]
+        [--synthesize]
+    python horizons_replay.py load http://localhost:5001/api/horizons
+        [--requests 10000] [--concurrency 64] [--distinct 100]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from async_http import AsyncHTTPClient, json_response, start_server
+from horizons_cache import cache_key
+
+class RecordingStore:
+    """
+    Recorded Horizons responses, one JSON file per canonical query
+
+    Args:
+        directory: Directory holding the recordings (created if missing)
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, params):
+        return os.path.join(self.directory, cache_key(params) + '.json')
+
+    def record(self, params, status, text):
+        """Save one upstream response (written atomically)"""
+        entry = {'params': dict(params), 'status': status, 'body': text}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self.path(params))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self):
+        """
+        Read every recording into memory
+
+        Returns:
+            Dictionary mapping cache key to (status, body bytes)
+        """
+        recordings = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                entry = json.load(f)
+            recordings[name[:-5]] = (entry['status'], entry['body'].encode('utf-8'))
+        return recordings
+
+def _synthetic_times(params):
+    """UTC times of a query, from TLIST or START_TIME/STOP_TIME/STEP_SIZE"""
+    tlist = params.get('TLIST', '')
+    if tlist:
+        return re.findall(r"'([^']*)'", tlist) or tlist.split()
+
+    def parse(value):
+        return datetime.fromisoformat(value.strip().strip("'\"").replace('T', ' ')[:19])
+
+    start, stop = parse(params['START_TIME']), parse(params['STOP_TIME'])
+    match = re.match(r"\s*'?\s*(\d+)\s*([a-z]*)", params.get('STEP_SIZE', "'1 h'").lower())
+    value, unit = int(match.group(1)), match.group(2) or 'h'
+    step = timedelta(**{{'m': 'minutes', 'h': 'hours', 'd': 'days'}.get(unit[0], 'hours'): value})
+    times = []
+    while start <= stop:
+        times.append(start.strftime('%Y-%m-%d %H:%M:%S.000'))
+        start += step
+    return times
+
+def synthesize_response(params, rows=None):
+    """
+    Generate a Horizons-format observer table for a query
+
+    Positions follow a smooth track so the rows are realistic to parse;
+    they are not ephemerides of any real object.
+
+    Args:
+        params: Query parameters (TLIST or START/STOP/STEP)
+        rows: Number of rows to generate instead of the query's epochs
+
+    Returns:
+        Response text
+    """
+    times = _synthetic_times(params) if rows is None else [
+        f"2025-12-19 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}.000" for i in range(rows)]
+
+    lines = [
+        "*" * 79,
+        "Target body name: synthetic (replay server)",
+        "Solution name: SYNTHETIC#1",
+        "*" * 79,
+        " Date__(UT)__HR:MN:SC.fff     R.A._(ICRF)_DEC    dRA*cosD d(DEC)/dt  "
+        "RA_3sigma DEC_3sigma SMAA_3sig SMIA_3sig    Theta",
+        "*" * 79,
+        "$$SOE",
+    ]
+    for i, utc_time in enumerate(times):
+        ra_seconds = (40000.0 + 0.35 * i) % 86400.0
+        dec_arcsec = 19495.44 - 0.05 * i
+        sign = '-' if dec_arcsec < 0 else '+'
+        dec_arcsec = abs(dec_arcsec)
+        lines.append(
+            f" {utc_time}     "
+            f"{int(ra_seconds // 3600):02d} {int(ra_seconds % 3600 // 60):02d} {ra_seconds % 60:07.4f} "
+            f"{sign}{int(dec_arcsec // 3600):02d} {int(dec_arcsec % 3600 // 60):02d} {dec_arcsec % 60:06.3f}"
+            f"   12.34567  -3.21098   0.412   0.238   0.451   0.201  112.34")
+    lines += ["$$EOE", "*" * 79, ""]
+    return '\n'.join(lines)
+
+class ThroughputCap:
+    """Spaces requests at least 1/max_rps apart (requests wait; none are refused)"""
+
+    def __init__(self, max_rps):
+        self.interval = 1.0 / max_rps
+        self._next = 0.0
+
+    async def wait(self):
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class ReplayServer:
+    """
+    Request handler serving recorded (or synthetic) Horizons responses
+
+    Args:
+        recordings: Dictionary from RecordingStore.load()
+        latency: Mean injected latency in seconds
+        jitter: Latency varies uniformly by +/- jitter seconds
+        error_rate: Fraction of requests answered with error_status
+        error_status: Status of injected errors (429 and 503 carry Retry-After)
+        max_rps: Throughput cap in requests per second (None for no cap)
+        synthesize: Generate a table for queries without a recording
+    """
+
+    def __init__(self, recordings, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_status=503, max_rps=None, synthesize=False):
+        self.recordings = recordings
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.cap = ThroughputCap(max_rps) if max_rps else None
+        self.synthesize = synthesize
+        self.counts = {'requests': 0, 'replayed': 0, 'synthesized': 0, 'missing': 0, 'injected_errors': 0}
+
+    async def horizons(self, params):
+        self.counts['requests'] += 1
+        if self.cap is not None:
+            await self.cap.wait()
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self.error_rate and random.random() < self.error_rate:
+            self.counts['injected_errors'] += 1
+            headers = {'Content-Type': 'text/plain'}
+            if self.error_status in (429, 503):
+                headers['Retry-After'] = '1'
+            return self.error_status, headers, b'Injected error (replay server)'
+
+        recorded = self.recordings.get(cache_key(params))
+        if recorded is not None:
+            self.counts['replayed'] += 1
+            status, body = recorded
+            return status, {'Content-Type': 'text/plain'}, body
+
+        if self.synthesize:
+            try:
+                body = synthesize_response(params)
+            except (KeyError, ValueError, AttributeError):
+                return json_response(400, {'error': 'Cannot synthesize a response for this query'})
+            self.counts['synthesized'] += 1
+            return 200, {'Content-Type': 'text/plain'}, body
+
+        self.counts['missing'] += 1
+        return json_response(404, {'error': 'No recording for this query', 'key': cache_key(params)})
+
+    async def __call__(self, request):
+        if request.method == 'GET' and request.path in ('/api/horizons', '/api/horizons.api'):
+            return await self.horizons(request.args)
+        if request.method == 'POST' and request.path in ('/api/horizons_file', '/api/horizons_file.api'):
+            from jpl_horizons_query import file_api_params
+            try:
+                params = file_api_params(request.headers.get('content-type', ''), request.body)
+            except ValueError as e:
+                return json_response(400, {'error': str(e)})
+            return await self.horizons(params)
+        if request.method == 'GET' and request.path == '/health':
+            return json_response(200, dict(self.counts, status='ok', service='Horizons replay',
+                                           recordings=len(self.recordings)))
+        return json_response(404, {'error': 'Not found'})
+
+async def serve(server, host='0.0.0.0', port=5001):
+    """Run a ReplayServer until cancelled"""
+    listener = await start_server(server, host, port)
+    async with listener:
+        await listener.serve_forever()
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+async def load_test(url, requests=10000, concurrency=64, distinct=100):
+    """
+    Send concurrent single-epoch queries and measure the endpoint
+
+    Args:
+        url: Horizons-compatible endpoint
+        requests: Total number of requests
+        concurrency: Requests in flight at once
+        distinct: Number of distinct queries cycled through
+
+    Returns:
+        Dictionary with elapsed time, requests/s, p50/p99 latency (ms)
+        and status counts
+    """
+    from jpl_horizons_query import build_params
+
+    queries = [build_params('1004083', '@G96', [f"2025-12-19 {i // 60 % 24:02d}:{i % 60:02d}:00.000"])
+               for i in range(distinct)]
+    client = AsyncHTTPClient(timeout=60, max_idle_per_host=concurrency)
+    latencies = []
+    statuses = {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await client.request('GET', url, params=queries[i % distinct])
+                status = response.status
+            except (asyncio.TimeoutError, OSError, asyncio.IncompleteReadError):
+                status = 'error'
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await client.close()
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'elapsed': elapsed,
+        'rps': requests / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': _percentile(latencies, 0.50) * 1000,
+        'p99_ms': _percentile(latencies, 0.99) * 1000,
+        'statuses': statuses,
+    }
+
+def main(argv=None):
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Horizons record/replay stand-in server')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help='serve recorded responses')
+    serve_parser.add_argument('directory', help='recordings directory (from --record)')
+    serve_parser.add_argument('--host', default='0.0.0.0')
+    serve_parser.add_argument('--port', type=int, default=5001)
+    serve_parser.add_argument('--latency-ms', type=float, default=0.0)
+    serve_parser.add_argument('--jitter-ms', type=float, default=0.0)
+    serve_parser.add_argument('--error-rate', type=float, default=0.0)
+    serve_parser.add_argument('--error-status', type=int, default=503)
+    serve_parser.add_argument('--max-rps', type=float, default=None)
+    serve_parser.add_argument('--synthesize', action='store_true',
+                              help='generate a table for queries that were not recorded')
+
+    load_parser = commands.add_parser('load', help='load-test an endpoint')
+    load_parser.add_argument('url')
+    load_parser.add_argument('--requests', type=int, default=10000)
+    load_parser.add_argument('--concurrency', type=int, default=64)
+    load_parser.add_argument('--distinct', type=int, default=100)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'load':
+        result = asyncio.run(load_test(args.url, args.requests, args.concurrency, args.distinct))
+        print("="*70)
+        print("LOAD TEST")
+        print("="*70)
+        print(f"Requests:    {result['requests']:,} ({args.concurrency} concurrent)")
+        print(f"Elapsed:     {result['elapsed']:.2f} s")
+        print(f"Throughput:  {result['rps']:,.0f} requests/s")
+        print(f"Latency:     p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms")
+        print(f"Statuses:    {', '.join(f'{k}: {v:,}' for k, v in sorted(result['statuses'].items(), key=str))}")
+        print("="*70)
+        return
+
+    recordings = RecordingStore(args.directory).load()
+    server = ReplayServer(recordings, args.latency_ms / 1000.0, args.jitter_ms / 1000.0,
+                          args.error_rate, args.error_status, args.max_rps, args.synthesize)
+
+    print("="*70)
+    print("Horizons Replay Server")
+    print("="*70)
+    print(f"\nServing {len(recordings):,} recordings from {args.directory}")
+    print(f"  http://localhost:{args.port}/api/horizons")
+    print(f"  Latency: {args.latency_ms:g} ± {args.jitter_ms:g} ms, "
+          f"error rate: {args.error_rate:g} ({args.error_status}), "
+          f"max rps: {args.max_rps or 'unlimited'}, synthesize: {args.synthesize}")
+    print("\nPress Ctrl+C to stop the server")
+    print("="*70)
+
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -3,11 +3,26 @@
 JPL Horizons Query Tool
 Standalone script to query JPL Horizons for ephemeris data
 No CORS issues - runs directly from command line
+
+With --batch the tool stays running: it reads one query per line from a
+file or stdin and writes one JSON result per line, reusing a single
+keep-alive connection pool, the response cache and the ephemeris store
+across all queries. `requests` is imported only when a query actually
+goes to the network.
 """
 
-import requests
+import argparse
+import io
+import json
+import os
+import re
 import sys
-from datetime import datetime
+from collections import namedtuple
+from datetime import datetime, timezone
+from urllib.parse import quote_plus, urlencode
+
+from horizons_cache import DiscardEntry, get_default_cache, is_offline
+from time_scales import utc_string
 
 def convert_mpc_timestamp(mpc_timestamp):
     """
@@ -23,20 +38,221 @@ def convert_mpc_timestamp(mpc_timestamp):
     if len(parts) != 3:
         raise ValueError(f"Invalid MPC timestamp format: {mpc_timestamp}")
 
-    year = int(parts[0])
-    month = int(parts[1])
-    day_decimal = float(parts[2])
+    # Rounded once to whole milliseconds; the day is checked against the
+    # month length exactly as time_scales.mpc_to_utc checks it
+    return utc_string(int(parts[0]), int(parts[1]), float(parts[2]))
+
+def file_api_url(api_url):
+    """File API URL next to a Horizons API URL ('.../api/horizons.api' -> '.../api/horizons_file.api')"""
+    return api_url.split('?', 1)[0].rstrip('/').rpartition('/')[0] + '/horizons_file.api'
+
+# HORIZONS_API_URL may point at a stand-in such as `horizons_replay.py serve`;
+# the file API then goes to the same server unless HORIZONS_FILE_API_URL is set
+HORIZONS_API_URL = os.environ.get('HORIZONS_API_URL', 'https://ssd.jpl.nasa.gov/api/horizons.api')
+HORIZONS_FILE_API_URL = os.environ.get('HORIZONS_FILE_API_URL') or file_api_url(HORIZONS_API_URL)
+
+# Limits used when packing several epochs into one TLIST request. Horizons
+# accepts up to 10,000 discrete times, but long GET URLs are rejected well
+# before that, so the encoded URL length is the limit that usually applies.
+# Lists too long for one GET are sent to the file API (POST) instead.
+MAX_TLIST_ENTRIES = 10000
+MAX_URL_LENGTH = 7500
+
+# Keep-alive connections kept open per host by the shared session
+POOL_SIZE = 4
+
+_session = None
+
+def get_session():
+    """
+    Keep-alive requests session shared by every query of this process
+
+    Created on first use, so runs answered from the cache or the ephemeris
+    store never import requests.
+    """
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=POOL_SIZE)
+        _session.mount('https://', adapter)
+        _session.mount('http://', adapter)
+    return _session
+
+def build_params(object_id, center, tlist):
+    """
+    Build the Horizons API parameter set for an observer ephemeris
+
+    Args:
+        object_id: SPK-ID or object name
+        center: Observer location (e.g., '@G96')
+        tlist: List of UTC time strings
+
+    Returns:
+        Dictionary of query parameters
+    """
+    return {
+        'format': 'text',
+        'COMMAND': f"'{object_id}'",
+        'OBJ_DATA': "'YES'",
+        'MAKE_EPHEM': "'YES'",
+        'EPHEM_TYPE': "'OBSERVER'",
+        'CENTER': f"'{center}'",
+        'TLIST': ' '.join(f"'{t}'" for t in tlist),
+        'QUANTITIES': "'1,3,36,37'",  # RA/Dec, Rates, 3-sigma uncertainties
+        'TIME_DIGITS': "'SECONDS'",
+        'EXTRA_PREC': "'YES'",
+        'CSV_FORMAT': "'NO'"
+    }
+
+# Local ephemeris backend consulted before the cache and the network
+_backend = None
+
+def set_backend(backend):
+    """
+    Answer queries from a local backend before the cache and the network
+
+    Args:
+        backend: Object with request(params) returning Horizons-format text,
+                 or None when it cannot answer (e.g. spk_backend.SPKBackend);
+                 None disables the backend
+    """
+    global _backend
+    _backend = backend
+
+def get_backend():
+    """The local backend; loads the kernels in HORIZONS_SPK_KERNELS on first use"""
+    if _backend is None and os.environ.get('HORIZONS_SPK_KERNELS'):
+        from spk_backend import SPKBackend
+        set_backend(SPKBackend.from_environment())
+    return _backend
+
+def local_response(params):
+    """Response text from the local backend, or None"""
+    backend = get_backend()
+    return backend.request(params) if backend is not None else None
+
+def build_input_file(params):
+    """
+    Render a parameter set as a Horizons batch input file
+
+    TLIST entries go one per line, so the list is not limited by URL length.
+
+    Args:
+        params: Query parameters (see build_params)
+
+    Returns:
+        Input file text for the file API
+    """
+    lines = ['!$$SOF']
+    for key, value in params.items():
+        if key == 'format':
+            continue
+        if key == 'TLIST':
+            lines.append('TLIST=')
+            lines.extend(re.findall(r"'[^']*'", value) or value.split())
+        else:
+            lines.append(f"{key}={value}")
+    lines.append('!$$EOF')
+    return '\n'.join(lines) + '\n'
+
+def parse_input_file(text, fmt='text'):
+    """
+    Parameter set of a Horizons batch input file (inverse of build_input_file)
+
+    Args:
+        text: Input file text
+        fmt: 'format' field sent with the file
+
+    Returns:
+        Dictionary of query parameters, as build_params would give them
+    """
+    params = {'format': fmt}
+    tlist = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('!'):
+            continue
+        key, sep, value = line.partition('=')
+        if sep and re.fullmatch(r'[A-Z_][A-Z0-9_]*', key.strip()):
+            key = key.strip()
+            if key == 'TLIST' and not value.strip():
+                tlist = params['TLIST'] = []
+                continue
+            params[key] = value.strip()
+            tlist = None
+        elif tlist is not None:
+            tlist.append(line)
+    if isinstance(params.get('TLIST'), list):
+        params['TLIST'] = ' '.join(params['TLIST'])
+    return params
+
+def file_api_params(content_type, body):
+    """
+    Parameter set of a file API POST (format field and input file)
+
+    Raises:
+        ValueError: the form has no input file
+    """
+    from async_http import parse_form
+    form = parse_form(content_type, body)
+    if 'input' not in form:
+        raise ValueError("File API request without an input file")
+    return parse_input_file(form['input'], form.get('format', 'text'))
+
+def request_horizons(params, use_file_api=False, fresh=False):
+    """
+    Send one request to the Horizons API, using the response cache if enabled
+
+    A local backend (see set_backend) is tried first.
+
+    Args:
+        params: Query parameters (see build_params)
+        use_file_api: POST the parameters as an input file to the file API
+                      (for TLISTs too long for a GET URL)
+        fresh: Do not answer from the response cache (the response is still stored)
+
+    Returns:
+        Response text from Horizons API
+    """
+    local = local_response(params)
+    if local is not None:
+        return local
+
+    cache = get_default_cache()
+    if cache is not None and not fresh:
+        cached = cache.get(params)
+        if cached is not None:
+            return cached
+
+    if is_offline():
+        raise Exception("Response not in cache and HORIZONS_OFFLINE=1 is set")
+
+    import requests
+    session = get_session()
+    try:
+        if use_file_api:
+            response = session.post(
+                HORIZONS_FILE_API_URL,
+                data={'format': params.get('format', 'text')},
+                files={'input': ('input.txt', build_input_file(params))},
+                timeout=120)
+        else:
+            response = session.get(HORIZONS_API_URL, params=params, timeout=30)
+
+        if response.status_code != 200:
+            raise Exception(f"API request failed with status {response.status_code}")
 
-    day = int(day_decimal)
-    fraction = day_decimal - day
+    except requests.exceptions.Timeout:
+        raise Exception("Request timed out. Check your internet connection.")
+    except requests.exceptions.RequestException as e:
+        raise Exception(f"Request failed: {str(e)}")
 
-    # Convert fractional day to time
-    total_seconds = fraction * 24 * 60 * 60
-    hours = int(total_seconds // 3600)
-    minutes = int((total_seconds % 3600) // 60)
-    seconds = total_seconds % 60
+    if cache is not None:
+        cache.put(params, response.text)
 
-    return f"{year:04d}-{month:02d}-{day:02d} {hours:02d}:{minutes:02d}:{seconds:06.3f}"
+    return response.text
 
 def query_horizons(object_id, observatory_code, mpc_timestamp):
     """
@@ -56,21 +272,7 @@ def query_horizons(object_id, observatory_code, mpc_timestamp):
     # Prepare observer location
     center = observatory_code if observatory_code.startswith('@') else f'@{observatory_code}'
 
-    # Build API request
-    base_url = 'https://ssd.jpl.nasa.gov/api/horizons.api'
-    params = {
-        'format': 'text',
-        'COMMAND': f"'{object_id}'",
-        'OBJ_DATA': "'YES'",
-        'MAKE_EPHEM': "'YES'",
-        'EPHEM_TYPE': "'OBSERVER'",
-        'CENTER': f"'{center}'",
-        'TLIST': f"'{utc_time}'",
-        'QUANTITIES': "'1,3,36,37'",  # RA/Dec, Rates, 3-sigma uncertainties
-        'TIME_DIGITS': "'SECONDS'",
-        'EXTRA_PREC': "'YES'",
-        'CSV_FORMAT': "'NO'"
-    }
+    params = build_params(object_id, center, [utc_time])
 
     print(f"Querying JPL Horizons...")
     print(f"  Object: {object_id}")
@@ -79,90 +281,510 @@ def query_horizons(object_id, observatory_code, mpc_timestamp):
     print(f"  UTC Time: {utc_time}")
     print()
 
-    try:
-        response = requests.get(base_url, params=params, timeout=30)
+    return request_horizons(params)
 
-        if response.status_code != 200:
-            raise Exception(f"API request failed with status {response.status_code}")
+def pack_tlist(object_id, center, utc_times):
+    """
+    Split a list of UTC times into as few TLIST requests as the limits allow
 
-        return response.text
+    Args:
+        object_id: SPK-ID or object name
+        center: Observer location (e.g., '@G96')
+        utc_times: List of UTC time strings
 
-    except requests.exceptions.Timeout:
-        raise Exception("Request timed out. Check your internet connection.")
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Request failed: {str(e)}")
+    Returns:
+        List of lists of UTC time strings, one per request
+    """
+    base_length = len(HORIZONS_API_URL) + 1 + len(urlencode(build_params(object_id, center, [])))
+
+    batches = []
+    current = []
+    length = base_length
+    for utc_time in utc_times:
+        # Each entry adds the quoted time plus a separating space
+        entry_length = len(quote_plus(f" '{utc_time}'"))
+        if current and (length + entry_length > MAX_URL_LENGTH or len(current) >= MAX_TLIST_ENTRIES):
+            batches.append(current)
+            current = []
+            length = base_length
+        current.append(utc_time)
+        length += entry_length
+
+    if current:
+        batches.append(current)
+
+    return batches
+
+def plan_tlist_calls(object_id, center, utc_times):
+    """
+    Plan the requests for a list of UTC times of one object and center
 
-def parse_ephemeris(response_text):
+    Lists that fit one GET URL are sent as one GET. Longer lists go to the
+    file API in chunks of MAX_TLIST_ENTRIES, which takes far fewer calls
+    than splitting at the URL length.
+
+    Args:
+        object_id: SPK-ID or object name
+        center: Observer location (e.g., '@G96')
+        utc_times: List of UTC time strings
+
+    Returns:
+        List of (utc_times, use_file_api) tuples, one per request
     """
-    Parse ephemeris data from Horizons response
+    batches = pack_tlist(object_id, center, utc_times)
+    if len(batches) <= 1:
+        return [(batch, False) for batch in batches]
+    return [(utc_times[i:i + MAX_TLIST_ENTRIES], True)
+            for i in range(0, len(utc_times), MAX_TLIST_ENTRIES)]
+
+def stored_rows(object_id, center, utc_times):
+    """
+    Rows already in the ephemeris store (see ephemeris_store.py)
 
     Returns:
-        Dictionary with extracted ephemeris data
+        Dictionary of utc_time -> row for the times found
     """
-    lines = response_text.split('\n')
-    results = {}
+    from ephemeris_store import get_default_store
+    store = get_default_store()
+    return store.lookup(object_id, center, utc_times) if store is not None else {}
+
+def store_rows(object_id, center, utc_times, data):
+    """Save the rows of a parsed response (one per utc_time) in the ephemeris store"""
+    from ephemeris_store import get_default_store
+    store = get_default_store()
+    if store is not None:
+        store.insert_rows(object_id, center, utc_times, data['rows'],
+                          data.get('solution'), data.get('epoch_jd'))
+
+def probe_solution(object_id):
+    """
+    Current orbit solution name of an object, asked from Horizons
 
-    # Find solution and epoch info
-    for line in lines:
-        if 'Solution name' in line or 'SPK' in line:
-            parts = line.split(':', 1)
-            if len(parts) == 2:
-                results['solution'] = parts[1].strip()
-
-        if 'Epoch' in line:
-            # Look for JD format
-            import re
-            match = re.search(r'(\d{7}\.\d+)', line)
-            if match:
-                results['epoch_jd'] = match.group(1)
-
-    # Extract ephemeris data between $$SOE and $$EOE
-    in_ephemeris = False
-    ephemeris_lines = []
+    Sends a one-epoch geocentric query past the response cache and reads
+    only its header; the solution is also recorded in the ephemeris store.
 
-    for line in lines:
-        if '$$SOE' in line:
-            in_ephemeris = True
-            continue
-        if '$$EOE' in line:
-            break
-        if in_ephemeris and line.strip():
-            ephemeris_lines.append(line)
+    Returns:
+        Solution name, or None if the response names none
+    """
+    utc_time = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:00.000')
+    params = build_params(object_id, '@500', [utc_time])
+    params['QUANTITIES'] = "'1'"
+    solution = parse_header(request_horizons(params, fresh=True)).get('solution')
+
+    from ephemeris_store import get_default_store
+    store = get_default_store()
+    if solution and store is not None:
+        store.advance_solution(object_id, solution)
+    return solution
+
+def _fetch_rows(object_id, center, utc_times, rows_by_time, fresh=False):
+    """
+    Request rows for utc_times from Horizons into rows_by_time
 
-    if not ephemeris_lines:
-        raise Exception("No ephemeris data found in response")
+    Returns:
+        List of the solution names of the responses, in request order
+    """
+    solutions = []
+    for batch, use_file_api in plan_tlist_calls(object_id, center, utc_times):
+        response = request_horizons(build_params(object_id, center, batch), use_file_api, fresh)
+        data = parse_ephemeris(response)
+
+        if len(data['rows']) != len(batch):
+            raise Exception(
+                f"Expected {len(batch)} ephemeris rows but Horizons returned {len(data['rows'])}"
+            )
+        store_rows(object_id, center, batch, data)
+        solutions.append(data.get('solution'))
+
+        for utc_time, row in zip(batch, data['rows']):
+            row = dict(row)
+            for key in ('solution', 'epoch_jd'):
+                if key in data:
+                    row[key] = data[key]
+            rows_by_time[utc_time] = row
+    return solutions
+
+def stale_times(rows_by_time, utc_times, fetched):
+    """
+    Times whose rows are not of the solution Horizons just answered with
+
+    Horizons is taken at its word: stored rows of any other solution, newer
+    or older, named or not, are stale. If the responses themselves name
+    several solutions, the newest is taken (see is_newer_solution).
+
+    Args:
+        rows_by_time: Dictionary of utc_time -> row, stored and fetched
+        utc_times: Times of the request
+        fetched: Solution names of the responses (empty if nothing was fetched)
+
+    Returns:
+        List of times to request again, bypassing the response cache
+    """
+    from ephemeris_store import is_newer_solution
+
+    if not fetched:
+        return []
+    current = fetched[0]
+    for solution in fetched[1:]:
+        if is_newer_solution(solution, current):
+            current = solution
+    return [t for t in utc_times if rows_by_time[t].get('solution') != current]
+
+def check_one_solution(rows_by_time, utc_times):
+    """Raise if the rows for utc_times come from more than one solution"""
+    solutions = {rows_by_time[t].get('solution') for t in utc_times}
+    if len(solutions) > 1:
+        raise Exception(f"Horizons answered with several orbit solutions: "
+                        f"{', '.join(sorted(str(s) for s in solutions))}")
+
+def fetch_ephemeris_rows(object_id, center, utc_times):
+    """
+    Fetch one parsed ephemeris row per UTC time using batched TLIST requests
 
-    # Parse the ephemeris line
-    ephemeris_line = ' '.join(ephemeris_lines).strip()
-    parts = ephemeris_line.split()
+    Times already in the ephemeris store are answered from it; duplicate
+    times are requested only once. Times are sent in ascending order so the
+    rows returned by Horizons can be matched back by position. If Horizons
+    answers with a different solution than the stored rows (see
+    stale_times), those times are requested again, so all rows come from
+    one solution; if they still do not, an exception is raised.
+
+    Args:
+        object_id: SPK-ID or object name
+        center: Observer location (e.g., '@G96')
+        utc_times: List of UTC time strings ("YYYY-MM-DD HH:MM:SS.sss")
+
+    Returns:
+        List of row dictionaries (see parse_ephemeris), in the order of utc_times
+    """
+    unique_times = sorted(set(utc_times))
+    rows_by_time = stored_rows(object_id, center, unique_times)
+    missing = [t for t in unique_times if t not in rows_by_time]
+    fetched = _fetch_rows(object_id, center, missing, rows_by_time)
+
+    stale = stale_times(rows_by_time, unique_times, fetched)
+    if stale:
+        _fetch_rows(object_id, center, stale, rows_by_time, fresh=True)
+        check_one_solution(rows_by_time, unique_times)
+
+    return [dict(rows_by_time[t]) for t in utc_times]
+
+def query_horizons_batch(object_id, observatory_code, mpc_timestamps):
+    """
+    Query JPL Horizons for many epochs with as few API calls as possible
+
+    Args:
+        object_id: SPK-ID or object name (e.g., '1004083' or 'C/2025 N1')
+        observatory_code: MPC observatory code (e.g., 'G96', 'b67')
+        mpc_timestamps: List of MPC format timestamps
+
+    Returns:
+        List of parsed ephemeris rows, one per timestamp
+    """
+    utc_times = [convert_mpc_timestamp(t) for t in mpc_timestamps]
+    center = observatory_code if observatory_code.startswith('@') else f'@{observatory_code}'
+
+    unique_count = len(set(utc_times))
+    missing = sorted(set(utc_times) - set(stored_rows(object_id, center, sorted(set(utc_times)))))
+    request_count = len(plan_tlist_calls(object_id, center, missing))
+
+    print(f"Querying JPL Horizons (batched)...")
+    print(f"  Object: {object_id}")
+    print(f"  Observatory: {observatory_code}")
+    print(f"  Epochs: {len(utc_times)} ({unique_count} unique)")
+    print(f"  Requests: {request_count}")
+    print()
+
+    return fetch_ephemeris_rows(object_id, center, utc_times)
+
+def parse_ephemeris_row(line):
+    """
+    Parse one ephemeris line from between $$SOE and $$EOE
+
+    Args:
+        line: Ephemeris table line
+
+    Returns:
+        Dictionary with the fields of the row
+    """
+    parts = line.split()
 
     if len(parts) < 8:
         raise Exception(f"Insufficient data in ephemeris output")
 
+    row = {}
+
     # Extract fields
     idx = 0
-    results['utc_time'] = f"{parts[idx]} {parts[idx+1]}"
+    row['utc_time'] = f"{parts[idx]} {parts[idx+1]}"
     idx += 2
 
+    # Skip solar/lunar presence markers (e.g. '*', 'C', 'm') before the RA
+    while idx < len(parts) and not parts[idx][0].isdigit():
+        idx += 1
+
+    if len(parts) - idx < 6:
+        raise Exception(f"Insufficient data in ephemeris output")
+
     # RA (HH MM SS.sss)
-    results['ra_icrf'] = f"{parts[idx]} {parts[idx+1]} {parts[idx+2]}"
+    row['ra_icrf'] = f"{parts[idx]} {parts[idx+1]} {parts[idx+2]}"
     idx += 3
 
     # DEC (+/-DD MM SS.ss)
-    results['dec_icrf'] = f"{parts[idx]} {parts[idx+1]} {parts[idx+2]}"
+    row['dec_icrf'] = f"{parts[idx]} {parts[idx+1]} {parts[idx+2]}"
     idx += 3
 
     # Remaining fields - rates and uncertainties
     remaining = parts[idx:]
     if len(remaining) >= 7:
         # Try to extract from the end (more reliable)
-        results['theta'] = remaining[-1]
-        results['smia_3sig'] = remaining[-2]
-        results['smaa_3sig'] = remaining[-3]
-        results['dec_3sigma'] = remaining[-4]
-        results['ra_3sigma'] = remaining[-5]
-        results['ddec_dt'] = remaining[-6]
-        results['dra_cosd'] = remaining[-7]
+        row['theta'] = remaining[-1]
+        row['smia_3sig'] = remaining[-2]
+        row['smaa_3sig'] = remaining[-3]
+        row['dec_3sigma'] = remaining[-4]
+        row['ra_3sigma'] = remaining[-5]
+        row['ddec_dt'] = remaining[-6]
+        row['dra_cosd'] = remaining[-7]
+
+    return row
+
+# OBJ_DATA element lines, e.g. "   EC= 6.139422831829797   QR= 1.356418761995381"
+_ELEMENT_LINE_RE = re.compile(r'^\s*[A-Z][A-Z0-9]*=')
+_ELEMENT_RE = re.compile(r'\b([A-Z][A-Z0-9]*)=\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[Ee][-+]?\d+)?)(?=\s|$)')
+
+def _scan_header_line(line, header):
+    """Collect solution, epoch and osculating element info from one header line into header"""
+    if _ELEMENT_LINE_RE.match(line):
+        # Numeric KEY= values only; the calendar form of TP and 'n.a.' are skipped
+        elements = header.setdefault('elements', {})
+        for key, value in _ELEMENT_RE.findall(line):
+            elements.setdefault(key, float(value))
+        return
+
+    if 'Solution name' in line or 'SPK' in line:
+        parts = line.split(':', 1)
+        if len(parts) == 2:
+            header['solution'] = parts[1].strip()
+
+    if 'Epoch' in line:
+        # Look for JD format
+        match = re.search(r'(\d{7}\.\d+)', line)
+        if match:
+            header['epoch_jd'] = match.group(1)
+
+def parse_header(response_text):
+    """
+    Parse the solution name, epoch and elements from the header of a Horizons response
+
+    Returns:
+        Dictionary with 'solution', 'epoch_jd' and 'elements' (OBJ_DATA
+        values such as EC, QR, TP, OM, W, IN keyed by name) when present
+    """
+    results = {}
+
+    # Find solution and epoch info
+    for line in io.StringIO(response_text):
+        if '$$SOE' in line:
+            break
+        _scan_header_line(line, results)
+
+    return results
+
+def iter_ephemeris_lines(lines, header=None):
+    """
+    Yield the raw table lines between $$SOE and $$EOE
+
+    Lines are consumed one at a time, so any iterable works (an open
+    file, a streamed HTTP body, ...).
+
+    Args:
+        lines: Iterable of response lines
+        header: Optional dictionary that is filled with the solution name
+                and epoch from the header before the first row is yielded
+
+    Yields:
+        Non-blank ephemeris table lines
+    """
+    if header is None:
+        header = {}
+
+    in_ephemeris = False
+    for line in lines:
+        if not in_ephemeris:
+            if '$$SOE' in line:
+                in_ephemeris = True
+            else:
+                _scan_header_line(line, header)
+            continue
+        if '$$EOE' in line:
+            return
+        if line.strip():
+            yield line.rstrip('\r\n')
+
+EphemerisRecord = namedtuple('EphemerisRecord', [
+    'utc_time', 'ra_icrf', 'dec_icrf', 'ra_deg', 'dec_deg',
+    'dra_cosd', 'ddec_dt', 'ra_3sigma', 'dec_3sigma',
+    'smaa_3sig', 'smia_3sig', 'theta',
+])
+
+def _to_float(value):
+    """Convert a table field to float; 'n.a.' and missing fields become None"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _sexagesimal_to_degrees(text, scale):
+    """Convert 'HH MM SS.sss' (scale=15) or '+DD MM SS.ss' (scale=1) to degrees"""
+    parts = text.split()
+    value = abs(float(parts[0])) + float(parts[1]) / 60.0 + float(parts[2]) / 3600.0
+    return (-value if parts[0].startswith('-') else value) * scale
+
+def make_record(row):
+    """
+    Convert a row dictionary from parse_ephemeris_row into a typed record
+
+    Returns:
+        EphemerisRecord with RA/Dec also in decimal degrees and the rate and
+        uncertainty columns as floats (None when Horizons prints 'n.a.')
+    """
+    return EphemerisRecord(
+        utc_time=row['utc_time'],
+        ra_icrf=row['ra_icrf'],
+        dec_icrf=row['dec_icrf'],
+        ra_deg=_sexagesimal_to_degrees(row['ra_icrf'], 15.0),
+        dec_deg=_sexagesimal_to_degrees(row['dec_icrf'], 1.0),
+        dra_cosd=_to_float(row.get('dra_cosd')),
+        ddec_dt=_to_float(row.get('ddec_dt')),
+        ra_3sigma=_to_float(row.get('ra_3sigma')),
+        dec_3sigma=_to_float(row.get('dec_3sigma')),
+        smaa_3sig=_to_float(row.get('smaa_3sig')),
+        smia_3sig=_to_float(row.get('smia_3sig')),
+        theta=_to_float(row.get('theta')),
+    )
+
+def iter_ephemeris_records(lines, header=None):
+    """
+    Stream typed ephemeris records from an iterable of response lines
+
+    Memory use stays flat however many rows the table has: each line is
+    parsed and yielded as soon as it arrives.
+
+    Args:
+        lines: Iterable of response lines
+        header: Optional dictionary filled with the solution name and epoch
+
+    Yields:
+        EphemerisRecord for every row between $$SOE and $$EOE
+    """
+    for line in iter_ephemeris_lines(lines, header):
+        yield make_record(parse_ephemeris_row(line))
+
+def build_range_params(object_id, center, start_time, stop_time, step_size):
+    """
+    Build the Horizons API parameter set for an evenly stepped ephemeris
+
+    Args:
+        object_id: SPK-ID or object name
+        center: Observer location (e.g., '@G96')
+        start_time: UTC start time ("YYYY-MM-DD HH:MM")
+        stop_time: UTC stop time
+        step_size: Horizons step (e.g., '1 h', '10 m', '1000' for equal intervals)
+
+    Returns:
+        Dictionary of query parameters
+    """
+    params = build_params(object_id, center, [])
+    del params['TLIST']
+    params['START_TIME'] = f"'{start_time}'"
+    params['STOP_TIME'] = f"'{stop_time}'"
+    params['STEP_SIZE'] = f"'{step_size}'"
+    return params
+
+def stream_horizons(params, header=None):
+    """
+    Stream typed ephemeris records for a Horizons query
+
+    The response body is read incrementally (a cached copy is read straight
+    from disk) and records are yielded while it is still arriving. A response
+    fetched from the network is written to the cache as it streams, and
+    kept only if it turned out to hold a complete ephemeris table.
+
+    Args:
+        params: Query parameters (see build_params / build_range_params)
+        header: Optional dictionary filled with the solution name and epoch
+
+    Yields:
+        EphemerisRecord for every ephemeris row
+    """
+    local = local_response(params)
+    if local is not None:
+        yield from iter_ephemeris_records(io.StringIO(local), header)
+        return
+
+    cache = get_default_cache()
+    if cache is not None:
+        cached = cache.open(params)
+        if cached is not None:
+            with cached:
+                yield from iter_ephemeris_records(cached, header)
+            return
+
+    if is_offline():
+        raise Exception("Response not in cache and HORIZONS_OFFLINE=1 is set")
+
+    import requests
+    try:
+        response = get_session().get(HORIZONS_API_URL, params=params, timeout=30, stream=True)
+    except requests.exceptions.Timeout:
+        raise Exception("Request timed out. Check your internet connection.")
+    except requests.exceptions.RequestException as e:
+        raise Exception(f"Request failed: {str(e)}")
+
+    with response:
+        if response.status_code != 200:
+            raise Exception(f"API request failed with status {response.status_code}")
+
+        response.encoding = response.encoding or 'utf-8'
+        lines = response.iter_lines(decode_unicode=True)
+        if cache is None:
+            yield from iter_ephemeris_records(lines, header)
+            return
+
+        markers = set()
+        with cache.writer(params) as sink:
+            def tee():
+                for line in lines:
+                    sink.write(line + '\n')
+                    markers.update(marker for marker in ('$$SOE', '$$EOE') if marker in line)
+                    yield line
+            yield from iter_ephemeris_records(tee(), header)
+            # Keep the trailer too so the cached copy is the complete response
+            for line in tee():
+                pass
+            if len(markers) < 2:
+                # Error text or a truncated table: never replay it from the cache
+                raise DiscardEntry()
+
+def parse_ephemeris(response_text):
+    """
+    Parse ephemeris data from Horizons response
+
+    Every row between $$SOE and $$EOE is parsed and returned under 'rows'.
+    The fields of the first row are also copied to the top level so that
+    single-epoch callers can keep using data['ra_icrf'] etc.
+
+    Returns:
+        Dictionary with extracted ephemeris data
+    """
+    results = {}
+    rows = [parse_ephemeris_row(line)
+            for line in iter_ephemeris_lines(io.StringIO(response_text), results)]
+
+    if not rows:
+        raise Exception("No ephemeris data found in response")
+
+    results['rows'] = rows
+    results.update(rows[0])
 
     return results
 
@@ -194,22 +816,162 @@ def print_results(data):
     print("="*70)
     print()
 
+def parse_query_line(line):
+    """
+    Split one batch query line into (object_id, observatory_code, mpc_timestamp)
+
+    Accepted forms (blank lines and '#' comments give None):
+        1004083 G96 2025 12 19.007280               whitespace; object may contain spaces
+        C/2025 N1<TAB>G96<TAB>2025 12 19.007280     tab-separated
+        {"object": "1004083", "observatory": "G96", "timestamp": "2025 12 19.007280"}
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if line.startswith('{'):
+        query = json.loads(line)
+        return str(query['object']), str(query['observatory']), str(query['timestamp'])
+    if '\t' in line:
+        fields = [field.strip() for field in line.split('\t')]
+        if len(fields) != 3:
+            raise ValueError(f"Expected 3 tab-separated fields: {line}")
+        return tuple(fields)
+    parts = line.split()
+    if len(parts) < 5:
+        raise ValueError(f"Expected <object> <observatory> <YYYY MM DD.dddddd>: {line}")
+    return ' '.join(parts[:-4]), parts[-4], ' '.join(parts[-3:])
+
+def answer_queries(queries):
+    """
+    Look up parsed rows for a list of queries
+
+    Queries for the same object and observatory are fetched together, so
+    their epochs share TLIST requests; a failure affects only its group.
+
+    Args:
+        queries: List of (object_id, observatory_code, mpc_timestamp)
+
+    Returns:
+        List of (row, error) pairs in the order of queries
+    """
+    results = [None] * len(queries)
+    groups = {}
+    for index, (object_id, observatory_code, mpc_timestamp) in enumerate(queries):
+        try:
+            utc_time = convert_mpc_timestamp(mpc_timestamp)
+        except ValueError as e:
+            results[index] = (None, str(e))
+            continue
+        center = observatory_code if observatory_code.startswith('@') else f'@{observatory_code}'
+        groups.setdefault((object_id, center), []).append((index, utc_time))
+
+    for (object_id, center), members in groups.items():
+        try:
+            rows = fetch_ephemeris_rows(object_id, center, [utc_time for _, utc_time in members])
+        except Exception as e:
+            for index, _ in members:
+                results[index] = (None, str(e))
+            continue
+        for (index, _), row in zip(members, rows):
+            results[index] = (row, None)
+    return results
+
+def run_batch(lines, out, chunk_size=1):
+    """
+    Answer query lines, writing one JSON object per line to out
+
+    Lines are answered chunk_size at a time (in input order); each output
+    line is flushed at once, so the tool can run as a co-process that
+    answers a query as soon as it is written.
+
+    Args:
+        lines: Iterable of query lines (see parse_query_line)
+        out: Text stream for the JSON results
+        chunk_size: Lines collected before answering; larger chunks let
+                    queries for the same object share TLIST requests
+
+    Returns:
+        Number of queries that failed
+    """
+    failures = 0
+    chunk = []
+
+    def flush():
+        nonlocal failures
+        parsed = [query for _, query, _ in chunk if query is not None]
+        answers = iter(answer_queries(parsed))
+        for number, query, error in chunk:
+            result = {'line': number}
+            if query is not None:
+                result.update(object=query[0], observatory=query[1], mpc_timestamp=query[2])
+                row, error = next(answers)
+                if row is not None:
+                    result.update(row)
+            if error is not None:
+                result['error'] = error
+                failures += 1
+            out.write(json.dumps(result) + '\n')
+        out.flush()
+        chunk.clear()
+
+    for number, line in enumerate(lines, start=1):
+        try:
+            query = parse_query_line(line)
+        except (ValueError, KeyError) as e:
+            chunk.append((number, None, f"Invalid query line: {e}"))
+        else:
+            if query is None:
+                continue
+            chunk.append((number, query, None))
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return failures
+
+def batch_main(args):
+    """--batch [FILE|-] [--chunk N]: answer query lines as JSON lines"""
+    parser = argparse.ArgumentParser(prog='jpl_horizons_query.py --batch',
+                                     description="Answer query lines as JSON lines")
+    parser.add_argument('path', nargs='?', default='-', help="Query file, or - for stdin (default)")
+    parser.add_argument('--chunk', type=int, help="Lines answered together "
+                        "(default: 1 for stdin, 1000 for a file)")
+    options = parser.parse_args(args)
+    if options.chunk is not None and options.chunk < 1:
+        parser.error("--chunk must be at least 1")
+    path, chunk_size = options.path, options.chunk
+
+    if path == '-':
+        # A co-process writing to stdin waits for each answer: default to one line at a time
+        failures = run_batch(sys.stdin, sys.stdout, chunk_size or 1)
+    else:
+        with open(path) as f:
+            failures = run_batch(f, sys.stdout, chunk_size or 1000)
+    sys.exit(1 if failures else 0)
+
 def main():
     """Main function"""
+    if len(sys.argv) >= 2 and sys.argv[1] == '--batch':
+        batch_main(sys.argv[2:])
+        return
+
     print("="*70)
     print("JPL HORIZONS QUERY TOOL")
     print("="*70)
     print()
 
     # Get input from command line or interactive
-    if len(sys.argv) == 4:
+    if len(sys.argv) >= 4:
         object_id = sys.argv[1]
         observatory_code = sys.argv[2]
         mpc_timestamp = sys.argv[3]
+        extra_timestamps = sys.argv[4:]
     else:
-        print("Usage: python jpl_horizons_query.py <object_id> <observatory_code> <mpc_timestamp>")
+        print("Usage: python jpl_horizons_query.py <object_id> <observatory_code> <mpc_timestamp> [<mpc_timestamp> ...]")
         print("\nExample:")
         print("  python jpl_horizons_query.py 1004083 G96 '2025 12 19.007280'")
+        print("  python jpl_horizons_query.py 1004083 G96 '2025 12 19.007280' '2025 12 19.011342'")
+        print("  python jpl_horizons_query.py --batch queries.txt [--chunk N]   # JSON lines out")
         print()
         print("Or enter interactively:")
         print()
@@ -217,9 +979,27 @@ def main():
         object_id = input("Object ID (SPK-ID or name): ").strip()
         observatory_code = input("Observatory code (e.g., G96, b67): ").strip()
         mpc_timestamp = input("MPC timestamp (YYYY MM DD.dddddd): ").strip()
+        extra_timestamps = []
         print()
 
     try:
+        if extra_timestamps:
+            # Several epochs: batch them into as few TLIST requests as possible
+            rows = query_horizons_batch(object_id, observatory_code, [mpc_timestamp] + extra_timestamps)
+            for row in rows:
+                print_results(row)
+            return
+
+        # Answer from the ephemeris store when this epoch was fetched before
+        center = observatory_code if observatory_code.startswith('@') else f'@{observatory_code}'
+        utc_time = convert_mpc_timestamp(mpc_timestamp)
+        stored = stored_rows(object_id, center, [utc_time])
+        if stored:
+            print(f"✓ Using stored ephemeris row (ephemeris_store.py)")
+            print()
+            print_results(stored[utc_time])
+            return
+
         # Query Horizons API
         response = query_horizons(object_id, observatory_code, mpc_timestamp)
 
@@ -232,6 +1012,7 @@ def main():
 
         # Parse and display results
         data = parse_ephemeris(response)
+        store_rows(object_id, center, [utc_time], data)
         print_results(data)
 
     except Exception as e:
@@ -2,39 +2,200 @@
 """
 JPL Horizons API Server
 A simple Flask server to proxy requests to JPL Horizons API without CORS issues
+
+Upstream requests share one keep-alive connection pool, and identical
+requests that arrive while one is already in flight wait for that call
+instead of issuing their own.
+
+Batch input files POSTed to /api/horizons_file.api are forwarded to the
+Horizons file API, cached, coalesced and recorded under the same
+parameter set as the equivalent GET.
+
+/metrics reports upstream latency, status and timeout counts, the cache
+hit ratio and response sizes in Prometheus text format, and every
+response carries a Server-Timing header.
+
+Options:
+    --cache          Answer repeated queries from the shared response cache
+    --record DIR     Save every upstream response for horizons_replay.py
+    --upstream URL   Forward to another server (e.g. the replay server)
+    --async          Serve from an asyncio event loop (horizons_async_proxy.py)
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
+import argparse
 import requests
+import sys
+import threading
+import time
+from requests.adapters import HTTPAdapter
+
+from horizons_cache import cache_key, get_default_cache
+from jpl_horizons_query import file_api_params, file_api_url
+from proxy_metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, ProxyMetrics, server_timing
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+# JPL Horizons API endpoint
+HORIZONS_URL = 'https://ssd.jpl.nasa.gov/api/horizons.api'
+
+# Size of the keep-alive connection pool to ssd.jpl.nasa.gov
+POOL_SIZE = 16
+
+def create_session(pool_size=POOL_SIZE):
+    """
+    Create a requests session with a pooled keep-alive connection adapter
+
+    Args:
+        pool_size: Maximum number of connections kept open per host
+
+    Returns:
+        requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+session = create_session()
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls so only one of them runs
+
+    The first caller for a key runs the function; callers arriving with the
+    same key before it finishes wait and receive the same result (or the
+    same exception).
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Run fn() once for all concurrent callers with the same key
+
+        Returns:
+            Tuple of (result, shared) where shared is True if this caller
+            received the result of another caller's call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                leader = False
+            else:
+                call = self._Call()
+                self._calls[key] = call
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result, False
+
+inflight = SingleFlight()
+
+# RecordingStore set by --record; saves every upstream response
+recorder = None
+
+# HorizonsCache set by --cache; answers repeated queries without upstream calls
+response_cache = None
+
+metrics = ProxyMetrics()
+
+def fetch_upstream(params, form=None):
+    """
+    Forward a request to JPL Horizons over the pooled session
+
+    Args:
+        params: Query parameters (recorded under these for either API)
+        form: (content type, body) of a file API POST, forwarded as is
+
+    Returns:
+        Tuple of (status_code, response_text)
+    """
+    with metrics.upstream() as call:
+        if form is None:
+            response = session.get(HORIZONS_URL, params=params, timeout=30)
+        else:
+            response = session.post(file_api_url(HORIZONS_URL), data=form[1],
+                                    headers={'Content-Type': form[0]}, timeout=120)
+        call.status = response.status_code
+    if recorder is not None:
+        recorder.record(params, response.status_code, response.text)
+    return response.status_code, response.text
+
 @app.route('/api/horizons', methods=['GET'])
+@app.route('/api/horizons_file', methods=['POST'])
+@app.route('/api/horizons_file.api', methods=['POST'])
 def query_horizons():
     """
     Proxy endpoint for JPL Horizons API
-    Accepts same query parameters as the JPL Horizons API
+    Accepts same query parameters as the JPL Horizons API, or (POST) the
+    same form as its file API
     """
     try:
-        # Get all query parameters from the request
-        params = dict(request.args)
+        form = None
+        if request.method == 'POST':
+            form = (request.content_type or '', request.get_data())
+            try:
+                params = file_api_params(*form)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        else:
+            # Get all query parameters from the request
+            params = dict(request.args)
 
-        # JPL Horizons API endpoint
-        horizons_url = 'https://ssd.jpl.nasa.gov/api/horizons.api'
+        if response_cache is not None:
+            cached = response_cache.get(params)
+            if cached is not None:
+                g.cache = 'hit'
+                return cached, 200, {'Content-Type': 'text/plain'}
 
-        # Forward the request to JPL Horizons
-        response = requests.get(horizons_url, params=params, timeout=30)
+        # Forward the request to JPL Horizons, sharing any identical call in flight
+        g.cache = 'miss'
+        start = time.perf_counter()
+        try:
+            (status_code, text), shared = inflight.do(cache_key(params), lambda: fetch_upstream(params, form))
+        finally:
+            g.upstream = time.perf_counter() - start
+        if shared:
+            g.cache = 'coalesced'
+        elif status_code == 200 and response_cache is not None:
+            response_cache.put(params, text)
 
-        if response.status_code != 200:
+        if status_code != 200:
             return jsonify({
-                'error': f'JPL Horizons API error: {response.status_code}',
-                'details': response.text
-            }), response.status_code
+                'error': f'JPL Horizons API error: {status_code}',
+                'details': text
+            }), status_code
 
         # Return the response as plain text
-        return response.text, 200, {'Content-Type': 'text/plain'}
+        return text, 200, {'Content-Type': 'text/plain'}
 
     except requests.exceptions.Timeout:
         return jsonify({'error': 'Request to JPL Horizons timed out'}), 504
@@ -48,14 +209,62 @@ def health():
     """Health check endpoint"""
     return jsonify({'status': 'ok', 'service': 'JPL Horizons Proxy'}), 200
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics endpoint"""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.before_request
+def start_timer():
+    g.start = time.perf_counter()
+
+@app.after_request
+def record_metrics(response):
+    """Count the response and add its Server-Timing header"""
+    elapsed = time.perf_counter() - g.get('start', time.perf_counter())
+    cache = g.get('cache')
+    if cache is not None:
+        metrics.record_cache(cache)
+    response.headers['Server-Timing'] = server_timing(cache, upstream=g.get('upstream'), total=elapsed)
+    metrics.record_response(request.path, response.status_code, response.content_length or 0, elapsed)
+    return response
+
 if __name__ == '__main__':
+    if '--async' in sys.argv:
+        # Serve the same endpoints from an asyncio event loop instead
+        import horizons_async_proxy
+        horizons_async_proxy.main([arg for arg in sys.argv[1:] if arg != '--async'])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description='JPL Horizons API proxy')
+    parser.add_argument('--cache', action='store_true',
+                        help='answer repeated queries from the shared response cache')
+    parser.add_argument('--record', metavar='DIR',
+                        help='save every upstream response to DIR for horizons_replay.py')
+    parser.add_argument('--upstream', default=HORIZONS_URL,
+                        help='Horizons API URL to forward to (default: %(default)s)')
+    args = parser.parse_args()
+    HORIZONS_URL = args.upstream
+    if args.record:
+        from horizons_replay import RecordingStore
+        recorder = RecordingStore(args.record)
+    if args.cache:
+        response_cache = get_default_cache()
+
     print("="*70)
     print("JPL Horizons API Proxy Server")
     print("="*70)
     print("\nStarting server on http://localhost:5000")
+    print(f"Upstream: {HORIZONS_URL}")
+    if recorder is not None:
+        print(f"Recording upstream responses to: {args.record}")
     print("\nEndpoints:")
     print("  - http://localhost:5000/api/horizons  (Horizons API proxy)")
+    print("  - http://localhost:5000/api/horizons_file.api  (file API proxy, POST)")
     print("  - http://localhost:5000/health        (Health check)")
+    print("  - http://localhost:5000/metrics       (Prometheus metrics)")
+    print("\nFor many concurrent users run the asyncio mode instead:")
+    print("  python jpl_horizons_server.py --async [--max-upstream 8]")
     print("\nTo use with the web interface:")
     print("  1. Keep this server running")
     print("  2. Update jpl_horizons_lookup.html to use:")
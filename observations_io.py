@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+Observation Ingestion
+Streaming readers for MPC 80-column and ADES (PSV and XML) observation files
+
+The readers consume a file one line (or one XML element) at a time and
+yield compact Observation tuples. ObservationIndex stores a whole batch
+as typed columns (array.array, viewed as NumPy arrays without copying) and
+indexes it by object, observatory code and epoch, so that a residual run
+can select e.g. "all G96 observations of C/2025 N1 on Dec 19" from
+millions of rows without keeping a Python object per observation.
+
+Requires: numpy (for ObservationIndex)
+
+Usage:
+    python observations_io.py <file> [<file> ...]
+"""
+
+import sys
+import xml.etree.ElementTree as ET
+from array import array
+from collections import namedtuple
+
+from time_scales import date_to_jd, mpc_string
+
+Observation = namedtuple('Observation', [
+    'designation', 'station', 'jd_utc', 'ra_deg', 'dec_deg', 'mag', 'band',
+])
+
+_BASE62 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+_CENTURY = {'I': 18, 'J': 19, 'K': 20, 'L': 21}
+
+# Note 2 (column 15) values of lines that are not primary optical positions
+# (second lines of satellite/roving observations, radar)
+_SKIP_NOTE2 = set('srvRX')
+
+def iso_to_jd(text):
+    """Julian Date of an ADES ISO 8601 time ('2025-12-19T01:21:40.123Z')"""
+    text = text.strip().rstrip('Z')
+    date, _, time = text.partition('T')
+    year, month, day = (int(part) for part in date.split('-'))
+    hours, minutes, seconds = (time.split(':') + ['0', '0', '0'])[:3]
+    return date_to_jd(year, month, day, int(hours), int(minutes), float(seconds))
+
+def jd_to_mpc_timestamp(jd_utc, digits=6):
+    """
+    Format a UTC Julian Date as an MPC timestamp (YYYY MM DD.dddddd)
+
+    Args:
+        jd_utc: UTC Julian Date
+        digits: Decimal places of the day (rounded, carrying into the next day)
+
+    Returns:
+        String in format "YYYY MM DD.dddddd"
+    """
+    return mpc_string(jd_utc, digits)
+
+def unpack_designation(packed):
+    """
+    Unpack an MPC packed designation (columns 1-12 of an 80-column line)
+
+    Handles numbered minor planets ('00433', 'A0345', '~0000'), numbered
+    periodic comets ('0001P'), and packed provisional designations of minor
+    planets ('K25N01A') and comets ('CK25N010'). Anything else is returned
+    stripped but otherwise unchanged.
+
+    Args:
+        packed: Columns 1-12 of the observation line
+
+    Returns:
+        Unpacked designation (e.g. '433', '100345', '1P', 'C/2025 N1', '2025 NA1')
+    """
+    number = packed[0:5]
+    provisional = packed[5:12].strip()
+
+    if number[:4].strip():
+        if number[4] in 'PCDXI' and number[:4].isdigit():
+            return f"{int(number[:4])}{number[4]}"
+        if number[0] == '~':
+            value = 0
+            for char in number[1:5]:
+                value = value * 62 + _BASE62.index(char)
+            return str(620000 + value)
+        if number[1:].isdigit():
+            return str(_BASE62.index(number[0]) * 10000 + int(number[1:]))
+        return number.strip()
+
+    if len(provisional) == 7 and provisional[0] in _CENTURY:
+        year = _CENTURY[provisional[0]] * 100 + int(provisional[1:3])
+        half_month = provisional[3]
+        cycle = _BASE62.index(provisional[4]) * 10 + int(provisional[5])
+        last = provisional[6]
+        if packed[4] in 'PCDXI':
+            # Comet: last character is a fragment letter or '0'
+            fragment = f"-{last.upper()}" if last.islower() else ''
+            suffix = f"{half_month}{cycle if cycle else ''}{fragment}"
+            return f"{packed[4]}/{year} {suffix}"
+        return f"{year} {half_month}{last}{cycle if cycle else ''}"
+
+    return (number + provisional).strip()
+
+def _parse_mpc80_line(line):
+    """Parse one 80-column optical line; returns None for lines to skip"""
+    if len(line) < 80 or line[14] in _SKIP_NOTE2:
+        return None
+
+    year = int(line[15:19])
+    month = int(line[20:22])
+    jd = date_to_jd(year, month, float(line[23:32]))
+
+    ra_h, ra_m, ra_s = line[32:44].split()
+    ra = (float(ra_h) + float(ra_m) / 60.0 + float(ra_s) / 3600.0) * 15.0
+
+    dec_field = line[44:56]
+    dec_d, dec_m, dec_s = dec_field.split()
+    dec = abs(float(dec_d)) + float(dec_m) / 60.0 + float(dec_s) / 3600.0
+    if dec_field.lstrip().startswith('-'):
+        dec = -dec
+
+    mag_text = line[65:70].strip()
+    return Observation(
+        designation=unpack_designation(line[0:12]),
+        station=line[77:80],
+        jd_utc=jd,
+        ra_deg=ra,
+        dec_deg=dec,
+        mag=float(mag_text) if mag_text else float('nan'),
+        band=line[70].strip(),
+    )
+
+def iter_mpc80(lines):
+    """
+    Stream observations from MPC 80-column lines
+
+    Args:
+        lines: Iterable of lines (e.g. an open file)
+
+    Yields:
+        Observation for every optical position line
+    """
+    for line in lines:
+        line = line.rstrip('\r\n')
+        try:
+            observation = _parse_mpc80_line(line)
+        except ValueError:
+            # Headers, blank lines and malformed records
+            continue
+        if observation is not None:
+            yield observation
+
+def _ades_observation(fields):
+    """Build an Observation from a dictionary of ADES field values"""
+    # Prefer the provisional designation, as in 80-column comet records
+    designation = fields.get('provID') or fields.get('permID') or fields.get('trkSub') or ''
+    mag = fields.get('mag', '').strip()
+    return Observation(
+        designation=designation.strip(),
+        station=fields.get('stn', '').strip(),
+        jd_utc=iso_to_jd(fields['obsTime']),
+        ra_deg=float(fields['ra']),
+        dec_deg=float(fields['dec']),
+        mag=float(mag) if mag else float('nan'),
+        band=fields.get('band', '').strip(),
+    )
+
+def iter_ades_psv(lines):
+    """
+    Stream observations from an ADES PSV file
+
+    Args:
+        lines: Iterable of lines
+
+    Yields:
+        Observation for every optical data row
+    """
+    columns = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if not line.strip() or line[0] in '#!':
+            continue
+        values = [value.strip() for value in line.split('|')]
+        if columns is None or 'obsTime' in values:
+            # Header row (repeated per block in some files)
+            columns = values
+            continue
+        fields = dict(zip(columns, values))
+        if not fields.get('ra') or not fields.get('dec'):
+            continue
+        try:
+            yield _ades_observation(fields)
+        except (KeyError, ValueError):
+            continue
+
+def iter_ades_xml(source):
+    """
+    Stream observations from an ADES XML file
+
+    Each <optical> element, and each block under the root, is removed from
+    its parent as soon as it is parsed, so memory does not grow with the
+    size of the file.
+
+    Args:
+        source: Path or binary file object
+
+    Yields:
+        Observation for every <optical> element
+    """
+    parents = []
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            parents.append(element)
+            continue
+        parents.pop()
+        parent = parents[-1] if parents else None
+        if element.tag.rsplit('}', 1)[-1] != 'optical':
+            if parent is not None and len(parents) == 1:
+                # A finished block (obsBlock) under the root
+                parent.remove(element)
+            continue
+        fields = {child.tag.rsplit('}', 1)[-1]: (child.text or '') for child in element}
+        if parent is not None:
+            parent.remove(element)
+        element.clear()
+        try:
+            yield _ades_observation(fields)
+        except (KeyError, ValueError):
+            continue
+
+def detect_format(path):
+    """Guess 'xml', 'psv' or 'mpc80' from the start of a file"""
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            stripped = line.strip()
+            if not stripped:
+                continue
+            if stripped.startswith('<'):
+                return 'xml'
+            if stripped.startswith('#') or '|' in stripped:
+                return 'psv'
+            return 'mpc80'
+    return 'mpc80'
+
+def iter_observations(path, fmt=None):
+    """
+    Stream observations from a file in any supported format
+
+    Args:
+        path: Path to an MPC 80-column, ADES PSV or ADES XML file
+        fmt: 'mpc80', 'psv' or 'xml' (detected from the content if omitted)
+
+    Yields:
+        Observation
+    """
+    fmt = fmt or detect_format(path)
+    if fmt == 'xml':
+        yield from iter_ades_xml(path)
+        return
+    with open(path, encoding='utf-8', errors='replace') as f:
+        if fmt == 'psv':
+            yield from iter_ades_psv(f)
+        else:
+            yield from iter_mpc80(f)
+
+class ObservationIndex:
+    """
+    Columnar store of observations with indexes by object, station and epoch
+
+    Strings (designations, station codes, bands) are interned to small
+    integer ids; numeric columns are typed arrays. Call finalize() (or any
+    query method) after adding to build the indexes.
+    """
+
+    def __init__(self):
+        self.objects = []
+        self.stations = []
+        self.bands = []
+        self._object_ids = {}
+        self._station_ids = {}
+        self._band_ids = {}
+
+        self.object_id = array('I')
+        self.station_id = array('H')
+        self.band_id = array('B')
+        self.jd_utc = array('d')
+        self.ra_deg = array('d')
+        self.dec_deg = array('d')
+        self.mag = array('f')
+
+        self._by_object = None
+        self._by_station = None
+        self._epoch_order = None
+
+    def __len__(self):
+        return len(self.jd_utc)
+
+    @staticmethod
+    def _intern(value, values, ids):
+        index = ids.get(value)
+        if index is None:
+            index = ids[value] = len(values)
+            values.append(value)
+        return index
+
+    def add(self, observation):
+        """Append one Observation"""
+        self.object_id.append(self._intern(observation.designation, self.objects, self._object_ids))
+        self.station_id.append(self._intern(observation.station, self.stations, self._station_ids))
+        self.band_id.append(self._intern(observation.band, self.bands, self._band_ids))
+        self.jd_utc.append(observation.jd_utc)
+        self.ra_deg.append(observation.ra_deg)
+        self.dec_deg.append(observation.dec_deg)
+        self.mag.append(observation.mag)
+        self._by_object = None
+
+    def extend(self, observations):
+        """Append every Observation from an iterable (e.g. iter_observations)"""
+        for observation in observations:
+            self.add(observation)
+        return self
+
+    @classmethod
+    def from_files(cls, paths, fmt=None):
+        """Build an index by streaming one or more observation files"""
+        index = cls()
+        for path in paths:
+            index.extend(iter_observations(path, fmt))
+        return index.finalize()
+
+    def finalize(self):
+        """Build the object, station and epoch indexes"""
+        import numpy as np
+
+        def group(ids):
+            ids = np.frombuffer(ids, dtype=ids.typecode) if len(ids) else np.empty(0, dtype=np.intp)
+            order = np.argsort(ids, kind='stable')
+            boundaries = np.flatnonzero(np.diff(ids[order])) + 1
+            return {int(ids[rows[0]]): rows for rows in np.split(order, boundaries) if rows.size}
+
+        self._by_object = group(self.object_id)
+        self._by_station = group(self.station_id)
+        self._epoch_order = np.argsort(self.column('jd_utc'), kind='stable')
+        return self
+
+    def column(self, name):
+        """Zero-copy NumPy view of a column ('jd_utc', 'ra_deg', 'dec_deg', 'mag', ...)"""
+        import numpy as np
+        values = getattr(self, name)
+        return np.frombuffer(values, dtype=values.typecode) if len(values) else np.empty(0)
+
+    def select(self, designation=None, station=None, jd_min=None, jd_max=None):
+        """
+        Row numbers of the observations matching all given criteria
+
+        Args:
+            designation: Object designation (as yielded by the readers)
+            station: MPC observatory code
+            jd_min, jd_max: Inclusive UTC Julian Date range
+
+        Returns:
+            Sorted NumPy array of row numbers
+        """
+        import numpy as np
+
+        if self._by_object is None:
+            self.finalize()
+
+        rows = None
+        if designation is not None:
+            object_id = self._object_ids.get(designation)
+            rows = self._by_object.get(object_id, np.empty(0, dtype=np.intp))
+        if station is not None:
+            station_id = self._station_ids.get(station)
+            station_rows = self._by_station.get(station_id, np.empty(0, dtype=np.intp))
+            rows = station_rows if rows is None else np.intersect1d(rows, station_rows)
+
+        if jd_min is not None or jd_max is not None:
+            jd = self.column('jd_utc')
+            sorted_jd = jd[self._epoch_order]
+            lo = 0 if jd_min is None else np.searchsorted(sorted_jd, jd_min, side='left')
+            hi = len(sorted_jd) if jd_max is None else np.searchsorted(sorted_jd, jd_max, side='right')
+            epoch_rows = self._epoch_order[lo:hi]
+            rows = epoch_rows if rows is None else np.intersect1d(rows, epoch_rows)
+
+        if rows is None:
+            return np.arange(len(self))
+        return np.sort(rows)
+
+    def columns(self, rows):
+        """
+        Column arrays for a selection of rows
+
+        Returns:
+            Dictionary with 'designation', 'station', 'band' (lists) and
+            'jd_utc', 'ra_deg', 'dec_deg', 'mag' (NumPy arrays)
+        """
+        result = {name: self.column(name)[rows] for name in ('jd_utc', 'ra_deg', 'dec_deg', 'mag')}
+        object_id = self.column('object_id')[rows]
+        station_id = self.column('station_id')[rows]
+        band_id = self.column('band_id')[rows]
+        result['designation'] = [self.objects[i] for i in object_id.tolist()]
+        result['station'] = [self.stations[i] for i in station_id.tolist()]
+        result['band'] = [self.bands[i] for i in band_id.tolist()]
+        return result
+
+    def summary(self):
+        """Observation counts per object and per station"""
+        if self._by_object is None:
+            self.finalize()
+        return (
+            {self.objects[i]: len(rows) for i, rows in self._by_object.items()},
+            {self.stations[i]: len(rows) for i, rows in self._by_station.items()},
+        )
+
+def main():
+    """Summarize one or more observation files"""
+    if len(sys.argv) < 2:
+        print(__doc__.split('Usage:', 1)[1].rstrip())
+        sys.exit(1)
+
+    index = ObservationIndex.from_files(sys.argv[1:])
+    by_object, by_station = index.summary()
+
+    print("="*70)
+    print("OBSERVATIONS")
+    print("="*70)
+    print(f"Total:        {len(index):,}")
+    if len(index):
+        jd = index.column('jd_utc')
+        print(f"First epoch:  {jd_to_mpc_timestamp(jd.min())}")
+        print(f"Last epoch:   {jd_to_mpc_timestamp(jd.max())}")
+    print()
+    print(f"{'Object':<20} {'Count':>10}")
+    print("-"*70)
+    for name, count in sorted(by_object.items(), key=lambda item: -item[1]):
+        print(f"{name:<20} {count:>10,}")
+    print()
+    print(f"{'Station':<20} {'Count':>10}")
+    print("-"*70)
+    for name, count in sorted(by_station.items(), key=lambda item: -item[1]):
+        print(f"{name:<20} {count:>10,}")
+    print("="*70)
+
+if __name__ == '__main__':
+    main()
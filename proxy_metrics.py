@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Proxy Metrics
+Counters and histograms for the Horizons proxies, rendered in the
+Prometheus text exposition format for a /metrics endpoint
+
+Recording a value takes one lock and one bisect into a short list of
+bucket bounds, so it is cheap enough to do on every request; the text
+is only built when /metrics is scraped. Both jpl_horizons_server.py
+(threaded Flask) and horizons_async_proxy.py use one ProxyMetrics.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upstream latency buckets in seconds; Horizons answers in 0.2-30 s
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Response body size buckets in bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Routes counted under their own path label; any other path (404 noise) is 'other'
+PATH_LABELS = ('/api/horizons', '/api/horizons_file', '/api/horizons_file.api', '/health', '/metrics')
+
+def path_label(path):
+    """Fixed path label of a request path, so label values cannot grow without bound"""
+    return path if path in PATH_LABELS else 'other'
+
+def escape_label(value):
+    """Label value escaped for the text exposition format (backslash, quote, newline)"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Histogram:
+    """Fixed-bucket histogram (not thread-safe; ProxyMetrics holds the lock)"""
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # bisect_left: a value equal to a bound belongs to that bucket (le=)
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name):
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.bounds, self.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum {self.sum:.6f}')
+        lines.append(f'{name}_count {self.count}')
+        return lines
+
+class ProxyMetrics:
+    """
+    Request, upstream and cache metrics of one proxy
+
+    Usage:
+        metrics = ProxyMetrics()
+        with metrics.upstream() as call:     # around each upstream request
+            status, text = fetch(...)
+            call.status = status
+        metrics.record_cache('miss')
+        metrics.record_response('/api/horizons', 200, len(body), elapsed)
+        text = metrics.render()
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = {}                  # (path, status) -> count
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+        self.request_latency = Histogram(LATENCY_BUCKETS)
+        self.upstream_latency = Histogram(LATENCY_BUCKETS)
+        self.upstream_statuses = {}         # status -> count
+        self.upstream_timeouts = 0
+        self.upstream_errors = 0
+        self.upstream_in_flight = 0
+        self.cache = {'hit': 0, 'coalesced': 0, 'miss': 0}
+
+    def upstream(self):
+        """Context manager timing one upstream call; set .status on it"""
+        return _UpstreamCall(self)
+
+    def _upstream_started(self):
+        with self._lock:
+            self.upstream_in_flight += 1
+
+    def _upstream_finished(self, elapsed, status, timeout, error):
+        with self._lock:
+            self.upstream_in_flight -= 1
+            if timeout:
+                self.upstream_timeouts += 1
+            elif error:
+                self.upstream_errors += 1
+            else:
+                self.upstream_latency.observe(elapsed)
+                self.upstream_statuses[status] = self.upstream_statuses.get(status, 0) + 1
+
+    def record_cache(self, result):
+        """Count a lookup: 'hit' (response cache), 'coalesced' (shared in-flight call) or 'miss'"""
+        with self._lock:
+            self.cache[result] += 1
+
+    def record_response(self, path, status, size, elapsed):
+        """Count a response sent to a client (path is reduced to path_label())"""
+        path = path_label(path)
+        with self._lock:
+            key = (path, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if path == '/api/horizons':
+                self.response_bytes.observe(size)
+                self.request_latency.observe(elapsed)
+
+    def cache_hit_ratio(self):
+        lookups = sum(self.cache.values())
+        return (self.cache['hit'] + self.cache['coalesced']) / lookups if lookups else 0.0
+
+    def render(self):
+        """Metrics in the Prometheus text exposition format"""
+        with self._lock:
+            out = []
+
+            def family(name, kind, help_text):
+                out.append(f'# HELP {name} {help_text}')
+                out.append(f'# TYPE {name} {kind}')
+
+            family('horizons_proxy_requests_total', 'counter', 'Responses sent to clients')
+            for (path, status), n in sorted(self.requests.items()):
+                out.append(f'horizons_proxy_requests_total{{path="{escape_label(path)}",'
+                           f'status="{escape_label(status)}"}} {n}')
+
+            family('horizons_proxy_request_duration_seconds', 'histogram',
+                   'Time to answer /api/horizons requests')
+            out.extend(self.request_latency.render('horizons_proxy_request_duration_seconds'))
+
+            family('horizons_proxy_response_bytes', 'histogram', 'Size of /api/horizons response bodies')
+            out.extend(self.response_bytes.render('horizons_proxy_response_bytes'))
+
+            family('horizons_upstream_request_duration_seconds', 'histogram',
+                   'Latency of completed upstream Horizons requests')
+            out.extend(self.upstream_latency.render('horizons_upstream_request_duration_seconds'))
+
+            family('horizons_upstream_responses_total', 'counter', 'Upstream responses by HTTP status')
+            for status, n in sorted(self.upstream_statuses.items()):
+                out.append(f'horizons_upstream_responses_total{{status="{escape_label(status)}"}} {n}')
+
+            family('horizons_upstream_timeouts_total', 'counter', 'Upstream requests that timed out')
+            out.append(f'horizons_upstream_timeouts_total {self.upstream_timeouts}')
+
+            family('horizons_upstream_errors_total', 'counter',
+                   'Upstream requests that failed without a response')
+            out.append(f'horizons_upstream_errors_total {self.upstream_errors}')
+
+            family('horizons_upstream_in_flight', 'gauge', 'Upstream requests currently in progress')
+            out.append(f'horizons_upstream_in_flight {self.upstream_in_flight}')
+
+            family('horizons_proxy_cache_lookups_total', 'counter',
+                   'Requests answered from the cache, by a shared in-flight call, or upstream')
+            for result in ('hit', 'coalesced', 'miss'):
+                out.append(f'horizons_proxy_cache_lookups_total{{result="{result}"}} {self.cache[result]}')
+
+            family('horizons_proxy_cache_hit_ratio', 'gauge',
+                   'Fraction of requests that needed no upstream call of their own')
+            out.append(f'horizons_proxy_cache_hit_ratio {self.cache_hit_ratio():.6f}')
+
+            family('horizons_proxy_uptime_seconds', 'gauge', 'Seconds since the proxy started')
+            out.append(f'horizons_proxy_uptime_seconds {time.time() - self.started:.3f}')
+
+        return '\n'.join(out) + '\n'
+
+class _UpstreamCall:
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.status = None
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self.metrics._upstream_started()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.perf_counter() - self._start
+        timeout = exc_type is not None and _is_timeout(exc)
+        self.metrics._upstream_finished(self.elapsed, self.status, timeout,
+                                        exc_type is not None and not timeout)
+        return False
+
+def _is_timeout(exc):
+    """True for asyncio, socket and requests timeouts"""
+    if isinstance(exc, TimeoutError):
+        return True
+    return type(exc).__name__ in ('TimeoutError', 'Timeout', 'ReadTimeout', 'ConnectTimeout')
+
+def server_timing(cache=None, **durations):
+    """
+    Server-Timing header value from durations in seconds
+
+    Example: server_timing('miss', upstream=0.8, total=0.81)
+        -> 'cache;desc=miss, upstream;dur=800.0, total;dur=810.0'
+    """
+    parts = [f'cache;desc={cache}'] if cache else []
+    parts.extend(f'{name};dur={1000.0 * seconds:.1f}' for name, seconds in durations.items()
+                 if seconds is not None)
+    return ', '.join(parts)
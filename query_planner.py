@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Horizons Query Planner
+Collects pending (object, observatory, epoch) requests and answers them
+with as few Horizons calls as possible
+
+Requests that share an object and observer location differ only in their
+TLIST, so they are merged into one time list per (object, center), with
+identical epochs requested once. Each list is then split by
+plan_tlist_calls(): one GET when it fits the URL limit, otherwise chunks
+of up to 10,000 epochs POSTed to the file API.
+
+Usage:
+    python query_planner.py <requests.csv> [--dry-run]
+
+The CSV has object, observatory and epoch (MPC timestamp) columns.
+"""
+
+import argparse
+import csv
+import sys
+from collections import OrderedDict, namedtuple
+
+from jpl_horizons_query import convert_mpc_timestamp, fetch_ephemeris_rows, plan_tlist_calls
+
+PlannedCall = namedtuple('PlannedCall', ['object_id', 'center', 'utc_times', 'use_file_api'])
+
+class QueryPlanner:
+    """
+    Accumulates ephemeris requests and executes them as grouped TLIST calls
+
+    Usage:
+        planner = QueryPlanner()
+        tickets = [planner.add(obj, code, ts) for obj, code, ts in observations]
+        rows = planner.execute()          # one row per add(), in order
+        print(planner.report())
+    """
+
+    def __init__(self):
+        self.requests = []
+        # (object_id, center) -> ordered set of UTC times
+        self._groups = OrderedDict()
+
+    def __len__(self):
+        return len(self.requests)
+
+    def add(self, object_id, observatory_code, mpc_timestamp):
+        """
+        Queue one request (same arguments as query_horizons)
+
+        Returns:
+            Ticket number; the index of this request's row in execute()
+        """
+        center = observatory_code if observatory_code.startswith('@') else f'@{observatory_code}'
+        utc_time = convert_mpc_timestamp(mpc_timestamp)
+        self.requests.append((object_id, center, utc_time))
+        self._groups.setdefault((object_id, center), {})[utc_time] = None
+        return len(self.requests) - 1
+
+    def plan(self):
+        """
+        Planned Horizons calls
+
+        Returns:
+            List of PlannedCall
+        """
+        calls = []
+        for (object_id, center), times in self._groups.items():
+            for batch, use_file_api in plan_tlist_calls(object_id, center, sorted(times)):
+                calls.append(PlannedCall(object_id, center, batch, use_file_api))
+        return calls
+
+    def report(self):
+        """
+        Planned call count versus one call per request
+
+        Returns:
+            Dictionary with request, group, unique epoch and call counts
+        """
+        calls = self.plan()
+        return {
+            'requests': len(self.requests),
+            'groups': len(self._groups),
+            'unique_epochs': sum(len(times) for times in self._groups.values()),
+            'naive_calls': len(self.requests),
+            'planned_calls': len(calls),
+            'get_calls': sum(1 for call in calls if not call.use_file_api),
+            'file_api_calls': sum(1 for call in calls if call.use_file_api),
+        }
+
+    def execute(self):
+        """
+        Run the planned calls
+
+        Returns:
+            List of parsed ephemeris rows (see parse_ephemeris), one per
+            add() call, in ticket order
+        """
+        rows = {}
+        for (object_id, center), times in self._groups.items():
+            unique_times = sorted(times)
+            for utc_time, row in zip(unique_times, fetch_ephemeris_rows(object_id, center, unique_times)):
+                rows[(object_id, center, utc_time)] = row
+        return [dict(rows[request]) for request in self.requests]
+
+def print_report(report):
+    """Print a planner report"""
+    saved = report['naive_calls'] - report['planned_calls']
+    print(f"Requests:        {report['requests']:,}")
+    print(f"Object/centers:  {report['groups']:,}")
+    print(f"Unique epochs:   {report['unique_epochs']:,}")
+    print(f"Naive calls:     {report['naive_calls']:,}")
+    print(f"Planned calls:   {report['planned_calls']:,} "
+          f"({report['get_calls']:,} GET, {report['file_api_calls']:,} file API)")
+    if report['naive_calls']:
+        print(f"Calls saved:     {saved:,} ({100.0 * saved / report['naive_calls']:.1f}%)")
+
+def main(argv=None):
+    """Plan (and optionally run) the requests in a CSV file"""
+    parser = argparse.ArgumentParser(description="Group Horizons requests into minimal calls")
+    parser.add_argument('requests', help="CSV with object, observatory, epoch columns")
+    parser.add_argument('--dry-run', action='store_true', help="Only print the plan")
+    args = parser.parse_args(argv)
+
+    planner = QueryPlanner()
+    try:
+        with open(args.requests, newline='') as f:
+            for row in csv.DictReader(f):
+                planner.add(row['object'].strip(), row['observatory'].strip(), row['epoch'].strip())
+    except (OSError, KeyError, ValueError) as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    print("="*70)
+    print("HORIZONS QUERY PLAN")
+    print("="*70)
+    print_report(planner.report())
+    print("="*70)
+
+    if args.dry_run:
+        return
+
+    try:
+        rows = planner.execute()
+    except Exception as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    print()
+    print(f"{'Object':<12} {'Center':<8} {'UTC Time':<26} {'RA (ICRF)':<16} {'DEC (ICRF)':<16}")
+    print("-"*70)
+    for (object_id, center, utc_time), row in zip(planner.requests, rows):
+        print(f"{object_id:<12} {center:<8} {utc_time:<26} {row['ra_icrf']:<16} {row['dec_icrf']:<16}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Vectorized O-C residual engine
+Array-native counterpart of calculate_residuals() in comet_residuals_analysis.py
+and comet_residuals_manual_entry.py
+
+Takes whole columns of observed and calculated RA/Dec (decimal degrees) and
+returns ΔRA·cos(δ), ΔDec and the exact great-circle separation for every
+observation in one pass. The separation uses the Vincenty form of the
+great-circle distance, which stays accurate from milliarcseconds up to
+180°, instead of the small-angle Pythagorean approximation.
+
+Requires: numpy
+"""
+
+import numpy as np
+
+ARCSEC_PER_DEG = 3600.0
+
+def wrap_ra_difference(ra_diff_deg):
+    """
+    Wrap RA differences into [-180, 180) degrees
+
+    Args:
+        ra_diff_deg: Array of RA differences in degrees
+
+    Returns:
+        Array of wrapped differences
+    """
+    return (np.asarray(ra_diff_deg, dtype=np.float64) + 180.0) % 360.0 - 180.0
+
+def angular_separation(ra1_deg, dec1_deg, ra2_deg, dec2_deg):
+    """
+    Exact great-circle separation (Vincenty formula)
+
+    Args:
+        ra1_deg, dec1_deg: First positions in decimal degrees (arrays)
+        ra2_deg, dec2_deg: Second positions in decimal degrees (arrays)
+
+    Returns:
+        Array of separations in arcseconds
+    """
+    ra1 = np.radians(np.asarray(ra1_deg, dtype=np.float64))
+    dec1 = np.radians(np.asarray(dec1_deg, dtype=np.float64))
+    ra2 = np.radians(np.asarray(ra2_deg, dtype=np.float64))
+    dec2 = np.radians(np.asarray(dec2_deg, dtype=np.float64))
+
+    dra = ra2 - ra1
+    sin_dra = np.sin(dra)
+    cos_dra = np.cos(dra)
+    sin_d1 = np.sin(dec1)
+    cos_d1 = np.cos(dec1)
+    sin_d2 = np.sin(dec2)
+    cos_d2 = np.cos(dec2)
+
+    num1 = cos_d2 * sin_dra
+    num2 = cos_d1 * sin_d2 - sin_d1 * cos_d2 * cos_dra
+    denominator = sin_d1 * sin_d2 + cos_d1 * cos_d2 * cos_dra
+
+    return np.degrees(np.arctan2(np.hypot(num1, num2), denominator)) * ARCSEC_PER_DEG
+
+def calculate_residuals(obs_ra_deg, obs_dec_deg, calc_ra_deg, calc_dec_deg):
+    """
+    Calculate O-C residuals in arcseconds for arrays of observations
+
+    Args:
+        obs_ra_deg, obs_dec_deg: Observed positions in decimal degrees
+        calc_ra_deg, calc_dec_deg: Calculated positions in decimal degrees
+
+    Returns:
+        Tuple of arrays (ra_residual_arcsec, dec_residual_arcsec,
+        total_separation_arcsec). The RA residual is ΔRA·cos(δ) using the
+        mean declination, as in the scalar scripts; the total separation
+        is the exact great-circle distance.
+    """
+    obs_ra = np.asarray(obs_ra_deg, dtype=np.float64)
+    obs_dec = np.asarray(obs_dec_deg, dtype=np.float64)
+    calc_ra = np.asarray(calc_ra_deg, dtype=np.float64)
+    calc_dec = np.asarray(calc_dec_deg, dtype=np.float64)
+
+    # RA residual with cos(dec) correction, wrapped across 0h/24h
+    ra_residual_arcsec = wrap_ra_difference(obs_ra - calc_ra)
+    ra_residual_arcsec *= np.cos(np.radians(0.5 * (obs_dec + calc_dec)))
+    ra_residual_arcsec *= ARCSEC_PER_DEG
+
+    # Dec residual
+    dec_residual_arcsec = (obs_dec - calc_dec) * ARCSEC_PER_DEG
+
+    # Total angular separation
+    total_separation_arcsec = angular_separation(obs_ra, obs_dec, calc_ra, calc_dec)
+
+    return ra_residual_arcsec, dec_residual_arcsec, total_separation_arcsec
+
+def main():
+    """Time the engine on a synthetic set of observations"""
+    import sys
+    import time
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    rng = np.random.default_rng(44)
+    calc_ra = rng.uniform(0.0, 360.0, n)
+    calc_dec = np.degrees(np.arcsin(rng.uniform(-1.0, 1.0, n)))
+    obs_ra = calc_ra + rng.normal(0.0, 1.0, n) / 3600.0
+    obs_dec = calc_dec + rng.normal(0.0, 1.0, n) / 3600.0
+
+    start = time.perf_counter()
+    ra_res, dec_res, total_sep = calculate_residuals(obs_ra, obs_dec, calc_ra, calc_dec)
+    elapsed = time.perf_counter() - start
+
+    print(f"Observations:   {n:,}")
+    print(f"Elapsed:        {elapsed * 1000:.1f} ms")
+    print(f"Throughput:     {n / elapsed:,.0f} residuals/s")
+    print(f"RMS separation: {np.sqrt(np.mean(total_sep**2)):.3f} arcsec")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Residual Memo
+Computed O-C residuals remembered per observation and orbit solution, so
+a rerun only fetches and computes what is new
+
+Each observation is fingerprinted from its object, observatory, epoch and
+observed position (normalized to UTC JD and degrees, so reformatting a
+manifest does not change it). A residual is reused when the memo holds
+the same fingerprint for the object's current solution, which
+batch_residuals.py asks Horizons for once per object and run (a
+one-epoch header query, see probe_solution in jpl_horizons_query.py).
+Once Horizons reports a new solution every observation of that object
+misses again and is recomputed; rows of older solutions stay in the memo.
+
+Running statistics (count, mean, variance and RMS of the RA, Dec and
+total residuals) are kept per object and solution and updated with each
+batch of new residuals (Welford's method in the pairwise form of Chan et
+al.), so they never require a rescan of the history.
+
+Environment variables:
+    HORIZONS_RESIDUAL_MEMO  Database file (default: ~/.cache/horizons/residuals.sqlite)
+
+Usage:
+    python residual_memo.py [<object>]        # running statistics
+"""
+
+import hashlib
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_DB_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'horizons', 'residuals.sqlite')
+
+RESULT_FIELDS = (
+    'obs_ra', 'obs_dec', 'calc_ra', 'calc_dec',
+    'ra_residual', 'dec_residual', 'total_separation', 'mahalanobis', 'p_value',
+)
+
+# Residuals with running statistics
+STAT_FIELDS = ('ra_residual', 'dec_residual', 'total_separation')
+
+# Fingerprints are looked up this many at a time (SQLite parameter limit)
+_LOOKUP_BATCH = 500
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS residuals (
+    fingerprint TEXT NOT NULL,
+    solution TEXT NOT NULL,
+    object TEXT NOT NULL,
+    observatory TEXT NOT NULL,
+    jd_utc REAL NOT NULL,
+    {', '.join(f'{field} REAL' for field in RESULT_FIELDS)},
+    computed_at REAL NOT NULL,
+    PRIMARY KEY (fingerprint, solution)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS running_stats (
+    object TEXT NOT NULL,
+    solution TEXT NOT NULL,
+    field TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    mean REAL NOT NULL,
+    m2 REAL NOT NULL,
+    PRIMARY KEY (object, solution, field)
+) WITHOUT ROWID;
+"""
+
+def fingerprint(object_id, observatory, jd_utc, ra_deg, dec_deg):
+    """
+    Fingerprint of one observation
+
+    The epoch is rounded to 1 microsecond and the position to 1e-9 deg
+    (4 microarcseconds), well below any measurement precision.
+    """
+    text = (f"{object_id.strip()}|{observatory.strip().lstrip('@').upper()}|"
+            f"{jd_utc:.11f}|{ra_deg:.9f}|{dec_deg:.9f}")
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+def manifest_fingerprints(manifest):
+    """
+    Fingerprints of manifest rows (object, observatory, epoch, ra, dec)
+
+    Returns:
+        Tuple of (list of fingerprints, array of UTC JD); rows that cannot
+        be parsed get None and NaN (they fail later with their own error)
+    """
+    from sexagesimal import parse_ra_dec
+    from time_scales import mpc_to_utc
+
+    try:
+        jd = np.add(*mpc_to_utc([row['epoch'] for row in manifest]))
+        ra, dec = parse_ra_dec([row['ra'] for row in manifest], [row['dec'] for row in manifest])
+        parsed = [(float(j), float(r), float(d)) for j, r, d in zip(jd, ra, dec)]
+    except ValueError:
+        # Some row is malformed: parse row by row so the others still match
+        parsed = []
+        for row in manifest:
+            try:
+                jd = np.add(*mpc_to_utc([row['epoch']]))
+                ra, dec = parse_ra_dec([row['ra']], [row['dec']])
+                parsed.append((float(jd[0]), float(ra[0]), float(dec[0])))
+            except ValueError:
+                parsed.append(None)
+
+    prints = [fingerprint(row['object'], row['observatory'], *values) if values is not None else None
+              for row, values in zip(manifest, parsed)]
+    jd_utc = np.array([values[0] if values is not None else np.nan for values in parsed])
+    return prints, jd_utc
+
+class RunningStats:
+    """
+    Count, mean and M2 (sum of squared deviations) of a stream of values
+
+    update() adds one value (Welford); merge() adds a whole batch at once
+    (Chan et al.). NaN values are ignored.
+    """
+
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, value):
+        if math.isnan(value):
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        n = values.size
+        if not n:
+            return
+        batch_mean = float(values.mean())
+        batch_m2 = float(np.sum((values - batch_mean) ** 2))
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += batch_m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    @property
+    def variance(self):
+        """Sample variance"""
+        return self.m2 / (self.count - 1) if self.count > 1 else math.nan
+
+    @property
+    def rms(self):
+        """Root mean square of the values (not of the deviations)"""
+        return math.sqrt(self.m2 / self.count + self.mean * self.mean) if self.count else math.nan
+
+class ResidualMemo:
+    """
+    SQLite memo of residuals keyed by (fingerprint, solution)
+
+    Args:
+        path: Database file (created if missing)
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as db:
+            db.executescript(_SCHEMA)
+
+    def _connection(self):
+        """One connection per thread and process (connections must not cross a fork)"""
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def lookup(self, prints, solution):
+        """
+        Memoized results of one solution
+
+        Args:
+            prints: Fingerprints to look up
+            solution: Orbit solution name
+
+        Returns:
+            Dictionary of fingerprint -> dictionary of RESULT_FIELDS
+        """
+        db = self._connection()
+        found = {}
+        prints = [p for p in dict.fromkeys(prints) if p is not None]
+        for start in range(0, len(prints), _LOOKUP_BATCH):
+            batch = prints[start:start + _LOOKUP_BATCH]
+            records = db.execute(
+                f"SELECT fingerprint, {', '.join(RESULT_FIELDS)} FROM residuals "
+                f"WHERE solution = ? AND fingerprint IN ({', '.join('?' * len(batch))})",
+                [solution] + batch).fetchall()
+            for record in records:
+                found[record[0]] = dict(zip(RESULT_FIELDS, record[1:]))
+        return found
+
+    def record(self, object_id, observatory, solution, prints, jd_utc, columns):
+        """
+        Remember new residuals of one object and solution, updating its running statistics
+
+        Rows already memoized (e.g. written by a concurrent run) are skipped
+        and do not count twice.
+
+        Args:
+            object_id, observatory: Observation metadata
+            solution: Orbit solution the residuals were computed with
+            prints: Fingerprint per row
+            jd_utc: UTC Julian Date per row
+            columns: Dictionary of RESULT_FIELDS arrays, one entry per row
+
+        Returns:
+            Number of rows added
+        """
+        if not solution:
+            # Residuals that cannot be tied to a solution could go stale unnoticed
+            return 0
+        db = self._connection()
+        now = time.time()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            known = set(self.lookup(prints, solution))
+            new = [i for i, p in enumerate(prints) if p is not None and p not in known]
+            new = list({prints[i]: i for i in new}.values())
+            if not new:
+                return 0
+            values = {field: np.asarray(columns[field], dtype=np.float64)[new] for field in RESULT_FIELDS}
+            placeholders = ', '.join('?' * (len(RESULT_FIELDS) + 6))
+            db.executemany(f"INSERT INTO residuals VALUES ({placeholders})", [
+                (prints[i], solution, object_id, observatory.lstrip('@'), float(jd_utc[i]),
+                 *(float(values[field][k]) for field in RESULT_FIELDS), now)
+                for k, i in enumerate(new)
+            ])
+            for field in STAT_FIELDS:
+                stats = self._stats(db, object_id, solution, field)
+                stats.merge(values[field])
+                db.execute("INSERT OR REPLACE INTO running_stats VALUES (?, ?, ?, ?, ?, ?)",
+                           (object_id, solution, field, stats.count, stats.mean, stats.m2))
+        return len(new)
+
+    def _stats(self, db, object_id, solution, field):
+        record = db.execute(
+            "SELECT count, mean, m2 FROM running_stats WHERE object = ? AND solution = ? AND field = ?",
+            (object_id, solution, field)).fetchone()
+        return RunningStats(*record) if record else RunningStats()
+
+    def running_stats(self, object_id=None):
+        """
+        Running statistics per object and solution
+
+        Returns:
+            Dictionary of (object, solution) -> {field: RunningStats}
+        """
+        query = "SELECT object, solution, field, count, mean, m2 FROM running_stats"
+        params = ()
+        if object_id is not None:
+            query += " WHERE object = ?"
+            params = (object_id,)
+        result = {}
+        for obj, sol, field, count, mean, m2 in self._connection().execute(query + " ORDER BY object, solution", params):
+            result.setdefault((obj, sol), {})[field] = RunningStats(count, mean, m2)
+        return result
+
+def main():
+    """Print the running statistics of a memo"""
+    memo = ResidualMemo(os.environ.get('HORIZONS_RESIDUAL_MEMO', DEFAULT_DB_PATH))
+    object_id = sys.argv[1] if len(sys.argv) > 1 else None
+    stats = memo.running_stats(object_id)
+    if not stats:
+        print(f"No residuals memoized in {memo.path}", file=sys.stderr)
+        sys.exit(1)
+
+    print("="*88)
+    print("MEMOIZED RESIDUALS (running statistics)")
+    print("="*88)
+    print(f"{'Object':<16} {'Solution':<12} {'Count':>10} {'Mean RA':>9} {'Mean Dec':>9} "
+          f"{'SD RA':>8} {'SD Dec':>8} {'RMS sep':>9}   (arcsec)")
+    print("-"*88)
+    for (obj, sol), fields in stats.items():
+        ra, dec, sep = (fields[name] for name in STAT_FIELDS)
+        print(f"{obj:<16} {sol:<12} {sep.count:>10,} {ra.mean:>9.3f} {dec.mean:>9.3f} "
+              f"{math.sqrt(ra.variance) if ra.count > 1 else math.nan:>8.3f} "
+              f"{math.sqrt(dec.variance) if dec.count > 1 else math.nan:>8.3f} {sep.rms:>9.3f}")
+    print("="*88)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Columnar Residual Store
+Append-only history of O-C residuals, partitioned by object and orbit
+solution, that can be filtered and aggregated without parsing text reports
+
+Layout:
+    <root>/<object>/<solution>/part-00000.npy
+                               part-00001.npy ...
+                               part-00000-00041.npy   (compacted parts 0 to 41)
+
+Each append writes one new part: a NumPy structured array in .npy format
+(written to a temporary file and linked into place, so readers never see
+a half-written part and concurrent writers never overwrite each other).
+Parts are opened memory-mapped, so selecting a column is a strided view
+of the file with no copy and no parse; only the pages actually touched
+are read. compact() merges a partition's parts into one, named for the
+range of part numbers it covers; readers skip parts inside a range, so
+until the merged parts are removed (or after a crash before that) no row
+is seen twice. Part numbers are never reused. Appends and compactions of
+a partition hold its lock file (.lock) while they choose part numbers.
+
+Object and solution names are percent-encoded for the directory names
+('C/2025 N1' -> 'C%2F2025%20N1').
+
+Requires: numpy
+
+Usage:
+    python residual_store.py <root> [<object> [<solution>]] [--compact]
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:     # Windows: appends and compactions are not locked
+    fcntl = None
+
+DEFAULT_STORE_DIR = 'residual_store'
+
+RESIDUAL_DTYPE = np.dtype([
+    ('jd_utc', 'f8'),
+    ('observatory', 'S4'),
+    ('obs_ra', 'f8'),
+    ('obs_dec', 'f8'),
+    ('calc_ra', 'f8'),
+    ('calc_dec', 'f8'),
+    ('ra_residual', 'f8'),
+    ('dec_residual', 'f8'),
+    ('total_separation', 'f8'),
+    ('smaa_3sig', 'f8'),
+    ('smia_3sig', 'f8'),
+    ('theta', 'f8'),
+    ('mahalanobis', 'f8'),
+    ('p_value', 'f8'),
+    ('recorded_at', 'f8'),
+])
+
+_PART_RE = re.compile(r'^part-(\d{5,})(?:-(\d{5,}))?\.npy$')
+
+def _encode(name):
+    """Directory name of an object or solution (percent-encoded; '.' and '..' escaped too)"""
+    encoded = quote(str(name), safe='')
+    if not encoded:
+        raise ValueError("Object and solution names must not be empty")
+    if not encoded.strip('.'):
+        encoded = encoded.replace('.', '%2E')
+    return encoded
+
+def _part_ranges(directory):
+    """(first, last, file name) of every part file, by first number then widest range"""
+    ranges = []
+    for match in map(_PART_RE.match, os.listdir(directory)):
+        if match:
+            first = int(match.group(1))
+            ranges.append((first, int(match.group(2) or first), match.group(0)))
+    return sorted(ranges, key=lambda r: (r[0], -r[1]))
+
+def _live_parts(ranges):
+    """Parts not covered by the range of a compacted part"""
+    live = []
+    covered_to = -1
+    for first, last, name in ranges:
+        if last > covered_to:
+            live.append((first, last, name))
+            covered_to = last
+    return live
+
+@contextmanager
+def _partition_lock(directory):
+    """Serialize part numbering of one partition across processes"""
+    with open(os.path.join(directory, '.lock'), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def _join(arrays, name):
+    """One array from per-part pieces; a single piece is returned as is"""
+    if len(arrays) == 1:
+        return arrays[0]
+    return np.concatenate(arrays) if arrays else np.empty(0, dtype=RESIDUAL_DTYPE[name])
+
+class ResidualStore:
+    """
+    Partitioned store of residual rows (see RESIDUAL_DTYPE)
+
+    Usage:
+        store = ResidualStore('residual_store')
+        store.append('C/2025 N1', 'JPL#44', {'jd_utc': jd, 'ra_residual': ra_res, ...})
+        for part in store.scan('C/2025 N1'):        # memory-mapped parts
+            sep = part['total_separation']          # zero-copy view
+        data = store.select('C/2025 N1', 'JPL#44', columns=['jd_utc', 'total_separation'],
+                            jd_min=2461028.5)
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+
+    def _partition_dir(self, object_id, solution):
+        return os.path.join(self.root, _encode(object_id), _encode(solution))
+
+    def append(self, object_id, solution, columns):
+        """
+        Append rows to an object/solution partition
+
+        Args:
+            object_id: Object designation or SPK-ID
+            solution: Orbit solution name (e.g. 'JPL#44')
+            columns: Dictionary of equal-length arrays (or scalars for one
+                     row) keyed by RESIDUAL_DTYPE field names; missing
+                     numeric fields are NaN, recorded_at defaults to now
+
+        Returns:
+            Path of the new part file
+        """
+        unknown = set(columns) - set(RESIDUAL_DTYPE.names)
+        if unknown:
+            raise ValueError(f"Unknown residual columns: {', '.join(sorted(unknown))}")
+
+        arrays = {name: np.atleast_1d(np.asarray(value)) for name, value in columns.items()}
+        lengths = {len(array) for array in arrays.values()}
+        if len(lengths) > 1:
+            raise ValueError("Residual columns have different lengths")
+        n = lengths.pop() if lengths else 0
+
+        table = np.zeros(n, dtype=RESIDUAL_DTYPE)
+        for name in RESIDUAL_DTYPE.names:
+            if name in arrays:
+                table[name] = arrays[name]
+            elif RESIDUAL_DTYPE[name].kind == 'f':
+                table[name] = np.nan
+        if 'recorded_at' not in arrays:
+            table['recorded_at'] = time.time()
+
+        directory = self._partition_dir(object_id, solution)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, table)
+            with _partition_lock(directory):
+                number = self._next_part_number(directory)
+                while True:
+                    path = os.path.join(directory, f'part-{number:05d}.npy')
+                    try:
+                        os.link(tmp, path)
+                        return path
+                    except FileExistsError:
+                        number += 1
+        finally:
+            os.unlink(tmp)
+
+    def _next_part_number(self, directory):
+        """One past the highest part number, including those inside compacted ranges"""
+        ranges = _part_ranges(directory)
+        return max(last for _, last, _ in ranges) + 1 if ranges else 0
+
+    def partitions(self, object_id=None, solution=None):
+        """
+        Stored (object, solution) pairs, optionally restricted to one object/solution
+        """
+        if not os.path.isdir(self.root):
+            return []
+        objects = [_encode(object_id)] if object_id is not None else sorted(os.listdir(self.root))
+        found = []
+        for obj in objects:
+            obj_dir = os.path.join(self.root, obj)
+            if not os.path.isdir(obj_dir):
+                continue
+            solutions = [_encode(solution)] if solution is not None else sorted(os.listdir(obj_dir))
+            for sol in solutions:
+                if os.path.isdir(os.path.join(obj_dir, sol)):
+                    found.append((unquote(obj), unquote(sol)))
+        return found
+
+    def part_paths(self, object_id, solution):
+        """Part files of one partition, oldest first"""
+        directory = self._partition_dir(object_id, solution)
+        if not os.path.isdir(directory):
+            return []
+        return [os.path.join(directory, name) for _, _, name in _live_parts(_part_ranges(directory))]
+
+    def _open_parts(self, object_id, solution):
+        """
+        Memory-map the parts of one partition
+
+        A compaction may remove parts between listing and opening; the
+        listing is then repeated. Mapped parts stay readable once removed.
+        """
+        while True:
+            try:
+                return [np.load(path, mmap_mode='r') for path in self.part_paths(object_id, solution)]
+            except FileNotFoundError:
+                continue
+
+    def scan(self, object_id=None, solution=None):
+        """
+        Memory-mapped parts of the matching partitions
+
+        Yields:
+            Read-only structured arrays (np.memmap); indexing a field gives
+            a zero-copy view of that column
+        """
+        for obj, sol in self.partitions(object_id, solution):
+            for part in self._open_parts(obj, sol):
+                if len(part):
+                    yield part
+
+    def column(self, name, object_id=None, solution=None):
+        """
+        One column of the matching partitions
+
+        A partition with a single part (e.g. after compact()) is returned
+        as a zero-copy view; several parts are concatenated into a copy.
+        """
+        return _join([part[name] for part in self.scan(object_id, solution)], name)
+
+    def select(self, object_id=None, solution=None, columns=None,
+               jd_min=None, jd_max=None, observatory=None):
+        """
+        Rows of the matching partitions filtered by epoch and observatory
+
+        Args:
+            object_id, solution: Partition filter (None for all)
+            columns: Field names to return (default: all)
+            jd_min, jd_max: Inclusive epoch range (UTC Julian Date)
+            observatory: MPC observatory code
+
+        Returns:
+            Dictionary of arrays keyed by column name; unfiltered columns of
+            a single part are zero-copy views
+        """
+        columns = list(columns or RESIDUAL_DTYPE.names)
+        code = observatory.encode('ascii') if observatory is not None else None
+        pieces = {name: [] for name in columns}
+        for part in self.scan(object_id, solution):
+            mask = None
+            if jd_min is not None or jd_max is not None:
+                jd = part['jd_utc']
+                mask = np.ones(len(part), dtype=bool)
+                if jd_min is not None:
+                    mask &= jd >= jd_min
+                if jd_max is not None:
+                    mask &= jd <= jd_max
+            if code is not None:
+                match = part['observatory'] == code
+                mask = match if mask is None else mask & match
+            for name in columns:
+                pieces[name].append(part[name] if mask is None else part[name][mask])
+        return {name: _join(values, name) for name, values in pieces.items()}
+
+    def summary(self, object_id=None, solution=None, threshold=3.0):
+        """
+        Per-partition row count, RMS/max separation and outlier count
+
+        Aggregates part by part, so memory use does not grow with history.
+
+        Returns:
+            List of dictionaries, one per partition
+        """
+        rows = []
+        for obj, sol in self.partitions(object_id, solution):
+            count = 0
+            valid_count = 0
+            sum_sq = 0.0
+            max_sep = np.nan
+            outliers = 0
+            jd_min = np.inf
+            jd_max = -np.inf
+            parts = self._open_parts(obj, sol)
+            for part in parts:
+                if not len(part):
+                    continue
+                sep = part['total_separation']
+                valid = sep[np.isfinite(sep)]
+                count += len(part)
+                valid_count += valid.size
+                sum_sq += float(np.dot(valid, valid))
+                if valid.size:
+                    max_sep = np.fmax(max_sep, valid.max())
+                with np.errstate(invalid='ignore'):
+                    outliers += int((part['mahalanobis'] > threshold).sum())
+                jd = part['jd_utc']
+                jd = jd[np.isfinite(jd)]
+                if jd.size:
+                    jd_min = min(jd_min, float(jd.min()))
+                    jd_max = max(jd_max, float(jd.max()))
+            rows.append({
+                'object': obj,
+                'solution': sol,
+                'parts': len(parts),
+                'rows': count,
+                'rms_separation': np.sqrt(sum_sq / valid_count) if valid_count else np.nan,
+                'max_separation': float(max_sep),
+                'outliers': outliers,
+                'jd_min': jd_min if np.isfinite(jd_min) else None,
+                'jd_max': jd_max if np.isfinite(jd_max) else None,
+            })
+        return rows
+
+    def compact(self, object_id, solution):
+        """
+        Merge a partition's parts into a single part
+
+        The merged part is linked in before the parts it covers are removed,
+        so readers never see a row twice; parts left behind by an
+        interrupted compaction are removed by the next one.
+
+        Returns:
+            Number of rows in the merged part
+        """
+        directory = self._partition_dir(object_id, solution)
+        if not os.path.isdir(directory):
+            return 0
+        with _partition_lock(directory):
+            ranges = _part_ranges(directory)
+            live = _live_parts(ranges)
+            if len(live) > 1:
+                merged = np.concatenate([np.load(os.path.join(directory, name), mmap_mode='r')
+                                         for _, _, name in live])
+                first, last = live[0][0], max(last for _, last, _ in live)
+                fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as f:
+                    np.save(f, merged)
+                name = f'part-{first:05d}-{last:05d}.npy'
+                os.replace(tmp, os.path.join(directory, name))
+                live = [(first, last, name)]
+            for stale in {name for _, _, name in ranges} - {name for _, _, name in live}:
+                os.remove(os.path.join(directory, stale))
+            return sum(len(np.load(os.path.join(directory, name), mmap_mode='r')) for _, _, name in live)
+
+def main(argv=None):
+    """Summarize (and optionally compact) a residual store"""
+    parser = argparse.ArgumentParser(description="Columnar residual store")
+    parser.add_argument('root', help="Store directory")
+    parser.add_argument('object', nargs='?', help="Only this object")
+    parser.add_argument('solution', nargs='?', help="Only this solution")
+    parser.add_argument('--compact', action='store_true', help="Merge each partition into one part")
+    args = parser.parse_args(argv)
+
+    store = ResidualStore(args.root)
+    if args.compact:
+        for obj, sol in store.partitions(args.object, args.solution):
+            store.compact(obj, sol)
+
+    rows = store.summary(args.object, args.solution)
+    if not rows:
+        print(f"No residuals stored in {args.root}", file=sys.stderr)
+        sys.exit(1)
+
+    print("="*90)
+    print("RESIDUAL STORE")
+    print("="*90)
+    print(f"{'Object':<20} {'Solution':<12} {'Parts':>6} {'Rows':>12} {'RMS (arcsec)':>13} "
+          f"{'Max (arcsec)':>13} {'Outliers':>9}")
+    print("-"*90)
+    for row in rows:
+        print(f"{row['object']:<20} {row['solution']:<12} {row['parts']:>6} {row['rows']:>12,} "
+              f"{row['rms_separation']:>13.3f} {row['max_separation']:>13.3f} {row['outliers']:>9,}")
+    print("="*90)
+
+if __name__ == '__main__':
+    main()
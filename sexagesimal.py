@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Bulk sexagesimal conversion
+Array counterparts of parse_ra_dec(), hms_to_degrees(), dms_to_degrees(),
+degrees_to_hms() and degrees_to_dms() for whole RA/Dec columns
+
+Parsing joins the column into a single string and converts every field
+in one numpy text scan, instead of a float() call per field.
+Space- and colon-separated input is accepted, and '-00 12 34.5' keeps its
+negative sign.
+
+Formatting works in integer units of the last printed digit, so seconds
+round up into minutes and hours instead of printing '60.000'.
+
+Requires: numpy
+"""
+
+import warnings
+
+import numpy as np
+
+def _parse_fields(strings, kind):
+    """Split sexagesimal strings into an (n, 3) float64 array"""
+    strings = list(strings)
+    if not strings:
+        return np.empty((0, 3), dtype=np.float64)
+
+    text = '\n'.join(strings)
+    if ':' in text:
+        strings = [entry.replace(':', ' ') for entry in strings]
+        text = '\n'.join(strings)
+
+    field_counts = np.fromiter(map(len, map(str.split, strings)), dtype=np.intp, count=len(strings))
+    bad = np.flatnonzero(field_counts != 3)
+    if bad.size:
+        raise ValueError(f"Invalid {kind} format: {strings[bad[0]]}")
+
+    try:
+        with warnings.catch_warnings():
+            # NumPy only warns when it stops at text it cannot parse
+            warnings.simplefilter('error', DeprecationWarning)
+            fields = np.fromstring(text, dtype=np.float64, sep=' ')
+    except (ValueError, DeprecationWarning):
+        fields = None
+
+    if fields is None or fields.size != 3 * len(strings):
+        # Find the first entry with a non-numeric field for the error message
+        for entry in strings:
+            try:
+                [float(part) for part in entry.split()]
+            except ValueError:
+                raise ValueError(f"Invalid {kind} format: {entry}")
+        raise ValueError(f"Invalid {kind} data")
+
+    return fields.reshape(-1, 3)
+
+def hms_to_degrees(hms_strings):
+    """
+    Convert RA strings (HH MM SS.sss or HH:MM:SS.sss) to decimal degrees
+
+    Args:
+        hms_strings: Sequence of RA strings
+
+    Returns:
+        float64 array of RA in decimal degrees
+    """
+    fields = _parse_fields(hms_strings, 'HMS')
+    return (fields[:, 0] + fields[:, 1] / 60.0 + fields[:, 2] / 3600.0) * 15.0
+
+def dms_to_degrees(dms_strings):
+    """
+    Convert Dec strings (±DD MM SS.ss or ±DD:MM:SS.ss) to decimal degrees
+
+    Args:
+        dms_strings: Sequence of Dec strings
+
+    Returns:
+        float64 array of Dec in decimal degrees
+    """
+    fields = _parse_fields(dms_strings, 'DMS')
+    # signbit keeps the sign of '-00' (parsed as -0.0)
+    degrees = np.abs(fields[:, 0]) + fields[:, 1] / 60.0 + fields[:, 2] / 3600.0
+    return np.where(np.signbit(fields[:, 0]), -degrees, degrees)
+
+def parse_ra_dec(ra_strings, dec_strings):
+    """
+    Convert columns of RA/Dec strings to decimal degrees
+
+    Args:
+        ra_strings: Sequence of RA strings
+        dec_strings: Sequence of Dec strings
+
+    Returns:
+        Tuple of float64 arrays (ra_deg, dec_deg)
+    """
+    return hms_to_degrees(ra_strings), dms_to_degrees(dec_strings)
+
+def _split_units(values, unit_scale, precision):
+    """Round to the last printed digit and split into (whole, minutes, seconds units)"""
+    scale = 10 ** precision
+    units = np.rint(np.asarray(values, dtype=np.float64) * (unit_scale * scale)).astype(np.int64)
+    whole, rest = np.divmod(units, 3600 * scale)
+    minutes, seconds = np.divmod(rest, 60 * scale)
+    return whole, minutes, seconds, scale
+
+def degrees_to_hms(degrees, precision=3, sep=':'):
+    """
+    Convert decimal degrees to HH:MM:SS.SSS strings
+
+    Args:
+        degrees: Array of RA in decimal degrees
+        precision: Decimal places of seconds
+        sep: Field separator (':' or ' ')
+
+    Returns:
+        List of strings
+    """
+    ra = np.mod(np.asarray(degrees, dtype=np.float64), 360.0)
+    hours, minutes, seconds, scale = _split_units(ra, 3600.0 / 15.0, precision)
+    hours %= 24
+    width = 3 + precision if precision else 2
+    return [f"{h:02d}{sep}{m:02d}{sep}{s / scale:0{width}.{precision}f}"
+            for h, m, s in zip(hours.tolist(), minutes.tolist(), seconds.tolist())]
+
+def degrees_to_dms(degrees, precision=2, sep=':'):
+    """
+    Convert decimal degrees to ±DD:MM:SS.SS strings
+
+    Args:
+        degrees: Array of Dec in decimal degrees
+        precision: Decimal places of seconds
+        sep: Field separator (':' or ' ')
+
+    Returns:
+        List of strings
+    """
+    dec = np.asarray(degrees, dtype=np.float64)
+    d, minutes, seconds, scale = _split_units(np.abs(dec), 3600.0, precision)
+    signs = np.where(np.signbit(dec), '-', '+')
+    width = 3 + precision if precision else 2
+    return [f"{sign}{dd:02d}{sep}{m:02d}{sep}{s / scale:0{width}.{precision}f}"
+            for sign, dd, m, s in zip(signs.tolist(), d.tolist(), minutes.tolist(), seconds.tolist())]
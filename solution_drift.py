@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Orbit-Solution Drift
+How far the predictions of two or more orbit solutions move apart over
+months of epochs
+
+Every solution is evaluated on one shared, dense grid of UTC epochs and
+compared with a reference solution (the newest, i.e. the highest solution
+number, by default). For each
+epoch the offset of a solution from the reference is split into:
+
+    separation    great-circle distance (arcsec)
+    along-track   offset along the reference's direction of sky motion (arcsec);
+                  positive when the solution is ahead
+    cross-track   offset perpendicular to it (arcsec); positive to the left
+                  of the motion
+    time offset   along-track offset divided by the sky rate (seconds): how
+                  early (+) or late (-) the solution has the object
+
+and the largest drift of each interval (default one day) is reported.
+
+Positions come from sources that need no Horizons call:
+
+    archive   the osculating elements of the solution_NN_jpl_database.html
+              pages, propagated with two_body.py (Solutions 40, 41, 42, 44)
+    store     rows of each solution kept in the ephemeris store
+              (ephemeris_store.py keeps superseded solutions), Hermite
+              interpolated onto the grid; epochs outside a solution's
+              stored span, or where the interpolation error bound exceeds
+              --max-error (gaps between sparse stored epochs), are NaN
+
+Two-body positions ignore perturbations and nongravitational forces, and
+the archived elements osculate at different epochs, so archive drift
+includes some model difference; store rows are full Horizons
+ephemerides. Compare solutions from the same kind of source.
+
+Requires: numpy
+
+Usage:
+    python solution_drift.py archive <page.html> <page.html> [...] [options]
+    python solution_drift.py store <object_id> <observatory> [--solutions JPL#42,JPL#44] [options]
+
+Options:
+    --start, --stop   Grid span (UTC JD or 'YYYY-MM-DD[ HH:MM]'); archive default:
+                      180 days from the reference's osculating epoch, store
+                      default: the span stored for every solution
+    --step            Grid step in hours (default 1)
+    --interval        Summary interval in days (default 1)
+    --reference       Reference solution name (default: the newest)
+    --max-error       Largest interpolation error bound accepted in store mode
+                      (arcsec, default 0.05)
+    --observatory     Observatory code for archive positions (default 500, geocentric)
+
+Example:
+    python solution_drift.py archive solution_4[0124]_jpl_database.html --interval 30
+"""
+
+import argparse
+import html
+import re
+import sys
+
+import numpy as np
+
+ARCSEC_PER_RAD = 206264.80624709636
+
+# Store mode: epochs whose interpolation error bound exceeds this are dropped (arcsec)
+DEFAULT_MAX_ERROR = 0.05
+
+# Label -> field of the element tables on the solution archive pages
+_ARCHIVE_FIELDS = {
+    'e': r'e \(eccentricity\)',
+    'q': r'q \(perihelion distance, au\)',
+    'inc': r'i \(inclination, deg\)',
+    'node': r'Ω \(longitude of node, deg\)',
+    'peri': r'ω \(argument of perihelion, deg\)',
+    'tp': r'tp \(perihelion time, JD\)',
+    'epoch': r'Epoch \(JD\)',
+}
+_NUMBER = r'\s+([-+−]?\d+(?:\.\d*)?(?:[Ee][-+−]?\d+)?)'
+
+def archive_elements(path):
+    """
+    OrbitalElements from a solution archive page (solution_NN_jpl_database.html)
+
+    Raises:
+        ValueError: if the page has no complete element table
+    """
+    from two_body import OrbitalElements
+
+    with open(path, encoding='utf-8', errors='replace') as f:
+        text = html.unescape(re.sub(r'<[^>]+>', ' ', f.read()))
+    text = ' '.join(text.split())
+
+    values = {}
+    for field, label in _ARCHIVE_FIELDS.items():
+        match = re.search(label + _NUMBER, text)
+        if match is None:
+            raise ValueError(f"{path}: no '{label.replace(chr(92), '')}' in the element table")
+        values[field] = float(match.group(1).replace('−', '-'))
+
+    match = re.search(r'Orbit Solution\s+JPL\s*#?\s*(\d+)', text)
+    solution = f"JPL#{match.group(1)}" if match else path
+    return OrbitalElements(solution=solution, **values)
+
+def parse_epoch(text):
+    """UTC Julian Date from a JD number or 'YYYY-MM-DD[ HH:MM[:SS]]'"""
+    text = str(text).strip()
+    try:
+        return float(text)
+    except ValueError:
+        from ephemeris_store import utc_to_jd
+        return utc_to_jd(text.replace('T', ' '))
+
+def dense_grid(jd_start, jd_stop, step_days):
+    """Evenly stepped UTC epochs from jd_start to jd_stop inclusive"""
+    count = int(np.floor((jd_stop - jd_start) / step_days + 1e-9)) + 1
+    if count < 2:
+        raise ValueError("The grid needs at least two epochs (check --start/--stop/--step)")
+    return jd_start + step_days * np.arange(count)
+
+def elements_positions(elements, jd_utc, observatory='500'):
+    """
+    Two-body RA/Dec of one solution on a grid
+
+    Args:
+        elements: OrbitalElements
+        jd_utc: Grid of UTC Julian Dates
+        observatory: MPC observatory code ('500' for geocentric)
+
+    Returns:
+        Tuple of arrays (ra_deg, dec_deg)
+    """
+    from time_scales import utc_to_tdb
+    from topocentric import OBSERVATORIES
+    from two_body import TwoBodyOrbit
+
+    jd_tdb = utc_to_tdb(jd_utc)
+    observer = None
+    if observatory != '500':
+        observer = OBSERVATORIES.geocentric_positions([observatory] * len(jd_utc), jd_utc, jd_tdb)
+    ra, dec, _ = TwoBodyOrbit(elements).radec(jd_tdb, observer)
+    return ra, dec
+
+def solution_order(solution):
+    """Sort key putting solutions oldest first (by solution number; see is_newer_solution)"""
+    from ephemeris_store import solution_number
+    number = solution_number(solution)
+    return (number is not None, number or 0, solution)
+
+def store_positions(store, object_id, center, solution, jd_utc, max_error=DEFAULT_MAX_ERROR):
+    """
+    RA/Dec of one stored solution interpolated onto a grid
+
+    Stored rows are often sparse observation epochs, and the Hermite error
+    across a gap of days can exceed the drift being measured, so epochs
+    whose error bound exceeds max_error are NaN as well.
+
+    Args:
+        max_error: Largest accepted interpolation error bound (arcsec; None: any)
+
+    Returns:
+        Tuple of arrays (ra_deg, dec_deg, error_bound_arcsec); positions are
+        NaN outside the stored span or beyond max_error, the bound is NaN
+        outside the span
+    """
+    from ephemeris_interpolation import InterpolatedEphemeris
+    from sexagesimal import parse_ra_dec
+
+    rows = [row for row in store.range(object_id, center, -np.inf, np.inf, solution=solution)
+            if row.get('ra_icrf') and row.get('dec_icrf') and row.get('dra_cosd') and row.get('ddec_dt')]
+    if len(rows) < 2:
+        raise ValueError(f"Fewer than two stored rows with rates for {object_id} {solution} at {center}")
+
+    ra, dec = parse_ra_dec([row['ra_icrf'] for row in rows], [row['dec_icrf'] for row in rows])
+    ephemeris = InterpolatedEphemeris(
+        [row['epoch'] for row in rows], ra, dec,
+        [float(row['dra_cosd']) for row in rows], [float(row['ddec_dt']) for row in rows],
+        object_id=object_id, center=center, solution=solution)
+
+    jd_utc = np.asarray(jd_utc, dtype=np.float64)
+    inside = (jd_utc >= ephemeris.jd[0]) & (jd_utc <= ephemeris.jd[-1])
+    ra_grid = np.full(jd_utc.shape, np.nan)
+    dec_grid = np.full(jd_utc.shape, np.nan)
+    error = np.full(jd_utc.shape, np.nan)
+    if inside.any():
+        ra_grid[inside], dec_grid[inside], error[inside] = ephemeris.radec(jd_utc[inside])
+    if max_error is not None:
+        with np.errstate(invalid='ignore'):
+            coarse = error > max_error
+        ra_grid[coarse] = np.nan
+        dec_grid[coarse] = np.nan
+    return ra_grid, dec_grid, error
+
+def drift(jd, ref_ra, ref_dec, ra, dec):
+    """
+    Offsets of one solution from the reference on a shared grid
+
+    Args:
+        jd: Grid epochs (increasing)
+        ref_ra, ref_dec: Reference positions (degrees)
+        ra, dec: Positions of the compared solution (degrees)
+
+    Returns:
+        Dictionary of arrays: separation, along_track, cross_track (arcsec),
+        time_offset (seconds)
+    """
+    jd = np.asarray(jd, dtype=np.float64)
+    ra1, dec1 = np.radians(ref_ra), np.radians(ref_dec)
+    ra2, dec2 = np.radians(ra), np.radians(dec)
+
+    # Direction and length of the offset on the sphere (Vincenty terms)
+    dra = ra2 - ra1
+    sin_d1, cos_d1 = np.sin(dec1), np.cos(dec1)
+    sin_d2, cos_d2 = np.sin(dec2), np.cos(dec2)
+    east = cos_d2 * np.sin(dra)
+    north = cos_d1 * sin_d2 - sin_d1 * cos_d2 * np.cos(dra)
+    chord = np.hypot(east, north)
+    separation = np.arctan2(chord, sin_d1 * sin_d2 + cos_d1 * cos_d2 * np.cos(dra)) * ARCSEC_PER_RAD
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scale = np.where(chord > 0, separation / chord, 0.0)
+    east *= scale
+    north *= scale
+
+    # Sky motion of the reference (arcsec/day), from the grid itself
+    # (unwrapped over finite epochs only: np.unwrap carries a NaN forward)
+    ra_track = ra1.copy()
+    finite = np.isfinite(ra1)
+    ra_track[finite] = np.unwrap(ra1[finite])
+    motion_east = np.gradient(ra_track, jd) * cos_d1 * ARCSEC_PER_RAD
+    motion_north = np.gradient(dec1, jd) * ARCSEC_PER_RAD
+    rate = np.hypot(motion_east, motion_north)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        along_east = motion_east / rate
+        along_north = motion_north / rate
+        along = east * along_east + north * along_north
+        cross = north * along_east - east * along_north
+        time_offset = along / rate * 86400.0
+
+    return {
+        'separation': separation,
+        'along_track': along,
+        'cross_track': cross,
+        'time_offset': time_offset,
+    }
+
+def summarize(jd, result, interval_days=1.0):
+    """
+    Largest drift per interval
+
+    Args:
+        jd: Grid epochs
+        result: Dictionary from drift()
+        interval_days: Interval length
+
+    Returns:
+        List of dictionaries (one per interval with data): start, stop,
+        epochs, max_separation, max_along_track, max_cross_track (largest
+        absolute values, arcsec), max_time_offset (seconds) and jd_max
+        (epoch of the largest separation)
+    """
+    jd = np.asarray(jd, dtype=np.float64)
+    bins = np.floor((jd - jd[0]) / interval_days).astype(np.int64)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(bins)) + 1])
+    stops = np.append(starts[1:], len(jd))
+
+    separation = result['separation']
+    valid = np.isfinite(separation)
+    peaks = {}
+    for key in ('separation', 'along_track', 'cross_track', 'time_offset'):
+        values = np.abs(result[key])
+        peaks[key] = np.fmax.reduceat(np.where(np.isfinite(values), values, np.nan), starts)
+    counts = np.add.reduceat(valid.astype(np.int64), starts)
+
+    rows = []
+    for i, (start, stop) in enumerate(zip(starts, stops)):
+        if not counts[i]:
+            continue
+        index = start + int(np.nanargmax(separation[start:stop]))
+        rows.append({
+            'start': jd[0] + bins[start] * interval_days,
+            'stop': jd[0] + (bins[start] + 1) * interval_days,
+            'epochs': int(counts[i]),
+            'max_separation': float(peaks['separation'][i]),
+            'max_along_track': float(peaks['along_track'][i]),
+            'max_cross_track': float(peaks['cross_track'][i]),
+            'max_time_offset': float(peaks['time_offset'][i]),
+            'jd_max': float(jd[index]),
+        })
+    return rows
+
+def compare_solutions(jd, positions, reference=None):
+    """
+    Drift of every solution from a reference
+
+    Args:
+        jd: Grid epochs
+        positions: Dictionary of solution name -> (ra_deg, dec_deg) on the grid
+        reference: Reference solution name (default: the newest, see solution_order)
+
+    Returns:
+        Dictionary of solution name -> drift() result, without the reference
+    """
+    reference = reference or max(positions, key=solution_order)
+    if reference not in positions:
+        raise ValueError(f"Unknown reference solution: {reference}")
+    ref_ra, ref_dec = positions[reference]
+    return {name: drift(jd, ref_ra, ref_dec, ra, dec)
+            for name, (ra, dec) in positions.items() if name != reference}
+
+def _print_report(jd, results, reference, interval_days):
+    from observations_io import jd_to_mpc_timestamp
+
+    print("="*96)
+    print(f"ORBIT-SOLUTION DRIFT (reference {reference})")
+    print("="*96)
+    print(f"Grid: {len(jd):,} epochs, {jd_to_mpc_timestamp(jd[0], 2)} to {jd_to_mpc_timestamp(jd[-1], 2)} UTC")
+    for name, result in results.items():
+        rows = summarize(jd, result, interval_days)
+        print()
+        print(f"{name} - {reference}")
+        print(f"{'Interval start (UTC)':<22} {'Epochs':>7} {'Sep (arcsec)':>12} {'Along':>11} "
+              f"{'Cross':>11} {'Timing (s)':>11}  {'Worst epoch':<16}")
+        print("-"*96)
+        for row in rows:
+            print(f"{jd_to_mpc_timestamp(row['start'], 2):<22} {row['epochs']:>7,} "
+                  f"{row['max_separation']:>12.3f} {row['max_along_track']:>11.3f} "
+                  f"{row['max_cross_track']:>11.3f} {row['max_time_offset']:>11.1f}  "
+                  f"{jd_to_mpc_timestamp(row['jd_max'], 4):<16}")
+        overall = np.nanmax(result['separation']) if np.isfinite(result['separation']).any() else np.nan
+        print(f"{'Overall maximum':<22} {'':>7} {overall:>12.3f}")
+    print("="*96)
+
+def main(argv=None):
+    """Compare solutions from archive pages or the ephemeris store"""
+    parser = argparse.ArgumentParser(description="Orbit-solution drift comparison")
+    parser.add_argument('source', choices=('archive', 'store'))
+    parser.add_argument('args', nargs='+', help="Archive pages, or <object_id> <observatory>")
+    parser.add_argument('--solutions', help="Comma-separated stored solutions (store; default: all)")
+    parser.add_argument('--start', help="Grid start (UTC JD or date)")
+    parser.add_argument('--stop', help="Grid stop (UTC JD or date)")
+    parser.add_argument('--step', type=float, default=1.0, help="Grid step in hours")
+    parser.add_argument('--interval', type=float, default=1.0, help="Summary interval in days")
+    parser.add_argument('--reference', help="Reference solution (default: the newest)")
+    parser.add_argument('--observatory', default='500', help="Observatory code for archive positions")
+    parser.add_argument('--max-error', type=float, default=DEFAULT_MAX_ERROR,
+                        help="Largest interpolation error bound in store mode (arcsec, default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.source == 'archive':
+            elements = {}
+            for path in args.args:
+                orbit = archive_elements(path)
+                elements[orbit.solution] = orbit
+            if len(elements) < 2:
+                raise ValueError("Give at least two solution pages")
+            elements = {name: elements[name] for name in sorted(elements, key=solution_order)}
+            reference = args.reference or list(elements)[-1]
+            if reference not in elements:
+                raise ValueError(f"Unknown reference solution: {reference}")
+            start = parse_epoch(args.start) if args.start else elements[reference].epoch
+            stop = parse_epoch(args.stop) if args.stop else start + 180.0
+            jd = dense_grid(start, stop, args.step / 24.0)
+            positions = {name: elements_positions(orbit, jd, args.observatory.lstrip('@'))
+                         for name, orbit in elements.items()}
+        else:
+            if len(args.args) != 2:
+                raise ValueError("store needs <object_id> <observatory>")
+            from ephemeris_store import get_default_store
+            object_id, center = args.args
+            store = get_default_store()
+            if store is None:
+                raise ValueError("The ephemeris store is disabled (HORIZONS_NO_CACHE=1)")
+            code = center.lstrip('@')
+            spans = {sol: (first, last) for obj, sol, obs, _, first, last in store.stats()
+                     if obj == object_id and obs == code}
+            solutions = sorted(args.solutions.split(',') if args.solutions else spans, key=solution_order)
+            if len(solutions) < 2:
+                raise ValueError(f"Fewer than two stored solutions for {object_id} at {code}")
+            missing = [sol for sol in solutions if sol not in spans]
+            if missing:
+                raise ValueError(f"No stored rows for: {', '.join(missing)}")
+            reference = args.reference or solutions[-1]
+            start = parse_epoch(args.start) if args.start else max(spans[sol][0] for sol in solutions)
+            stop = parse_epoch(args.stop) if args.stop else min(spans[sol][1] for sol in solutions)
+            jd = dense_grid(start, stop, args.step / 24.0)
+            positions = {}
+            for sol in solutions:
+                ra, dec, error = store_positions(store, object_id, code, sol, jd, args.max_error)
+                positions[sol] = (ra, dec)
+                with np.errstate(invalid='ignore'):
+                    coarse = int((error > args.max_error).sum())
+                if coarse:
+                    print(f"{sol}: {coarse:,} of {len(jd):,} epochs dropped (interpolation error "
+                          f"above {args.max_error:g} arcsec; stored rows too sparse there)", file=sys.stderr)
+
+        results = compare_solutions(jd, positions, reference)
+    except (ValueError, OSError) as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    _print_report(jd, results, reference, args.interval)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+"""
+Offline SPK Ephemeris Backend
+Answers Horizons queries from locally downloaded SPK (.bsp) kernels
+
+Kernels are opened as memory-mapped DAF files. Only the file record and
+segment summaries are read up front; a segment's coefficients are NumPy
+views into the mapping, so pages are read from disk only for the records
+an epoch actually falls in. Supported segment types are 2 and 3
+(Chebyshev; planetary kernels such as de440s.bsp) and 1 and 21 (modified
+difference arrays; small-body kernels produced by Horizons).
+
+SPKBackend.request(params) takes the same parameter dictionary as
+jpl_horizons_query.request_horizons() and renders a response in Horizons'
+text format (observer tables and CSV state vectors), so parse_ephemeris()
+and everything downstream work unchanged with no network I/O. Kernels do
+not carry covariances, so the 3-sigma columns are 'n.a.'.
+
+Environment variables:
+    HORIZONS_SPK_KERNELS   Kernel paths separated by os.pathsep; a planetary
+                           kernel plus one or more small-body kernels. When
+                           several segments cover an epoch, later kernels win.
+
+Requires: numpy
+
+Usage:
+    python spk_backend.py <kernel.bsp> [<kernel.bsp> ...]
+"""
+
+import mmap
+import os
+import re
+import struct
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from sexagesimal import degrees_to_dms, degrees_to_hms
+from time_scales import date_to_jd
+from topocentric import AU_KM, C_AU_PER_DAY, OBSERVATORIES, utc_to_tdb
+
+J2000 = 2451545.0
+SECONDS_PER_DAY = 86400.0
+RECORD_BYTES = 1024
+EARTH = 399
+SSB = 0
+
+# Earth rotation rate (rad/day) for the observatory velocity
+EARTH_ROTATION = 7.292115e-5 * SECONDS_PER_DAY
+
+_MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+                'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+class SPKError(ValueError):
+    """A kernel cannot be read, or does not cover a request"""
+
+class Segment:
+    """One SPK segment; coefficient data is mapped on first use"""
+
+    def __init__(self, kernel, name, start_et, end_et, target, center, frame,
+                 data_type, start_address, end_address):
+        self.kernel = kernel
+        self.name = name
+        self.start_et = start_et
+        self.end_et = end_et
+        self.target = target
+        self.center = center
+        self.frame = frame
+        self.data_type = data_type
+        self.start_address = start_address
+        self.end_address = end_address
+        self._data = None
+
+    def __repr__(self):
+        return (f"Segment({self.name!r}, target={self.target}, center={self.center}, "
+                f"type={self.data_type})")
+
+    def array(self, first, count):
+        """Zero-copy view of `count` doubles starting at DAF word `first`"""
+        return self.kernel.doubles(self.start_address + first, count)
+
+    def _load(self):
+        """Map the segment's records and trailer (types 1, 2, 3, 21)"""
+        length = self.end_address - self.start_address + 1
+        if self.data_type in (2, 3):
+            init, interval, record_size, count = self.array(length - 4, 4)
+            record_size, count = int(record_size), int(count)
+            records = self.array(0, record_size * count).reshape(count, record_size)
+            self._data = (init, interval, records)
+        elif self.data_type in (1, 21):
+            if self.data_type == 1:
+                max_dim, count = 15, int(self.array(length - 1, 1)[0])
+            else:
+                max_dim, count = (int(value) for value in self.array(length - 2, 2))
+            record_size = 4 * max_dim + 11
+            records = self.array(0, record_size * count).reshape(count, record_size)
+            epochs = self.array(record_size * count, count)
+            self._data = (max_dim, records, epochs)
+        else:
+            raise SPKError(f"Unsupported SPK segment type {self.data_type}")
+        return self._data
+
+    def state(self, et):
+        """
+        Position (km) and velocity (km/s) of target relative to center
+
+        Args:
+            et: Array of TDB seconds past J2000 inside the segment's span
+
+        Returns:
+            Tuple of (n, 3) arrays (position, velocity)
+        """
+        et = np.asarray(et, dtype=np.float64)
+        data = self._data or self._load()
+        if self.data_type in (2, 3):
+            return _chebyshev_state(self.data_type, *data, et)
+        return _difference_line_state(*data, et)
+
+def _chebyshev_state(data_type, init, interval, records, et):
+    """Evaluate type 2/3 Chebyshev records"""
+    index = np.clip(((et - init) // interval).astype(np.int64), 0, len(records) - 1)
+    record = records[index]
+    midpoint, radius = record[:, 0], record[:, 1]
+    components = 3 if data_type == 2 else 6
+    degree = (records.shape[1] - 2) // components
+    coefficients = record[:, 2:2 + components * degree].reshape(len(et), components, degree)
+
+    s = (et - midpoint) / radius
+    t = np.empty((len(et), degree))
+    dt = np.zeros((len(et), degree))
+    t[:, 0] = 1.0
+    if degree > 1:
+        t[:, 1] = s
+        dt[:, 1] = 1.0
+    for k in range(2, degree):
+        t[:, k] = 2.0 * s * t[:, k - 1] - t[:, k - 2]
+        dt[:, k] = 2.0 * t[:, k - 1] + 2.0 * s * dt[:, k - 1] - dt[:, k - 2]
+
+    position = np.einsum('nck,nk->nc', coefficients[:, :3], t)
+    if data_type == 3:
+        velocity = np.einsum('nck,nk->nc', coefficients[:, 3:], t)
+    else:
+        velocity = np.einsum('nck,nk->nc', coefficients, dt) / radius[:, None]
+    return position, velocity
+
+def _difference_line_state(max_dim, records, epochs, et):
+    """Evaluate type 1/21 modified difference array records (after SPICE SPKE21)"""
+    index = np.clip(np.searchsorted(epochs, et, side='left'), 0, len(records) - 1)
+    position = np.empty((len(et), 3))
+    velocity = np.empty((len(et), 3))
+
+    for record_index in np.unique(index):
+        selected = np.flatnonzero(index == record_index)
+        record = records[record_index]
+        delta = et[selected] - record[0]
+        step = record[1:max_dim + 1]
+        reference = record[max_dim + 1:max_dim + 7]
+        ref_position, ref_velocity = reference[0::2], reference[1::2]
+        differences = record[max_dim + 7:4 * max_dim + 7].reshape(3, max_dim)
+        kq_max = int(record[4 * max_dim + 7])
+        kq = record[4 * max_dim + 8:4 * max_dim + 11].astype(int)
+
+        # Step-size function ratios; arrays are indexed from 1 as in SPICE
+        fc = np.zeros((kq_max + 1, len(delta)))
+        wc = np.zeros((kq_max + 1, len(delta)))
+        fc[1] = 1.0
+        tp = delta.copy()
+        for j in range(1, kq_max - 1):
+            fc[j + 1] = tp / step[j - 1]
+            wc[j] = delta / step[j - 1]
+            tp = delta + step[j - 1]
+
+        w = np.zeros((kq_max + 2, len(delta)))
+        w[1:kq_max + 1] = (1.0 / np.arange(1, kq_max + 1))[:, None]
+        ks = kq_max - 1
+        jx = 0
+        while ks >= 2:
+            jx += 1
+            for j in range(1, jx + 1):
+                w[j + ks] = fc[j + 1] * w[j + ks - 1] - wc[j] * w[j + ks]
+            ks -= 1
+
+        for axis in range(3):
+            total = differences[axis, :kq[axis]] @ w[ks + 1:ks + kq[axis] + 1]
+            position[selected, axis] = ref_position[axis] + delta * (ref_velocity[axis] + delta * total)
+
+        for j in range(1, jx + 1):
+            w[j + ks] = fc[j + 1] * w[j + ks - 1] - wc[j] * w[j + ks]
+        ks -= 1
+
+        for axis in range(3):
+            total = differences[axis, :kq[axis]] @ w[ks + 1:ks + kq[axis] + 1]
+            velocity[selected, axis] = ref_velocity[axis] + delta * total
+
+    return position, velocity
+
+class SPKKernel:
+    """
+    Memory-mapped SPK file
+
+    Only the file record, segment summaries and names are read when the
+    kernel is opened.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        file_record = self._map[:RECORD_BYTES]
+        if not file_record[:7] in (b'DAF/SPK', b'NAIF/DA'):
+            raise SPKError(f"Not an SPK file: {path}")
+
+        fmt = file_record[88:96]
+        if fmt == b'BIG-IEEE':
+            self.endian = '>'
+        elif fmt == b'LTL-IEEE':
+            self.endian = '<'
+        else:
+            # Pre-N0050 files have no format string; ND is always 2 for SPK
+            self.endian = '<' if struct.unpack('<i', file_record[8:12])[0] == 2 else '>'
+
+        nd, ni = struct.unpack(self.endian + '2i', file_record[8:16])
+        self.internal_name = file_record[16:76].decode('ascii', 'replace').strip()
+        first_summary, _, _ = struct.unpack(self.endian + '3i', file_record[76:88])
+        self.comment_records = range(2, first_summary)
+
+        self.segments = list(self._read_summaries(first_summary, nd, ni))
+
+    def _read_summaries(self, record_number, nd, ni):
+        """Walk the linked list of summary records"""
+        summary_words = nd + (ni + 1) // 2
+        double_format = f"{self.endian}{nd}d"
+        int_format = f"{self.endian}{ni}i"
+        while record_number:
+            offset = (record_number - 1) * RECORD_BYTES
+            control = struct.unpack(self.endian + '3d', self._map[offset:offset + 24])
+            next_record, count = int(control[0]), int(control[2])
+            names = self._map[offset + RECORD_BYTES:offset + 2 * RECORD_BYTES]
+            for i in range(count):
+                start = offset + 24 + i * summary_words * 8
+                doubles = struct.unpack(double_format, self._map[start:start + nd * 8])
+                ints = struct.unpack(int_format, self._map[start + nd * 8:start + nd * 8 + ni * 4])
+                name = names[i * summary_words * 8:(i + 1) * summary_words * 8]
+                yield Segment(self, name.decode('ascii', 'replace').strip(), doubles[0], doubles[1], *ints[:6])
+            record_number = next_record
+
+    def doubles(self, address, count):
+        """Zero-copy view of `count` doubles starting at 1-based DAF word address"""
+        return np.frombuffer(self._map, dtype=self.endian + 'f8', count=count, offset=(address - 1) * 8)
+
+    def comments(self):
+        """Text of the comment area"""
+        chunks = []
+        for record in self.comment_records:
+            data = self._map[(record - 1) * RECORD_BYTES:record * RECORD_BYTES]
+            end = data.find(b'\x04')
+            chunks.append(data[:1000 if end < 0 else end])
+            if end >= 0:
+                break
+        return b''.join(chunks).replace(b'\x00', b'\n').decode('ascii', 'replace')
+
+    def solution(self):
+        """Orbit solution name from the comment area (e.g. 'JPL#44'), if recorded"""
+        match = re.search(r'source:\s*([^}\s]+)|(JPL#\s*\d+)', self.comments())
+        if match:
+            return (match.group(1) or match.group(2)).replace(' ', '')
+        return None
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+class SPKEphemeris:
+    """Chained states from a set of kernels, relative to the solar-system barycenter"""
+
+    def __init__(self, paths):
+        self.kernels = [SPKKernel(path) for path in paths]
+        self._segments = {}
+        for kernel in self.kernels:
+            for segment in kernel.segments:
+                self._segments.setdefault(segment.target, []).append(segment)
+
+    def __contains__(self, target):
+        return target in self._segments
+
+    def targets(self):
+        return sorted(self._segments)
+
+    def segments(self, target):
+        return self._segments.get(target, [])
+
+    def resolve(self, object_id):
+        """
+        NAIF ID for a Horizons COMMAND value
+
+        Numeric SPK-IDs are used as-is (with the 2xxxxxx/20xxxxxx asteroid
+        numbering tried both ways); names match against segment names.
+
+        Returns:
+            NAIF ID, or None if no loaded kernel has the object
+        """
+        text = str(object_id).strip().strip("'\"").rstrip(';').strip()
+        text = re.sub(r'^(DES|NAME)\s*=\s*', '', text, flags=re.IGNORECASE)
+        if not text:
+            # An empty name would match every segment
+            return None
+        if re.fullmatch(r'-?\d+', text):
+            number = int(text)
+            for candidate in (number, number + 18000000, number - 18000000):
+                if candidate in self._segments:
+                    return candidate
+            return None
+        for target, segments in self._segments.items():
+            if any(text.upper() in segment.name.upper() for segment in segments):
+                return target
+        return None
+
+    def solution(self, target):
+        """Solution name for a target, from the kernel holding its last segment"""
+        segments = self.segments(target)
+        if not segments:
+            return None
+        kernel = segments[-1].kernel
+        return kernel.solution() or os.path.basename(kernel.path)
+
+    def state(self, target, et):
+        """
+        Barycentric state of a target
+
+        Args:
+            target: NAIF ID
+            et: Array of TDB seconds past J2000
+
+        Returns:
+            Tuple of (n, 3) arrays (position km, velocity km/s)
+        """
+        et = np.atleast_1d(np.asarray(et, dtype=np.float64))
+        position = np.zeros((len(et), 3))
+        velocity = np.zeros((len(et), 3))
+        if target == SSB:
+            return position, velocity
+
+        pending = np.ones(len(et), dtype=bool)
+        centers = np.full(len(et), -1, dtype=np.int64)
+        # Later segments (and later kernels) take precedence
+        for segment in reversed(self.segments(target)):
+            covered = pending & (et >= segment.start_et) & (et <= segment.end_et)
+            if not covered.any():
+                continue
+            p, v = segment.state(et[covered])
+            position[covered] = p
+            velocity[covered] = v
+            centers[covered] = segment.center
+            pending &= ~covered
+
+        if pending.any():
+            raise SPKError(f"No SPK data for target {target} at ET {et[pending][0]:.1f}")
+
+        for center in np.unique(centers):
+            selected = centers == center
+            p, v = self.state(int(center), et[selected])
+            position[selected] += p
+            velocity[selected] += v
+        return position, velocity
+
+def _parse_time(text):
+    """Julian Date of a Horizons time parameter ('JD2461028.5' or a calendar date)"""
+    text = text.strip().strip("'\"").strip()
+    if text.upper().startswith('JD'):
+        return float(text[2:])
+    match = re.match(r'(\d{4})-(\d{1,2}|[A-Za-z]{3})-(\d{1,2})(?:[ T](\d{1,2}):(\d{2})(?::(\d{2}(?:\.\d*)?))?)?', text)
+    if not match:
+        raise ValueError(f"Invalid time: {text}")
+    year, month, day, hours, minutes, seconds = match.groups()
+    month = _MONTH_NAMES.index(month.title()) + 1 if month.isalpha() else int(month)
+    return date_to_jd(int(year), month, int(day), int(hours or 0), int(minutes or 0), float(seconds or 0))
+
+def _step_days(step, start, stop):
+    """Grid spacing in days for a Horizons STEP_SIZE"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d*)?)\s*([a-zA-Z]*)\s*', step)
+    if not match:
+        raise ValueError(f"Invalid step size: {step}")
+    value, unit = float(match.group(1)), match.group(2).lower()
+    if not unit:
+        # Unitless: number of equal intervals
+        return (stop - start) / value
+    for prefix, days in (('mo', None), ('y', None), ('mi', 1 / 1440.0), ('m', 1 / 1440.0),
+                         ('h', 1 / 24.0), ('d', 1.0), ('s', 1 / 86400.0)):
+        if unit.startswith(prefix):
+            if days is None:
+                raise ValueError(f"Unsupported step unit: {step}")
+            return value * days
+    raise ValueError(f"Invalid step size: {step}")
+
+def _format_calendar(jd, digits=3):
+    """Horizons table time ('2025-Dec-19 01:21:40.000') of a JD"""
+    moment = datetime(2000, 1, 1, 12) + timedelta(days=float(jd) - J2000)
+    moment += timedelta(microseconds=5 * 10 ** (5 - digits))
+    fraction = f"{moment.microsecond:06d}"[:digits]
+    return (f"{moment.year:04d}-{_MONTH_NAMES[moment.month - 1]}-{moment.day:02d} "
+            f"{moment:%H:%M:%S}.{fraction}")
+
+class SPKBackend:
+    """
+    Horizons-compatible responses computed from local SPK kernels
+
+    request() returns None for queries it cannot answer (object not in the
+    loaded kernels, unknown observatory, unsupported table), so callers can
+    fall back to the cache or the network.
+    """
+
+    def __init__(self, paths):
+        self.ephemeris = SPKEphemeris(paths)
+
+    @classmethod
+    def from_environment(cls):
+        """Backend for the kernels listed in HORIZONS_SPK_KERNELS, or None"""
+        paths = [path for path in os.environ.get('HORIZONS_SPK_KERNELS', '').split(os.pathsep) if path]
+        return cls(paths) if paths else None
+
+    def _observer_offset(self, center, jd_utc, jd_tdb):
+        """Observer position (AU) and velocity (AU/d) relative to the geocenter"""
+        center = center.strip().strip("'\"")
+        code = center.split('@', 1)[1] if '@' in center else center
+        if code in ('399', '500'):
+            zeros = np.zeros((len(jd_utc), 3))
+            return zeros, zeros
+        if code not in OBSERVATORIES.codes:
+            return None
+        codes = [code] * len(jd_utc)
+        position = OBSERVATORIES.geocentric_positions(codes, jd_utc, jd_tdb)
+        velocity = np.cross([0.0, 0.0, EARTH_ROTATION], position)
+        return position, velocity
+
+    def _relative_state(self, target, observer_position, observer_velocity, jd_tdb):
+        """Light-time corrected target state relative to an observer (AU, AU/d)"""
+        et = (jd_tdb - J2000) * SECONDS_PER_DAY
+        earth_position, earth_velocity = self.ephemeris.state(EARTH, et)
+        origin = earth_position / AU_KM + observer_position
+        origin_velocity = earth_velocity * SECONDS_PER_DAY / AU_KM + observer_velocity
+
+        light_time = np.zeros(len(et))
+        for _ in range(3):
+            position, velocity = self.ephemeris.state(target, et - light_time * SECONDS_PER_DAY)
+            relative = position / AU_KM - origin
+            light_time = np.linalg.norm(relative, axis=-1) / C_AU_PER_DAY
+        return relative, velocity * SECONDS_PER_DAY / AU_KM - origin_velocity
+
+    def _epochs(self, params):
+        """JD grid of a query, from TLIST or START_TIME/STOP_TIME/STEP_SIZE"""
+        if params.get('TLIST'):
+            times = re.findall(r"'([^']*)'", params['TLIST']) or params['TLIST'].split()
+            return np.array([_parse_time(t) for t in times])
+        start = _parse_time(params['START_TIME'])
+        stop = _parse_time(params['STOP_TIME'])
+        step = _step_days(params['STEP_SIZE'].strip("'\""), start, stop)
+        return start + step * np.arange(int(np.floor((stop - start) / step + 1e-9)) + 1)
+
+    def request(self, params):
+        """
+        Horizons-format response text for a query, or None if not answerable
+
+        Args:
+            params: Query parameters (see jpl_horizons_query.build_params,
+                    build_range_params and topocentric.build_vector_params)
+        """
+        params = {key.upper(): str(value) for key, value in params.items()}
+        target = self.ephemeris.resolve(params.get('COMMAND', ''))
+        if target is None or EARTH not in self.ephemeris:
+            return None
+
+        ephem_type = params.get('EPHEM_TYPE', "'OBSERVER'").strip("'\"").upper()
+        center = params.get('CENTER', "'500@399'")
+        try:
+            if ephem_type == 'VECTORS':
+                jd_tdb = self._epochs(params)
+                jd_utc = jd_tdb - (utc_to_tdb(jd_tdb) - jd_tdb)
+                offset = self._observer_offset(center, jd_utc, jd_tdb)
+                if offset is None:
+                    return None
+                position, velocity = self._relative_state(target, *offset, jd_tdb)
+                table = self._vector_table(jd_tdb, position, velocity)
+            elif ephem_type == 'OBSERVER':
+                jd_utc = self._epochs(params)
+                jd_tdb = utc_to_tdb(jd_utc)
+                offset = self._observer_offset(center, jd_utc, jd_tdb)
+                if offset is None:
+                    return None
+                position, velocity = self._relative_state(target, *offset, jd_tdb)
+                table = self._observer_table(jd_utc, position, velocity)
+            else:
+                return None
+        except ValueError:
+            return None
+
+        solution = self.ephemeris.solution(target)
+        return '\n'.join([
+            "*" * 79,
+            f"Target body name: {params.get('COMMAND', '').strip(chr(39))} (NAIF {target})",
+            "Ephemeris source: offline kernels (spk_backend.py)",
+            f"Solution name: {solution}",
+            "*" * 79,
+            "$$SOE",
+            *table,
+            "$$EOE",
+            "*" * 79,
+            "",
+        ])
+
+    @staticmethod
+    def _observer_table(jd_utc, position, velocity):
+        """Rows in the layout of QUANTITIES='1,3,36,37' with EXTRA_PREC"""
+        distance = np.linalg.norm(position, axis=-1)
+        unit = position / distance[:, None]
+        ra = np.arctan2(unit[:, 1], unit[:, 0])
+        dec = np.arcsin(np.clip(unit[:, 2], -1.0, 1.0))
+
+        east = np.stack([-np.sin(ra), np.cos(ra), np.zeros_like(ra)], axis=-1)
+        north = np.stack([-np.sin(dec) * np.cos(ra), -np.sin(dec) * np.sin(ra), np.cos(dec)], axis=-1)
+        arcsec_per_hour = np.degrees(1.0) * 3600.0 / 24.0
+        dra_cosd = np.einsum('ni,ni->n', velocity, east) / distance * arcsec_per_hour
+        ddec_dt = np.einsum('ni,ni->n', velocity, north) / distance * arcsec_per_hour
+
+        ra_text = degrees_to_hms(np.degrees(ra), precision=4, sep=' ')
+        dec_text = degrees_to_dms(np.degrees(dec), precision=3, sep=' ')
+        return [
+            f" {_format_calendar(jd)}     {r} {d} {rate_ra:10.5f} {rate_dec:10.5f}"
+            f"  n.a.  n.a.  n.a.  n.a.  n.a."
+            for jd, r, d, rate_ra, rate_dec in zip(jd_utc, ra_text, dec_text,
+                                                   dra_cosd.tolist(), ddec_dt.tolist())
+        ]
+
+    @staticmethod
+    def _vector_table(jd_tdb, position, velocity):
+        """Rows in the layout of VEC_TABLE='2' with CSV_FORMAT='YES'"""
+        return [
+            f"{jd:.9f}, A.D. {_format_calendar(jd, 4)}, "
+            + ', '.join(f"{value: .15E}" for value in (*p, *v)) + ','
+            for jd, p, v in zip(jd_tdb.tolist(), position.tolist(), velocity.tolist())
+        ]
+
+def main():
+    """List the segments of one or more kernels"""
+    if len(sys.argv) < 2:
+        print(__doc__.split('Usage:', 1)[1].rstrip())
+        sys.exit(1)
+
+    for path in sys.argv[1:]:
+        kernel = SPKKernel(path)
+        print("=" * 70)
+        print(f"{path}")
+        print(f"  Internal name: {kernel.internal_name}")
+        print(f"  Solution:      {kernel.solution() or 'N/A'}")
+        print("=" * 70)
+        print(f"{'Target':>10} {'Center':>8} {'Type':>5}  {'Start (JD TDB)':>16} {'Stop (JD TDB)':>16}  Name")
+        print("-" * 70)
+        for segment in kernel.segments:
+            print(f"{segment.target:>10} {segment.center:>8} {segment.data_type:>5}  "
+                  f"{J2000 + segment.start_et / SECONDS_PER_DAY:16.4f} "
+                  f"{J2000 + segment.end_et / SECONDS_PER_DAY:16.4f}  {segment.name}")
+        print()
+        kernel.close()
+
+if __name__ == '__main__':
+    main()
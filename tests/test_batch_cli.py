@@ -0,0 +1,23 @@
+"""jpl_horizons_query --batch argument handling"""
+
+import pytest
+
+import jpl_horizons_query
+
+@pytest.mark.parametrize('args', [['--chunk'], ['--chunk', 'x'], ['--chunk', '0'], ['-', '--chunk', '2.5']])
+def test_bad_chunk_is_a_usage_error(args, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        jpl_horizons_query.batch_main(args)
+    assert exit_info.value.code == 2
+    assert 'usage:' in capsys.readouterr().err
+
+def test_chunk_and_path(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(jpl_horizons_query, 'run_batch', lambda lines, out, size: calls.append(size) or 0)
+    queries = tmp_path / 'queries.txt'
+    queries.write_text('')
+    for args in (['--chunk', '7', str(queries)], [str(queries)]):
+        with pytest.raises(SystemExit) as exit_info:
+            jpl_horizons_query.batch_main(args)
+        assert exit_info.value.code == 0
+    assert calls == [7, 1000]
@@ -0,0 +1,76 @@
+"""batch_residuals: selecting observations from MPC/ADES files and the command line"""
+
+import numpy as np
+import pytest
+
+import batch_residuals
+from observations_io import iter_observations
+from sexagesimal import parse_ra_dec
+from time_scales import mpc_to_utc
+
+def mpc80(packed, date, ra, dec, station):
+    return f"{packed:<12}  C{date:<17}{ra:<12}{dec:<12}         20.1 G      {station:>3}"
+
+@pytest.fixture
+def observations(tmp_path):
+    mpc = tmp_path / 'c2025n1.obs'
+    mpc.write_text('\n'.join([
+        mpc80('    CK25N010', '2025 12 19.00728', '11 05 53.640', '+05 24 55.44', 'G96'),
+        mpc80('    CK25N010', '2025 12 19.01134', '11 05 53.912', '+05 24 52.10', '703'),
+        mpc80('    CK25N010', '2025 12 20.01134', '11 06 53.912', '+05 20 52.10', 'G96'),
+        mpc80('     K25N01A', '2025 12 19.01134', '01 06 53.912', '-00 20 52.10', 'G96'),
+    ]) + '\n')
+    psv = tmp_path / 'c2025n1.psv'
+    psv.write_text('permID|provID|stn|obsTime|ra|dec|mag|band\n'
+                   '|C/2025 N1|G96|2025-12-19T12:00:00.123Z|166.5|5.25|19.8|G\n')
+    return [str(mpc), str(psv)]
+
+def test_selection_by_object_station_and_epoch(observations):
+    rows = batch_residuals.observations_manifest(observations, 'C/2025 N1', 'G96', 2461028.5, 2461029.5)
+    assert [row['epoch'] for row in rows] == ['2025 12 19.00728000', '2025 12 19.50000142']
+    assert {row['object'] for row in rows} == {'C/2025 N1'}
+
+    rows = batch_residuals.observations_manifest(observations, target='1004083')
+    assert len(rows) == 5 and {row['object'] for row in rows} == {'1004083'}
+    assert batch_residuals.observations_manifest(observations, 'C/2025 N1', 'Z99') == []
+
+def test_manifest_rows_reproduce_the_observations(observations):
+    expected = [obs for path in observations for obs in iter_observations(path)]
+    rows = batch_residuals.observations_manifest(observations)
+    jd = np.add(*mpc_to_utc([row['epoch'] for row in rows]))
+    ra, dec = parse_ra_dec([row['ra'] for row in rows], [row['dec'] for row in rows])
+    np.testing.assert_allclose(jd, [obs.jd_utc for obs in expected], atol=6e-9, rtol=0)
+    np.testing.assert_allclose(ra, [obs.ra_deg for obs in expected], atol=1e-6, rtol=0)
+    np.testing.assert_allclose(dec, [obs.dec_deg for obs in expected], atol=1e-6, rtol=0)
+    assert rows[3]['dec'].startswith('-00 ')
+
+@pytest.mark.parametrize('argv, message', [
+    ([], 'either a manifest or --observations'),
+    (['night.csv', '--observations', 'c.obs'], 'either a manifest or --observations'),
+    (['night.csv', '--object', 'C/2025 N1'], 'only be used with --observations'),
+    (['--observations', 'c.obs', '--since', '2025 02 30.0'], '--since'),
+])
+def test_usage_errors(argv, message, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        batch_residuals.main(argv)
+    assert exit_info.value.code == 2
+    assert message in capsys.readouterr().err
+
+def test_empty_selection_is_an_error(observations, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        batch_residuals.main(['--observations', observations[0], '--observatory', 'Z99'])
+    assert exit_info.value.code == 1
+    assert 'No observations selected' in capsys.readouterr().err
+
+def test_failed_rows_set_the_exit_status(observations, tmp_path, monkeypatch, capsys):
+    def run_batch(manifest, *args):
+        table = batch_residuals.ResidualTable(manifest)
+        table.merge([1], None, 'Horizons request failed')
+        return table
+    monkeypatch.setattr(batch_residuals, 'run_batch', run_batch)
+
+    with pytest.raises(SystemExit) as exit_info:
+        batch_residuals.main(['--observations', observations[0], '-o', str(tmp_path / 'out.csv')])
+    assert exit_info.value.code == 1
+    assert 'First error (row 2): Horizons request failed' in capsys.readouterr().err
+    assert (tmp_path / 'out.csv').exists()
@@ -0,0 +1,105 @@
+"""CircuitBreaker state machine and its use by AsyncHorizonsClient._send"""
+
+import asyncio
+import time
+
+import pytest
+
+import horizons_async_client
+from horizons_async_client import (AsyncHorizonsClient, CircuitBreaker, HorizonsError,
+                                   HorizonsUnavailable)
+
+def test_opens_after_threshold_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60.0)
+    for _ in range(2):
+        breaker.check()
+        breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    with pytest.raises(HorizonsUnavailable):
+        breaker.check()
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+def test_half_open_allows_one_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    breaker.opened_at = time.monotonic() - 31.0
+    assert breaker.state == 'half-open'
+    breaker.check()
+    with pytest.raises(HorizonsUnavailable):
+        breaker.check()
+
+def test_failed_trial_reopens_and_successful_trial_closes():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    breaker.opened_at = time.monotonic() - 31.0
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    breaker.opened_at = time.monotonic() - 31.0
+    breaker.check()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    breaker.check()
+
+def test_released_trial_lets_next_request_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    breaker.opened_at = time.monotonic() - 31.0
+    breaker.check()
+    breaker.release_trial()
+    breaker.check()
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(horizons_async_client, 'get_default_cache', lambda: None)
+    monkeypatch.setattr(horizons_async_client, 'local_response', lambda params: None)
+    monkeypatch.delenv('HORIZONS_OFFLINE', raising=False)
+    return AsyncHorizonsClient(url='http://127.0.0.1:9/api/horizons', max_retries=0,
+                               failure_threshold=1, reset_timeout=30.0)
+
+def _half_open(client):
+    client.breaker.record_failure()
+    client.breaker.opened_at = time.monotonic() - 31.0
+
+def test_malformed_response_is_a_horizons_error_and_ends_the_trial(client):
+    async def oversized(*args, **kwargs):
+        raise ValueError("Body too large")
+
+    async def run():
+        client.http.request = oversized
+        _half_open(client)
+        with pytest.raises(HorizonsError, match="Body too large"):
+            await client.request({'COMMAND': "'1'"})
+        assert client.breaker.state == 'open'
+        assert not client.breaker._trial_running
+        await client.close()
+
+    asyncio.run(run())
+
+def test_cancelled_trial_does_not_wedge_the_breaker(client):
+    async def hang(*args, **kwargs):
+        await asyncio.sleep(60)
+
+    async def run():
+        client.http.request = hang
+        _half_open(client)
+        task = asyncio.ensure_future(client.request({'COMMAND': "'1'"}))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert client.breaker.state == 'half-open'
+        client.breaker.check()
+        await client.close()
+
+    asyncio.run(run())
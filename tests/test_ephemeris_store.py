@@ -0,0 +1,126 @@
+"""Solution tracking of the ephemeris store, fetch_ephemeris_rows and query_batch"""
+
+import asyncio
+
+import pytest
+
+import ephemeris_store
+import horizons_async_client
+import jpl_horizons_query
+from ephemeris_store import EphemerisStore, is_newer_solution
+from horizons_replay import synthesize_response
+
+TIMES = ['2025-12-19 00:00:00.000', '2025-12-19 01:00:00.000', '2025-12-19 02:00:00.000']
+
+@pytest.mark.parametrize('candidate, current, newer', [
+    ('JPL#45', 'JPL#44', True),
+    ('JPL#9', 'JPL#44', False),
+    ('JPL#44', 'JPL#44', False),
+    ('c2025n1.bsp', 'JPL#44', False),
+    ('JPL#45', 'c2025n1.bsp', True),
+    ('JPL#1', None, True),
+])
+def test_is_newer_solution(candidate, current, newer):
+    assert is_newer_solution(candidate, current) is newer
+
+def test_older_solution_does_not_replace_current(tmp_path):
+    store = EphemerisStore(str(tmp_path / 'eph.sqlite'))
+    rows = [{'utc_time': t, 'ra_icrf': '11 05 53.6', 'dec_icrf': '+05 24 55'} for t in TIMES]
+    store.insert_rows('1004083', '@G96', TIMES, rows, 'JPL#44')
+    store.insert_rows('1004083', '@G96', TIMES, rows, 'JPL#40')
+    assert store.current_solution('1004083') == 'JPL#44'
+    store.insert_rows('1004083', '@G96', TIMES, rows, 'JPL#45')
+    assert store.current_solution('1004083') == 'JPL#45'
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = EphemerisStore(str(tmp_path / 'eph.sqlite'))
+    monkeypatch.delenv('HORIZONS_NO_CACHE', raising=False)
+    monkeypatch.setattr(ephemeris_store, '_default_store', store)
+    return store
+
+def test_fetch_does_not_mix_solutions(store, monkeypatch):
+    solution = {'name': 'JPL#44'}
+    calls = []
+
+    def fake_request(params, use_file_api=False, fresh=False):
+        calls.append(params['TLIST'])
+        return synthesize_response(params).replace('SYNTHETIC#1', solution['name'])
+
+    monkeypatch.setattr(jpl_horizons_query, 'request_horizons', fake_request)
+    first = jpl_horizons_query.fetch_ephemeris_rows('1004083', '@G96', TIMES[:2])
+    assert {row['solution'] for row in first} == {'JPL#44'}
+
+    # A new solution appears: the stored times are fetched again
+    solution['name'] = 'JPL#45'
+    rows = jpl_horizons_query.fetch_ephemeris_rows('1004083', '@G96', TIMES)
+    assert {row['solution'] for row in rows} == {'JPL#45'}
+    assert len(calls) == 3
+    assert store.current_solution('1004083') == 'JPL#45'
+
+def response(params, solution):
+    """Synthetic response naming a solution (None: no solution in the header)"""
+    text = synthesize_response(params)
+    if solution is None:
+        return text.replace('Solution name: SYNTHETIC#1\n', '')
+    return text.replace('SYNTHETIC#1', solution)
+
+@pytest.mark.parametrize('new', ['JPL#45', 'JPL#40', 'c2025n1.bsp', None])
+def test_any_other_solution_refetches_stored_times(store, monkeypatch, new):
+    solution = {'name': 'JPL#44'}
+    calls = []
+
+    def fake_request(params, use_file_api=False, fresh=False):
+        calls.append((params['TLIST'], fresh))
+        return response(params, solution['name'])
+
+    monkeypatch.setattr(jpl_horizons_query, 'request_horizons', fake_request)
+    jpl_horizons_query.fetch_ephemeris_rows('1004083', '@G96', TIMES[:2])
+
+    solution['name'] = new
+    rows = jpl_horizons_query.fetch_ephemeris_rows('1004083', '@G96', TIMES)
+    assert {row.get('solution') for row in rows} == {new}
+    # Stored times were requested again, past the response cache
+    assert len(calls) == 3 and calls[-1][1]
+    assert store.current_solution('1004083') == ('JPL#44' if new != 'JPL#45' else 'JPL#45')
+
+def test_same_solution_is_not_refetched(store, monkeypatch):
+    calls = []
+
+    def fake_request(params, use_file_api=False, fresh=False):
+        calls.append(params['TLIST'])
+        return response(params, 'JPL#44')
+
+    monkeypatch.setattr(jpl_horizons_query, 'request_horizons', fake_request)
+    jpl_horizons_query.fetch_ephemeris_rows('1004083', '@G96', TIMES[:2])
+    jpl_horizons_query.fetch_ephemeris_rows('1004083', '@G96', TIMES)
+    assert len(calls) == 2
+
+def test_solution_changing_again_raises(store, monkeypatch):
+    names = iter(['JPL#44', 'JPL#45', 'JPL#46'])
+    monkeypatch.setattr(jpl_horizons_query, 'request_horizons',
+                        lambda params, use_file_api=False, fresh=False: response(params, next(names)))
+    jpl_horizons_query.fetch_ephemeris_rows('1004083', '@G96', TIMES[:2])
+    with pytest.raises(Exception, match='several orbit solutions'):
+        jpl_horizons_query.fetch_ephemeris_rows('1004083', '@G96', TIMES)
+
+@pytest.mark.parametrize('new', ['JPL#45', 'JPL#40'])
+def test_async_query_batch_does_not_mix_solutions(store, monkeypatch, new):
+    solution = {'name': 'JPL#44'}
+    calls = []
+    monkeypatch.setattr(horizons_async_client, 'pack_tlist', lambda object_id, center, times: [[t] for t in times])
+    client = horizons_async_client.AsyncHorizonsClient(url='http://127.0.0.1:9/api/horizons')
+
+    async def fake_request(params, fresh=False):
+        calls.append(fresh)
+        return response(params, solution['name'])
+    monkeypatch.setattr(client, 'request', fake_request)
+
+    timestamps = ['2025 12 19.000000', '2025 12 19.041666666667', '2025 12 19.083333333333']
+    first = asyncio.run(client.query_batch('1004083', 'G96', timestamps[:2]))
+    assert {row['solution'] for row in first} == {'JPL#44'}
+
+    solution['name'] = new
+    rows = asyncio.run(client.query_batch('1004083', 'G96', timestamps))
+    assert {row['solution'] for row in rows} == {new}
+    assert calls == [False, False, False, True, True]
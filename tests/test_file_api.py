@@ -0,0 +1,109 @@
+"""File API (POST of a batch input file) through the replay server and both proxies"""
+
+import asyncio
+import io
+import json
+import os
+import socket
+import threading
+
+import pytest
+import requests
+
+import jpl_horizons_query
+from async_http import start_server
+from horizons_cache import cache_key
+from horizons_replay import RecordingStore, ReplayServer
+
+TIMES = ['2025-12-19 00:00:00.000', '2025-12-19 01:00:00.000', '2025-12-19 02:00:00.000']
+PARAMS = jpl_horizons_query.build_params('1004083', '@G96', TIMES)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+@pytest.fixture(scope='module')
+def loop():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    yield loop
+
+    async def shutdown():
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+
+def serve(loop, handler):
+    port = free_port()
+    asyncio.run_coroutine_threadsafe(start_server(handler, '127.0.0.1', port), loop).result()
+    return f"http://127.0.0.1:{port}"
+
+def post(url, params):
+    return requests.post(url, data={'format': params['format']},
+                         files={'input': ('input.txt', jpl_horizons_query.build_input_file(params))}, timeout=10)
+
+def test_input_file_round_trip():
+    params = jpl_horizons_query.parse_input_file(jpl_horizons_query.build_input_file(PARAMS))
+    assert params == PARAMS
+
+def test_file_api_url():
+    assert jpl_horizons_query.file_api_url('https://ssd.jpl.nasa.gov/api/horizons.api') == \
+        'https://ssd.jpl.nasa.gov/api/horizons_file.api'
+    assert jpl_horizons_query.file_api_url('http://127.0.0.1:5001/api/horizons') == \
+        'http://127.0.0.1:5001/api/horizons_file.api'
+
+def test_request_horizons_file_api_reaches_the_stand_in(loop, monkeypatch):
+    replay = ReplayServer({}, synthesize=True)
+    base = serve(loop, replay)
+    monkeypatch.setenv('HORIZONS_NO_CACHE', '1')
+    monkeypatch.setattr(jpl_horizons_query, '_backend', None)
+    monkeypatch.delenv('HORIZONS_SPK_KERNELS', raising=False)
+    monkeypatch.setattr(jpl_horizons_query, 'HORIZONS_FILE_API_URL', f"{base}/api/horizons_file.api")
+
+    text = jpl_horizons_query.request_horizons(PARAMS, use_file_api=True)
+    assert len(jpl_horizons_query.parse_ephemeris(text)['rows']) == len(TIMES)
+    assert replay.counts['synthesized'] == 1
+
+def test_replay_answers_file_api_from_recordings(loop):
+    base = serve(loop, ReplayServer({cache_key(PARAMS): (200, b'recorded response')}))
+    assert post(f"{base}/api/horizons_file.api", PARAMS).text == 'recorded response'
+    assert requests.get(f"{base}/api/horizons", params=PARAMS, timeout=10).text == 'recorded response'
+    response = requests.post(f"{base}/api/horizons_file.api", data={'format': 'text'}, timeout=10)
+    assert response.status_code == 400
+
+def check_recording(directory):
+    store = RecordingStore(directory)
+    with open(store.path(PARAMS), encoding='utf-8') as f:
+        entry = json.load(f)
+    assert entry['status'] == 200 and '$$SOE' in entry['body']
+    # The recording is replayed for a GET of the same parameters too
+    assert cache_key(entry['params']) == cache_key(PARAMS)
+
+def test_async_proxy_forwards_and_records_file_api(loop, tmp_path):
+    from horizons_async_proxy import HorizonsProxy
+
+    upstream = serve(loop, ReplayServer({}, synthesize=True))
+    proxy = HorizonsProxy(f"{upstream}/api/horizons", recorder=RecordingStore(str(tmp_path)))
+    base = serve(loop, proxy)
+    response = post(f"{base}/api/horizons_file.api", PARAMS)
+    assert response.status_code == 200
+    assert len(jpl_horizons_query.parse_ephemeris(response.text)['rows']) == len(TIMES)
+    check_recording(str(tmp_path))
+
+def test_flask_proxy_forwards_and_records_file_api(loop, tmp_path, monkeypatch):
+    jpl_horizons_server = pytest.importorskip('jpl_horizons_server')
+
+    upstream = serve(loop, ReplayServer({}, synthesize=True))
+    monkeypatch.setattr(jpl_horizons_server, 'HORIZONS_URL', f"{upstream}/api/horizons")
+    monkeypatch.setattr(jpl_horizons_server, 'recorder', RecordingStore(str(tmp_path)))
+    response = jpl_horizons_server.app.test_client().post('/api/horizons_file.api', data={
+        'format': 'text',
+        'input': (io.BytesIO(jpl_horizons_query.build_input_file(PARAMS).encode()), 'input.txt'),
+    })
+    assert response.status_code == 200
+    assert len(jpl_horizons_query.parse_ephemeris(response.get_data(as_text=True))['rows']) == len(TIMES)
+    check_recording(str(tmp_path))
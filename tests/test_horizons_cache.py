@@ -0,0 +1,36 @@
+"""Response cache: completeness check and concurrent solutions.json updates"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from horizons_cache import HorizonsCache
+from horizons_replay import synthesize_response
+
+def _params(object_id, utc_time='2025-12-19 01:21:40.000'):
+    return {'format': 'text', 'COMMAND': f"'{object_id}'", 'CENTER': "'@G96'", 'TLIST': f"'{utc_time}'"}
+
+def test_error_text_is_not_cached(tmp_path):
+    cache = HorizonsCache(str(tmp_path))
+    params = _params('1004083')
+    cache.put(params, "Cannot read TLIST: bad time\n")
+    assert cache.get(params) is None
+    cache.put(params, synthesize_response(params).split('$$EOE')[0])
+    assert cache.get(params) is None
+
+    text = synthesize_response(params)
+    cache.put(params, text)
+    assert cache.get(params) == text
+    assert [name for name in os.listdir(tmp_path) if name.endswith('.tmp')] == []
+
+def _put(cache_dir, object_id):
+    params = _params(object_id)
+    HorizonsCache(cache_dir).put(params, synthesize_response(params).replace('SYNTHETIC#1', f'JPL#{object_id}'))
+
+def test_concurrent_writers_keep_every_solution(tmp_path):
+    objects = [str(i) for i in range(40)]
+    with ProcessPoolExecutor(max_workers=8) as pool:
+        list(pool.map(_put, [str(tmp_path)] * len(objects), objects))
+    with open(tmp_path / 'solutions.json') as f:
+        solutions = json.load(f)
+    assert solutions == {i: f'JPL#{i}' for i in objects}
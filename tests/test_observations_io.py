@@ -0,0 +1,68 @@
+"""observations_io: streaming ADES XML"""
+
+import io
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+
+import observations_io
+
+OPTICAL = ('<optical><provID>2025 AB{n}</provID><stn>G96</stn><obsTime>2025-12-19T01:21:40.000Z</obsTime>'
+           '<ra>{ra}</ra><dec>-12.5</dec><mag>20.1</mag><band>G</band></optical>')
+
+def ades_xml(blocks, per_block):
+    parts = ['<?xml version="1.0"?><ades version="2022">']
+    for b in range(blocks):
+        parts.append('<obsBlock><obsContext><observatory><mpcCode>G96</mpcCode></observatory></obsContext><obsData>')
+        parts.extend(OPTICAL.format(n=b * per_block + i, ra=(b * per_block + i) % 360)
+                     for i in range(per_block))
+        parts.append('</obsData></obsBlock>')
+    parts.append('</ades>')
+    return ''.join(parts).encode()
+
+def test_reads_every_optical_element():
+    observations = list(observations_io.iter_ades_xml(io.BytesIO(ades_xml(3, 4))))
+    assert [obs.designation for obs in observations] == [f'2025 AB{n}' for n in range(12)]
+    assert observations[5].station == 'G96'
+    assert observations[5].ra_deg == 5.0
+    assert observations[5].mag == pytest.approx(20.1)
+
+def test_parsed_elements_leave_the_tree(monkeypatch):
+    roots = []
+    iterparse = ET.iterparse
+
+    def recording_iterparse(source, events):
+        for event, element in iterparse(source, ('start', 'end')):
+            if not roots:
+                roots.append(element)
+            if event in events:
+                yield event, element
+    monkeypatch.setattr(observations_io.ET, 'iterparse', recording_iterparse)
+
+    largest = 0
+    for _ in observations_io.iter_ades_xml(io.BytesIO(ades_xml(50, 200))):
+        root = roots[0]
+        largest = max(largest, sum(1 for _ in root.iter()))
+    # 10000 optical elements of 8 nodes each; only the parser's read-ahead stays
+    assert largest < 2000
+    assert len(roots[0]) == 0
+
+@pytest.mark.parametrize('jd, digits, expected', [
+    (2461010.4999999, 2, '2025 12 01.00'),          # Nov 30 23:59:59.99 rounds into December
+    (2461010.4999999, 6, '2025 12 01.000000'),
+    (2461041.4999, 3, '2026 01 01.000'),             # year end
+    (2460735.4999, 2, '2025 03 01.00'),              # Feb 28 of a common year
+    (2460369.9999, 3, '2024 02 29.500'),
+    (2461028.507280, 6, '2025 12 19.007280'),
+    (2461028.5, 0, '2025 12 19'),
+])
+def test_mpc_timestamp_rounding_carries_into_the_month(jd, digits, expected):
+    assert observations_io.jd_to_mpc_timestamp(jd, digits) == expected
+
+def test_mpc_timestamp_round_trip():
+    jd = 2451544.5 + np.linspace(0.0, 36525.0, 20001)
+    for value in jd.tolist():
+        text = observations_io.jd_to_mpc_timestamp(value, 6)
+        year, month, day = text.split()
+        assert abs(observations_io.date_to_jd(int(year), int(month), float(day)) - value) <= 5e-7 + 1e-8
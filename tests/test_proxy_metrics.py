@@ -0,0 +1,23 @@
+"""Label handling of ProxyMetrics"""
+
+import re
+
+from proxy_metrics import ProxyMetrics, escape_label, path_label
+
+def test_unknown_paths_share_one_label():
+    metrics = ProxyMetrics()
+    for path in ('/api/horizons', '/wp-login.php', '/.env', '/metrics', '/x"\ny'):
+        metrics.record_response(path, 404, 0, 0.0)
+    assert set(metrics.requests) == {('/api/horizons', 404), ('/metrics', 404), ('other', 404)}
+    assert metrics.requests[('other', 404)] == 3
+    assert path_label('/health') == '/health'
+
+def test_label_values_are_escaped():
+    assert escape_label('a\\b"c\nd') == 'a\\\\b\\"c\\nd'
+    metrics = ProxyMetrics()
+    metrics.upstream_statuses['5"\n'] = 1
+    text = metrics.render()
+    assert 'horizons_upstream_responses_total{status="5\\"\\n"} 1' in text
+    # An unescaped newline would split a sample across two lines
+    for line in text.splitlines():
+        assert line.startswith('#') or re.fullmatch(r'[a-z_]+(\{.*\})? \S+', line)
@@ -0,0 +1,88 @@
+"""Residual memo: running statistics, deduplication and solution probing"""
+
+import numpy as np
+import pytest
+
+import batch_residuals
+import ephemeris_store
+import jpl_horizons_query
+from ephemeris_store import EphemerisStore
+from horizons_replay import synthesize_response
+from residual_memo import RESULT_FIELDS, ResidualMemo, RunningStats, fingerprint
+
+def test_running_stats_match_a_full_recompute():
+    rng = np.random.default_rng(1)
+    values = rng.normal(3.0, 2.0, 1000)
+    values[::97] = np.nan
+    stats = RunningStats()
+    for batch in np.array_split(values, 7):
+        stats.merge(batch)
+    single = RunningStats()
+    for value in values:
+        single.update(value)
+
+    finite = values[np.isfinite(values)]
+    for s in (stats, single):
+        assert s.count == finite.size
+        assert s.mean == pytest.approx(finite.mean(), rel=1e-12)
+        assert s.variance == pytest.approx(finite.var(ddof=1), rel=1e-12)
+        assert s.rms == pytest.approx(np.sqrt(np.mean(finite ** 2)), rel=1e-12)
+
+def test_fingerprint_ignores_formatting_of_observatory():
+    assert fingerprint('1004083', '@g96', 2461028.5, 166.47, 5.41) == \
+        fingerprint(' 1004083', 'G96', 2461028.5, 166.47, 5.41)
+    assert fingerprint('1004083', 'G96', 2461028.5, 166.47, 5.41) != \
+        fingerprint('1004083', 'G96', 2461028.5, 166.47, 5.42)
+
+def _columns(n, value):
+    return {field: np.full(n, value) for field in RESULT_FIELDS}
+
+def test_rows_are_counted_once_per_solution(tmp_path):
+    memo = ResidualMemo(str(tmp_path / 'memo.sqlite'))
+    prints = ['a', 'b', 'c']
+    jd = np.array([1.0, 2.0, 3.0])
+    assert memo.record('X', 'G96', 'JPL#44', prints, jd, _columns(3, 1.0)) == 3
+    assert memo.record('X', 'G96', 'JPL#44', prints, jd, _columns(3, 1.0)) == 0
+    assert memo.record('X', 'G96', 'JPL#45', prints[:1], jd[:1], _columns(1, 2.0)) == 1
+    assert memo.record('X', 'G96', '', prints, jd, _columns(3, 1.0)) == 0
+
+    stats = memo.running_stats('X')
+    assert stats[('X', 'JPL#44')]['total_separation'].count == 3
+    assert stats[('X', 'JPL#45')]['total_separation'].rms == 2.0
+    assert set(memo.lookup(prints, 'JPL#45')) == {'a'}
+
+@pytest.fixture
+def horizons(tmp_path, monkeypatch):
+    """Fake Horizons whose solution name can be changed"""
+    state = {'solution': 'JPL#44'}
+    store = EphemerisStore(str(tmp_path / 'eph.sqlite'))
+    monkeypatch.delenv('HORIZONS_NO_CACHE', raising=False)
+    monkeypatch.setattr(ephemeris_store, '_default_store', store)
+    monkeypatch.setattr(jpl_horizons_query, 'request_horizons', lambda params, use_file_api=False, fresh=False:
+                        synthesize_response(params).replace('SYNTHETIC#1', state['solution']))
+    return state
+
+def test_new_solution_is_seen_even_when_every_row_would_hit(horizons, tmp_path):
+    memo = ResidualMemo(str(tmp_path / 'memo.sqlite'))
+    memo.record('X', 'G96', 'JPL#44', ['a'], np.array([1.0]), _columns(1, 1.0))
+    manifest = [{'object': 'X', 'observatory': 'G96', 'epoch': '', 'ra': '', 'dec': ''}]
+
+    solutions, problems = batch_residuals.current_solutions(['X'])
+    table = batch_residuals.ResidualTable(manifest)
+    assert batch_residuals._apply_memo(table, memo, ['a'], solutions) == []
+    assert not problems
+
+    horizons['solution'] = 'JPL#45'
+    solutions, problems = batch_residuals.current_solutions(['X'])
+    table = batch_residuals.ResidualTable(manifest)
+    assert batch_residuals._apply_memo(table, memo, ['a'], solutions) == [0]
+    assert ephemeris_store.get_default_store().current_solution('X') == 'JPL#45'
+
+def test_failed_probe_is_reported(horizons, monkeypatch):
+    def offline(object_id):
+        raise Exception("offline")
+
+    monkeypatch.setattr(jpl_horizons_query, 'probe_solution', offline)
+    solutions, problems = batch_residuals.current_solutions(['X'])
+    assert solutions == {'X': None}
+    assert 'memo not used' in problems['X']
@@ -0,0 +1,88 @@
+"""ResidualStore partition names and summary statistics"""
+
+import os
+
+import numpy as np
+import pytest
+
+from residual_store import ResidualStore
+
+def test_rms_ignores_nan_rows(tmp_path):
+    store = ResidualStore(str(tmp_path / 'store'))
+    store.append('C/2025 N1', 'JPL#44', {'jd_utc': [2461028.5, 2461028.6], 'total_separation': [1.0, np.nan]})
+    summary, = store.summary()
+    assert summary['rows'] == 2
+    assert summary['rms_separation'] == pytest.approx(1.0)
+
+@pytest.mark.parametrize('name', ['.', '..', '...', 'C/2025 N1', 'a%2Eb'])
+def test_names_stay_inside_the_root(tmp_path, name):
+    root = tmp_path / 'store'
+    store = ResidualStore(str(root))
+    path = store.append(name, name, {'total_separation': [1.0]})
+    assert os.path.realpath(path).startswith(os.path.realpath(root) + os.sep)
+    assert store.partitions() == [(name, name)]
+
+def test_empty_name_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ResidualStore(str(tmp_path / 'store')).append('', 'JPL#44', {'total_separation': [1.0]})
+
+def append_rows(store, start, count):
+    for i in range(start, start + count):
+        store.append('C/2025 N1', 'JPL#44', {'jd_utc': [2461028.5 + i], 'total_separation': [1.0]})
+
+def test_compaction_interrupted_before_removing_parts(tmp_path, monkeypatch):
+    store = ResidualStore(str(tmp_path / 'store'))
+    append_rows(store, 0, 5)
+
+    def crash(path):
+        raise OSError("simulated crash")
+    with monkeypatch.context() as patch:
+        patch.setattr(os, 'remove', crash)
+        with pytest.raises(OSError):
+            store.compact('C/2025 N1', 'JPL#44')
+
+    # Merged part and the parts it covers are all on disk: rows are still read once
+    assert len(os.listdir(os.path.dirname(store.part_paths('C/2025 N1', 'JPL#44')[0]))) > 5
+    assert np.array_equal(np.sort(store.column('jd_utc')), 2461028.5 + np.arange(5))
+    assert store.summary()[0]['rows'] == 5
+
+    append_rows(store, 5, 2)
+    assert store.compact('C/2025 N1', 'JPL#44') == 7
+    assert [os.path.basename(p) for p in store.part_paths('C/2025 N1', 'JPL#44')] == ['part-00000-00006.npy']
+    assert sorted(n for n in os.listdir(tmp_path / 'store' / 'C%2F2025%20N1' / 'JPL%2344')
+                  if n.endswith('.npy')) == ['part-00000-00006.npy']
+
+    # Part numbers inside the compacted range are not reused
+    assert store.append('C/2025 N1', 'JPL#44', {'total_separation': [1.0]}).endswith('part-00007.npy')
+
+def test_reads_and_appends_during_compaction(tmp_path):
+    import threading
+
+    store = ResidualStore(str(tmp_path / 'store'))
+    append_rows(store, 0, 1)
+    done = threading.Event()
+    errors = []
+
+    def compact():
+        while not done.is_set():
+            store.compact('C/2025 N1', 'JPL#44')
+
+    def read():
+        seen = 0
+        while not done.is_set():
+            jd = store.column('jd_utc')
+            if len(np.unique(jd)) != len(jd) or len(jd) < seen:
+                errors.append(len(jd))
+            seen = len(jd)
+
+    threads = [threading.Thread(target=compact), threading.Thread(target=read)]
+    for thread in threads:
+        thread.start()
+    try:
+        append_rows(store, 1, 300)
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join()
+    assert not errors
+    assert np.array_equal(np.sort(store.column('jd_utc')), 2461028.5 + np.arange(301))
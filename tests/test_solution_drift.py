@@ -0,0 +1,41 @@
+"""Solution ordering and interpolation-error masking of solution_drift.py"""
+
+import numpy as np
+
+from ephemeris_store import EphemerisStore
+from sexagesimal import degrees_to_dms, degrees_to_hms
+from solution_drift import compare_solutions, solution_order, store_positions
+from time_scales import format_utc
+
+def test_solutions_sort_by_number():
+    names = ['JPL#44', 'JPL#9', 'JPL#100', 'c2025n1.bsp']
+    assert sorted(names, key=solution_order) == ['c2025n1.bsp', 'JPL#9', 'JPL#44', 'JPL#100']
+    positions = {name: (np.zeros(2), np.zeros(2)) for name in ('JPL#44', 'JPL#9')}
+    assert list(compare_solutions(np.arange(2.0), positions)) == ['JPL#9']
+
+def _insert(store, solution, jd):
+    """Rows of an object on a curved track, with matching rates"""
+    t = jd - jd[0]
+    ra = 166.0 + 0.8 * t + 0.05 * t ** 2
+    dec = 5.0 + 0.3 * t - 0.02 * t ** 2
+    dra_cosd = (0.8 + 0.1 * t) * 3600.0 / 24.0 * np.cos(np.radians(dec))
+    ddec_dt = (0.3 - 0.04 * t) * 3600.0 / 24.0
+    times = format_utc(np.floor(jd - 0.5) + 0.5, jd - np.floor(jd - 0.5) - 0.5, 3)
+    rows = [{'ra_icrf': r, 'dec_icrf': d, 'dra_cosd': f"{a:.6f}", 'ddec_dt': f"{b:.6f}"}
+            for r, d, a, b in zip(degrees_to_hms(ra, 4, ' '), degrees_to_dms(dec, 3, ' '), dra_cosd, ddec_dt)]
+    store.insert_rows('X', '@G96', times, rows, solution)
+
+def test_epochs_across_sparse_gaps_are_dropped(tmp_path):
+    store = EphemerisStore(str(tmp_path / 'eph.sqlite'))
+    jd = np.concatenate([2461028.5 + np.arange(25) / 24.0, 2461034.5 + np.arange(25) / 24.0])
+    _insert(store, 'JPL#44', jd)
+    grid = np.linspace(jd[0], jd[-1], 200)
+
+    ra, dec, error = store_positions(store, 'X', 'G96', 'JPL#44', grid, max_error=0.05)
+    dense = (grid <= jd[24]) | (grid >= jd[25])
+    assert np.isfinite(ra[dense]).all()
+    assert np.isnan(ra[~dense]).all()
+    assert (error[~dense] > 0.05).all()
+
+    ra, _, _ = store_positions(store, 'X', 'G96', 'JPL#44', grid, max_error=None)
+    assert np.isfinite(ra).all()
@@ -0,0 +1,150 @@
+"""spk_backend: DAF reading and type 2/3/21 segment evaluation on synthetic kernels"""
+
+import struct
+
+import numpy as np
+import pytest
+from numpy.polynomial import chebyshev
+
+import spk_backend
+
+WORDS = 128
+
+def write_kernel(path, segments, comment='source: JPL#44'):
+    """
+    Minimal little-endian SPK file
+
+    Args:
+        segments: List of (name, target, center, data_type, start_et, end_et, words)
+    """
+    data_start = 4 * WORDS + 1
+    words, summaries, names, address = [], [], [], data_start
+    for name, target, center, data_type, start_et, end_et, values in segments:
+        values = np.asarray(values, dtype='<f8')
+        summaries.append(struct.pack('<2d6i', start_et, end_et, target, center, 1, data_type,
+                                     address, address + len(values) - 1))
+        names.append(name.ljust(40).encode())
+        words.append(values.tobytes())
+        address += len(values)
+
+    file_record = (b'DAF/SPK ' + struct.pack('<2i', 2, 6) + b'synthetic'.ljust(60)
+                   + struct.pack('<3i', 3, 3, address) + b'LTL-IEEE').ljust(1024, b'\0')
+    comments = (comment.encode() + b'\x04').ljust(1024, b'\0')
+    summary_record = (struct.pack('<3d', 0, 0, len(segments)) + b''.join(summaries)).ljust(1024, b'\0')
+    name_record = b''.join(names).ljust(1024, b' ')
+    path.write_bytes(file_record + comments + summary_record + name_record + b''.join(words))
+    return str(path)
+
+def chebyshev_segment(data_type, coefficients, init, interval):
+    """Type 2/3 words from coefficients of shape (records, components, degree)"""
+    records = []
+    for i, record in enumerate(coefficients):
+        radius = interval / 2.0
+        records.append(np.concatenate([[init + i * interval + radius, radius], record.ravel()]))
+    record_size = len(records[0])
+    return np.concatenate(records + [[init, interval, record_size, len(records)]])
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(11)
+
+def test_type_2_matches_chebyshev_series(tmp_path, rng):
+    coefficients = rng.normal(size=(4, 3, 9)) * 1e6
+    path = write_kernel(tmp_path / 'type2.bsp', [
+        ('TYPE 2', 10, 0, 2, 0.0, 4 * 86400.0, chebyshev_segment(2, coefficients, 0.0, 86400.0))])
+    ephemeris = spk_backend.SPKEphemeris([path])
+    et = np.linspace(0.0, 4 * 86400.0, 101)
+    position, velocity = ephemeris.state(10, et)
+
+    index = np.minimum((et // 86400.0).astype(int), 3)
+    s = (et - (index * 86400.0 + 43200.0)) / 43200.0
+    for axis in range(3):
+        expected = [chebyshev.chebval(x, coefficients[i, axis]) for x, i in zip(s, index)]
+        rate = [chebyshev.chebval(x, chebyshev.chebder(coefficients[i, axis])) / 43200.0
+                for x, i in zip(s, index)]
+        np.testing.assert_allclose(position[:, axis], expected, rtol=1e-13, atol=1e-6)
+        np.testing.assert_allclose(velocity[:, axis], rate, rtol=1e-12, atol=1e-9)
+
+def test_type_3_reads_velocity_coefficients(tmp_path, rng):
+    coefficients = rng.normal(size=(2, 6, 7))
+    path = write_kernel(tmp_path / 'type3.bsp', [
+        ('TYPE 3', 10, 0, 3, 100.0, 300.0, chebyshev_segment(3, coefficients, 100.0, 100.0))])
+    position, velocity = spk_backend.SPKEphemeris([path]).state(10, [150.0, 275.0])
+    np.testing.assert_allclose(position[0], [chebyshev.chebval(0.0, c) for c in coefficients[0, :3]],
+                               rtol=1e-14)
+    np.testing.assert_allclose(velocity[1], [chebyshev.chebval(0.5, c) for c in coefficients[1, 3:]],
+                               rtol=1e-13)
+
+def difference_record(epoch, max_dim, position, velocity, acceleration, steps):
+    """Type 21 record for motion with constant acceleration"""
+    record = np.zeros(4 * max_dim + 11)
+    record[0] = epoch
+    record[1:max_dim + 1] = steps
+    record[max_dim + 1:max_dim + 7:2] = position
+    record[max_dim + 2:max_dim + 7:2] = velocity
+    differences = np.zeros((3, max_dim))
+    differences[:, 0] = acceleration
+    record[max_dim + 7:4 * max_dim + 7] = differences.ravel()
+    record[4 * max_dim + 7] = 4
+    record[4 * max_dim + 8:] = 3
+    return record
+
+def test_type_21_constant_acceleration(tmp_path):
+    max_dim = 15
+    p0, v0, a = np.array([1e8, -2e7, 3e6]), np.array([10.0, -3.0, 0.5]), np.array([1e-6, 2e-6, -3e-6])
+    epochs = [86400.0, 2 * 86400.0]
+    records = [difference_record(epoch, max_dim, p0 + v0 * epoch + a * epoch ** 2 / 2, v0 + a * epoch, a,
+                                 np.full(max_dim, -3600.0))
+               for epoch in epochs]
+    words = np.concatenate([np.concatenate(records), epochs, [max_dim, len(records)]])
+    path = write_kernel(tmp_path / 'type21.bsp', [('TYPE 21', 2000001, 0, 21, 0.0, 2 * 86400.0, words)])
+
+    et = np.linspace(1000.0, 2 * 86400.0, 37)
+    position, velocity = spk_backend.SPKEphemeris([path]).state(2000001, et)
+    np.testing.assert_allclose(position, p0 + v0 * et[:, None] + a * et[:, None] ** 2 / 2, rtol=1e-14)
+    np.testing.assert_allclose(velocity, v0 + a * et[:, None], rtol=1e-14)
+
+def test_chaining_resolution_and_solution(tmp_path):
+    sun = chebyshev_segment(2, np.array([[[5.0, 0.0], [6.0, 0.0], [7.0, 0.0]]]), -1e9, 2e9)
+    comet = chebyshev_segment(2, np.array([[[1.0, 0.0], [2.0, 0.0], [3.0, 0.0]]]), -1e9, 2e9)
+    path = write_kernel(tmp_path / 'chain.bsp', [
+        ('SUN', 10, 0, 2, -1e9, 1e9, sun),
+        ('C/2025 N1 (ATLAS)', 1004083, 10, 2, -1e9, 1e9, comet),
+    ])
+    ephemeris = spk_backend.SPKEphemeris([path])
+    position, _ = ephemeris.state(1004083, [0.0])
+    np.testing.assert_allclose(position[0], [6.0, 8.0, 10.0])
+
+    assert ephemeris.resolve("'1004083'") == 1004083
+    assert ephemeris.resolve("DES=C/2025 N1;") == 1004083
+    assert ephemeris.resolve('atlas') == 1004083
+    for empty in ('', '   ', "''", 'DES=;'):
+        assert ephemeris.resolve(empty) is None
+    assert ephemeris.solution(1004083) == 'JPL#44'
+    with pytest.raises(Exception, match='No SPK data'):
+        ephemeris.state(1004083, [2e9])
+
+def test_request_outside_coverage_is_not_answered(tmp_path):
+    # Earth and comet on straight lines from the barycenter, covering 2025 only
+    start, end = (2460676.5 - spk_backend.J2000) * 86400.0, (2461041.5 - spk_backend.J2000) * 86400.0
+    earth = chebyshev_segment(2, np.array([[[1.5e8, 0.0], [0.0, 0.0], [0.0, 0.0]]]), start, end - start)
+    comet = chebyshev_segment(2, np.array([[[1.5e8, 0.0], [3.0e8, 0.0], [1.0e8, 0.0]]]), start, end - start)
+    path = write_kernel(tmp_path / 'backend.bsp', [
+        ('EARTH', 399, 0, 2, start, end, earth),
+        ('C/2025 N1 (ATLAS)', 1004083, 0, 2, start, end, comet),
+    ])
+    backend = spk_backend.SPKBackend([path])
+    params = {'COMMAND': "'1004083'", 'CENTER': "'500@399'", 'TLIST': "'2025-06-01 00:00:00.000'"}
+    response = backend.request(params)
+    assert '$$SOE' in response and 'JPL#44' in response
+
+    for tlist in ("'2026-06-01 00:00:00.000'", "'2025-06-01 00:00:00.000' '2024-06-01 00:00:00.000'"):
+        assert backend.request(dict(params, TLIST=tlist)) is None
+    with pytest.raises(spk_backend.SPKError, match='No SPK data'):
+        backend.ephemeris.state(399, [end + 86400.0])
+
+def test_unreadable_kernel(tmp_path):
+    path = tmp_path / 'not.bsp'
+    path.write_bytes(b'\0' * 2048)
+    with pytest.raises(spk_backend.SPKError, match='Not an SPK file'):
+        spk_backend.SPKEphemeris([str(path)])
@@ -0,0 +1,55 @@
+"""stream_horizons caches complete tables only"""
+
+import pytest
+
+import jpl_horizons_query
+from horizons_cache import HorizonsCache
+from horizons_replay import synthesize_response
+
+pytest.importorskip('requests')
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.status_code = 200
+        self.encoding = 'utf-8'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def iter_lines(self, decode_unicode=True):
+        return iter(self.text.splitlines())
+
+class FakeSession:
+    def __init__(self, text):
+        self.text = text
+
+    def get(self, url, **kwargs):
+        return FakeResponse(self.text)
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = HorizonsCache(str(tmp_path))
+    monkeypatch.setattr(jpl_horizons_query, 'get_default_cache', lambda: cache)
+    monkeypatch.setattr(jpl_horizons_query, 'local_response', lambda params: None)
+    monkeypatch.delenv('HORIZONS_OFFLINE', raising=False)
+    return cache
+
+def _stream(monkeypatch, params, text):
+    monkeypatch.setattr(jpl_horizons_query, 'get_session', lambda: FakeSession(text))
+    return list(jpl_horizons_query.stream_horizons(params))
+
+def test_error_page_is_not_cached(cache, monkeypatch):
+    params = jpl_horizons_query.build_params('1004083', '@G96', ['2025-12-19 01:21:40.000'])
+    assert _stream(monkeypatch, params, "No ephemeris for target \"1004083\" prior to ...\n") == []
+    assert cache.get(params) is None
+
+def test_complete_table_is_cached(cache, monkeypatch):
+    params = jpl_horizons_query.build_params('1004083', '@G96', ['2025-12-19 01:21:40.000'])
+    text = synthesize_response(params)
+    records = _stream(monkeypatch, params, text)
+    assert len(records) == 1
+    assert cache.get(params) == text
@@ -0,0 +1,75 @@
+"""time_scales: calendar conversion, validation, round trips and offsets"""
+
+import numpy as np
+import pytest
+
+from ephemeris_interpolation import horizons_time_to_jd
+from ephemeris_store import utc_to_jd
+from jpl_horizons_query import convert_mpc_timestamp
+from observations_io import iso_to_jd, jd_to_mpc_timestamp
+from time_scales import (date_to_jd, format_utc, jd_to_calendar, calendar_to_jd, mpc_to_jd,
+                         mpc_to_utc, mpc_to_utc_strings, tai_minus_utc, tdb_minus_tt, utc_to_tt)
+
+def test_j2000():
+    assert date_to_jd(2000, 1, 1, 12) == 2451545.0
+    assert calendar_to_jd(2000, 1, 1) == 2451544.5
+
+def test_calendar_round_trip_over_four_centuries():
+    jd = np.arange(2305447.5, 2451545.0 + 146097, 1.0)
+    assert np.array_equal(calendar_to_jd(*jd_to_calendar(jd)), jd)
+
+def test_every_parser_agrees():
+    expected = date_to_jd(2025, 12, 19, 1, 21, 40.0)
+    assert horizons_time_to_jd('2025-Dec-19 01:21:40.000') == pytest.approx(expected, abs=1e-9)
+    assert iso_to_jd('2025-12-19T01:21:40.000Z') == pytest.approx(expected, abs=1e-9)
+    assert utc_to_jd('2025-12-19 01:21:40.000') == pytest.approx(expected, abs=1e-9)
+    jd1, jd2 = mpc_to_utc(['2025 12 19.05671296'])
+    assert jd1[0] + jd2[0] == pytest.approx(expected, abs=1e-8)
+
+@pytest.mark.parametrize('timestamp', ['2025 02 31.5', '2025 02 29.0', '2025 04 31.1', '2025 13 01.0',
+                                       '2025 00 10.0', '2025 12 00.5'])
+def test_invalid_dates_are_rejected_by_both_paths(timestamp):
+    with pytest.raises(ValueError):
+        mpc_to_utc([timestamp])
+    with pytest.raises(ValueError):
+        convert_mpc_timestamp(timestamp)
+
+def test_leap_day_is_accepted():
+    assert convert_mpc_timestamp('2024 02 29.5') == '2024-02-29 12:00:00.000'
+    assert mpc_to_utc_strings(['2024 02 29.5']) == ['2024-02-29 12:00:00.000']
+
+def test_round_trip_of_200k_epochs():
+    rng = np.random.default_rng(21)
+    jd = 2451544.5 + np.sort(rng.uniform(0.0, 36525.0, 200_000))
+    timestamps = [jd_to_mpc_timestamp(value, 6) for value in jd.tolist()]
+    jd1, jd2 = mpc_to_utc(timestamps)
+    # 6 decimals of a day: 0.0864 s
+    assert np.max(np.abs((jd1 - jd[:1].round() + jd2) - (jd - jd[:1].round()))) <= 5e-7 + 1e-9
+
+    strings = format_utc(jd1, jd2, 3)
+    sample = slice(None, None, 997)
+    assert strings[sample] == [convert_mpc_timestamp(t) for t in timestamps[sample]]
+    assert not any(':60.' in text for text in strings)
+
+def test_rounding_carries_into_the_next_day():
+    assert convert_mpc_timestamp('2025 12 31.9999999999') == '2026-01-01 00:00:00.000'
+    assert mpc_to_utc_strings(['2025 12 31.9999999999']) == ['2026-01-01 00:00:00.000']
+
+def test_leap_seconds():
+    assert tai_minus_utc(2457754.5 - 1e-6) == 36.0
+    assert tai_minus_utc(2457754.5) == 37.0
+    jd1, jd2 = utc_to_tt(np.array([2461028.5]), np.array([0.25]))
+    assert (jd1[0] - 2461028.5 + jd2[0] - 0.25) * 86400.0 == pytest.approx(69.184, abs=1e-6)
+
+def test_tdb_minus_tt_is_within_its_amplitude():
+    jd = 2451545.0 + np.linspace(0.0, 3653.0, 10_000)
+    offset = tdb_minus_tt(jd, 0.0)
+    assert np.abs(offset).max() <= 0.001657 + 0.000014
+    assert np.abs(offset).max() > 0.0016
+
+def test_scales_are_ordered():
+    utc = np.add(*mpc_to_jd(['2025 12 19.007280'], 'utc'))
+    tt = np.add(*mpc_to_jd(['2025 12 19.007280'], 'tt'))
+    tdb = np.add(*mpc_to_jd(['2025 12 19.007280'], 'tdb'))
+    assert (tt - utc)[0] * 86400.0 == pytest.approx(69.184, abs=1e-4)
+    assert abs((tdb - tt)[0]) * 86400.0 < 0.002
@@ -0,0 +1,69 @@
+"""two_body: Kepler solvers and conic propagation checked against numerical integration"""
+
+import numpy as np
+import pytest
+
+from two_body import (GM_SUN, OrbitalElements, TwoBodyOrbit, earth_position, elements_from_header,
+                      solve_hyperbolic_kepler, solve_kepler)
+
+ATLAS = OrbitalElements(epoch=2460894.5, e=6.139422831829797, q=1.356418761995381, tp=2460977.982217866,
+                        node=322.1566239181344, peri=128.0096924001076, inc=175.1130917268881,
+                        solution='JPL#44')
+
+def rk4(position, velocity, days, steps, gm=GM_SUN):
+    """Integrate heliocentric two-body motion with fixed RK4 steps"""
+    def derivative(state):
+        r = state[:3]
+        return np.concatenate([state[3:], -gm * r / np.linalg.norm(r) ** 3])
+    state = np.concatenate([position, velocity])
+    h = days / steps
+    for _ in range(steps):
+        k1 = derivative(state)
+        k2 = derivative(state + 0.5 * h * k1)
+        k3 = derivative(state + 0.5 * h * k2)
+        k4 = derivative(state + h * k3)
+        state = state + h / 6.0 * (k1 + 2.0 * k2 + 2.0 * k3 + k4)
+    return state[:3], state[3:]
+
+@pytest.mark.parametrize('elements', [
+    ATLAS,
+    ATLAS._replace(e=0.6, q=0.9, inc=12.0),
+    ATLAS._replace(e=1.0, q=1.1, inc=40.0),
+], ids=['hyperbolic', 'elliptic', 'parabolic'])
+def test_conic_agrees_with_rk4(elements):
+    orbit = TwoBodyOrbit(elements)
+    start, days = elements.tp - 20.0, 40.0
+    (position,), (velocity,) = orbit.state(start)
+    integrated, integrated_velocity = rk4(position, velocity, days, 8000)
+    (expected,), (expected_velocity,) = orbit.state(start + days)
+    assert np.max(np.abs(integrated - expected)) < 1e-13
+    assert np.max(np.abs(integrated_velocity - expected_velocity)) < 1e-13
+
+def test_kepler_residuals():
+    rng = np.random.default_rng(23)
+    m = rng.uniform(-50.0, 50.0, 20000)
+    for e in (0.0, 0.3, 0.9, 0.999):
+        anomaly = solve_kepler(m, e)
+        wrapped = np.remainder(m + np.pi, 2.0 * np.pi) - np.pi
+        assert np.max(np.abs(anomaly - e * np.sin(anomaly) - wrapped)) < 1e-13
+    for e in (1.001, 1.5, 6.14, 100.0):
+        anomaly = solve_hyperbolic_kepler(m, e)
+        assert np.max(np.abs(e * np.sinh(anomaly) - anomaly - m) / np.maximum(1.0, np.abs(m))) < 1e-13
+
+def test_perihelion_and_energy():
+    orbit = TwoBodyOrbit(ATLAS)
+    (position,), (velocity,) = orbit.state(ATLAS.tp)
+    assert np.linalg.norm(position) == pytest.approx(ATLAS.q, rel=1e-14)
+    assert abs(np.dot(position, velocity)) < 1e-14
+
+    positions, velocities = orbit.state(ATLAS.tp + np.linspace(-400.0, 400.0, 101))
+    energy = 0.5 * np.sum(velocities ** 2, axis=1) - GM_SUN / np.linalg.norm(positions, axis=1)
+    np.testing.assert_allclose(energy, GM_SUN / (2.0 * orbit.semi_major_axis), rtol=1e-12)
+
+def test_earth_is_near_one_au():
+    distance = np.linalg.norm(earth_position(np.linspace(2451545.0, 2462502.0, 500)), axis=1)
+    assert distance.min() > 0.983 and distance.max() < 1.017
+
+def test_missing_elements():
+    with pytest.raises(ValueError, match='TP, OM'):
+        elements_from_header({'elements': {'EC': 1.2, 'QR': 1.0, 'W': 3.0, 'IN': 4.0}})
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Time-Scale Engine
+Vectorized conversion of MPC timestamps (YYYY MM DD.dddddd) to Julian
+Dates in UTC, TT and TDB
+
+Julian Dates are carried as split doubles (jd1, jd2): jd1 is the integer
+JD of the preceding noon (... .5 is 0h UTC) and jd2 the fraction of the
+day, as in SOFA/ERFA. A single double near JD 2.46 million resolves only
+about 40 microseconds; the split form keeps the day fraction at full
+double precision, so seconds and time-scale offsets stay exact to well
+below a microsecond.
+
+- UTC -> TAI uses the bundled leap-second table (LEAP_SECONDS)
+- TT  = TAI + 32.184 s
+- TDB = TT + 1.657 ms sin(g) + 0.014 ms sin(2g), with g the Earth's mean
+  anomaly (within ~30 microseconds of the full series)
+
+Timestamps in the usual fixed-width layout are parsed straight from
+their bytes with integer arithmetic; other spacings go through a general
+whitespace parser. Either way whole arrays are converted in one pass.
+Dates are checked against the length of their month (2025 02 31 is an
+error, not 2025 03 03).
+
+The scalar calendar functions (date_to_jd, utc_string, mpc_string) are
+the one calendar conversion used by the rest of the package, including
+the numpy-free query modules.
+
+Requires: numpy (except for date_to_jd, utc_string and mpc_string)
+
+Usage:
+    python time_scales.py "2025 12 19.007280" [...]     # show UTC/TT/TDB
+    python time_scales.py --bench [N]                   # throughput
+"""
+
+import math
+import sys
+
+try:
+    import numpy as np
+except ImportError:     # the scalar calendar functions need no numpy
+    np = None
+
+J2000 = 2451545.0
+SECONDS_PER_DAY = 86400.0
+TT_MINUS_TAI = 32.184
+
+# Leap seconds (TAI - UTC) and the UTC JD (0h) from which each applies.
+# Update when IERS Bulletin C announces a new one (none scheduled as of 2025).
+LEAP_SECONDS = [
+    (2441317.5, 10), (2441499.5, 11), (2441683.5, 12), (2442048.5, 13), (2442413.5, 14),
+    (2442778.5, 15), (2443144.5, 16), (2443509.5, 17), (2443874.5, 18), (2444239.5, 19),
+    (2444786.5, 20), (2445151.5, 21), (2445516.5, 22), (2446247.5, 23), (2447161.5, 24),
+    (2447892.5, 25), (2448257.5, 26), (2448804.5, 27), (2449169.5, 28), (2449534.5, 29),
+    (2450083.5, 30), (2450630.5, 31), (2451179.5, 32), (2453736.5, 33), (2454832.5, 34),
+    (2456109.5, 35), (2457204.5, 36), (2457754.5, 37),
+]
+
+_DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+if np is not None:
+    _LEAP_STARTS = np.array([start for start, _ in LEAP_SECONDS])
+    _LEAP_OFFSETS = np.array([seconds for _, seconds in LEAP_SECONDS], dtype=np.float64)
+    _MONTH_LENGTHS = np.array((0,) + _DAYS_IN_MONTH, dtype=np.int64)
+
+def _is_leap_year(year):
+    """Gregorian leap years (ints or integer arrays)"""
+    return (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+
+def days_in_month(year, month):
+    """Number of days of a month (scalars; 1 <= month <= 12)"""
+    return 29 if month == 2 and _is_leap_year(year) else _DAYS_IN_MONTH[month - 1]
+
+def _day_number(year, month, day):
+    """Julian Day Number of Gregorian dates (ints or integer arrays)"""
+    a = (14 - month) // 12
+    y = year + 4800 - a
+    m = month + 12 * a - 3
+    return day + (153 * m + 2) // 5 + 365 * y + y // 4 - y // 100 + y // 400 - 32045
+
+def _civil_date(jdn):
+    """Gregorian (year, month, day) of Julian Day Numbers (ints or integer arrays)"""
+    a = jdn + 32044
+    b = (4 * a + 3) // 146097
+    c = a - 146097 * b // 4
+    d = (4 * c + 3) // 1461
+    e = c - 1461 * d // 4
+    m = (5 * e + 2) // 153
+    day = e - (153 * m + 2) // 5 + 1
+    month = m + 3 - 12 * (m // 10)
+    year = 100 * b + d - 4800 + m // 10
+    return year, month, day
+
+def _check_date(year, month, day, text):
+    if not 1 <= month <= 12 or not 1 <= day <= days_in_month(year, month):
+        raise ValueError(f"Invalid date: {text}")
+
+def date_to_jd(year, month, day, hours=0, minutes=0, seconds=0.0):
+    """
+    UTC Julian Date of one calendar date and time
+
+    Args:
+        year, month: Integers
+        day: Day of the month, may carry a fraction (MPC style)
+        hours, minutes, seconds: Time of day
+
+    Returns:
+        Julian Date (float)
+
+    Raises:
+        ValueError: month or day out of range (day checked against the month length)
+    """
+    whole = int(math.floor(day))
+    _check_date(year, month, whole, f"{year:04d}-{month:02d}-{day}")
+    return (_day_number(year, month, whole) - 0.5 + (day - whole)
+            + (hours + minutes / 60.0 + seconds / 3600.0) / 24.0)
+
+def utc_string(year, month, day_decimal, digits=3):
+    """
+    'YYYY-MM-DD HH:MM:SS.sss' of a date with fractional day
+
+    The time is rounded once, in units of the last digit; a carry moves
+    into the next minute, hour or day, so seconds never read 60.
+
+    Raises:
+        ValueError: month or day out of range
+    """
+    day = int(math.floor(day_decimal))
+    _check_date(year, month, day, f"{year:04d} {month:02d} {day_decimal}")
+    units_per_day = 86400 * 10 ** digits
+    ticks = round((day_decimal - day) * units_per_day)
+    carry, ticks = divmod(ticks, units_per_day)
+    year, month, day = _civil_date(_day_number(year, month, day) + carry)
+    seconds, sub = divmod(ticks, 10 ** digits)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    text = f"{year:04d}-{month:02d}-{day:02d} {hours:02d}:{minutes:02d}:{seconds:02d}"
+    return f"{text}.{sub:0{digits}d}" if digits else text
+
+def mpc_string(jd_utc, digits=6):
+    """
+    MPC timestamp 'YYYY MM DD.dddddd' of a UTC Julian Date
+
+    The day fraction is rounded once, in units of the last digit; a carry
+    moves into the next day, month or year, so the day never exceeds the
+    month length.
+    """
+    shifted = float(jd_utc) + 0.5
+    jdn = math.floor(shifted)
+    units = 10 ** digits
+    carry, ticks = divmod(round((shifted - jdn) * units), units)
+    year, month, day = _civil_date(jdn + carry)
+    text = f"{year:04d} {month:02d} {day:02d}"
+    return f"{text}.{ticks:0{digits}d}" if digits else text
+
+def _normalize(jd1, jd2):
+    """Move whole days from jd2 into jd1 so that 0 <= jd2 < 1"""
+    days = np.floor(jd2)
+    return jd1 + days, jd2 - days
+
+def calendar_to_jd(year, month, day):
+    """
+    Julian Date at 0h of integer calendar dates (Gregorian)
+
+    Args:
+        year, month, day: Integer arrays
+
+    Returns:
+        Float array of JD at 0h (always ending in .5)
+    """
+    year = np.asarray(year, dtype=np.int64)
+    month = np.asarray(month, dtype=np.int64)
+    day = np.asarray(day, dtype=np.int64)
+    return _day_number(year, month, day) - 0.5
+
+def jd_to_calendar(jd1):
+    """
+    Calendar dates of Julian Dates at 0h (inverse of calendar_to_jd)
+
+    Returns:
+        Tuple of integer arrays (year, month, day)
+    """
+    jdn = np.floor(np.asarray(jd1, dtype=np.float64) + 0.5).astype(np.int64)
+    return _civil_date(jdn)
+
+def _parse_fixed_width(raw):
+    """
+    Parse 'YYYY MM DD.ddd...' byte strings of equal length from their digits
+
+    Returns:
+        (year, month, day, fraction) arrays, or None if the layout differs
+    """
+    width = raw.dtype.itemsize
+    if width < 11 or len(raw) == 0:
+        return None
+    chars = np.frombuffer(raw.tobytes(), dtype=np.uint8).reshape(len(raw), width)
+    if not ((chars[:, 4] == 32).all() and (chars[:, 7] == 32).all() and (chars[:, 10] == 46).all()):
+        return None
+    digit_columns = [0, 1, 2, 3, 5, 6, 8, 9] + list(range(11, width))
+    digits = chars[:, digit_columns].astype(np.int64) - 48
+    if ((digits < 0) | (digits > 9)).any():
+        return None
+
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 4] * 10 + digits[:, 5]
+    day = digits[:, 6] * 10 + digits[:, 7]
+    places = width - 11
+    if places > 18:
+        return None
+    numerator = np.zeros(len(raw), dtype=np.int64)
+    for column in range(8, 8 + places):
+        numerator = numerator * 10 + digits[:, column]
+    return year, month, day, numerator / float(10 ** places) if places else numerator * 0.0
+
+def _parse_general(timestamps):
+    """Parse timestamps with arbitrary whitespace; returns (year, month, day, fraction)"""
+    values = np.fromstring(' '.join(timestamps), sep=' ') if len(timestamps) else np.empty(0)
+    if values.size != 3 * len(timestamps):
+        for timestamp in timestamps:
+            if len(timestamp.split()) != 3:
+                raise ValueError(f"Invalid MPC timestamp format: {timestamp}")
+        raise ValueError("Invalid MPC timestamp format")
+    values = values.reshape(-1, 3)
+    day_decimal = values[:, 2]
+    day = np.floor(day_decimal)
+    if (values[:, :2] != np.round(values[:, :2])).any():
+        raise ValueError("Invalid MPC timestamp format: year and month must be integers")
+    return (values[:, 0].astype(np.int64), values[:, 1].astype(np.int64),
+            day.astype(np.int64), day_decimal - day)
+
+def mpc_to_utc(timestamps):
+    """
+    Convert MPC timestamps to split UTC Julian Dates
+
+    Args:
+        timestamps: Sequence (list or NumPy str/bytes array) of
+                    "YYYY MM DD.dddddd" strings
+
+    Returns:
+        Tuple of float arrays (jd1, jd2) with jd1 + jd2 the UTC JD
+    """
+    if isinstance(timestamps, str):
+        timestamps = [timestamps]
+    array = np.asarray(timestamps)
+    parsed = None
+    if array.dtype.kind in 'SU':
+        try:
+            raw = array.astype('S') if array.dtype.kind == 'U' else array
+            parsed = _parse_fixed_width(raw)
+        except UnicodeEncodeError:
+            parsed = None
+    if parsed is None:
+        strings = [t.decode('ascii') if isinstance(t, bytes) else str(t) for t in array.tolist()]
+        parsed = _parse_general([t.strip() for t in strings])
+    year, month, day, fraction = parsed
+
+    bad = (month < 1) | (month > 12) | (day < 1)
+    month_length = _MONTH_LENGTHS[np.clip(month, 0, 12)] + ((month == 2) & _is_leap_year(year))
+    bad |= day > month_length
+    if bad.any():
+        index = int(np.argmax(bad))
+        raise ValueError(f"Invalid MPC timestamp date: {array.tolist()[index]}")
+    return calendar_to_jd(year, month, day), fraction
+
+def tai_minus_utc(jd1, jd2=0.0):
+    """TAI - UTC in seconds from the leap-second table (10 s before 1972)"""
+    jd = np.asarray(jd1, dtype=np.float64) + np.asarray(jd2, dtype=np.float64)
+    index = np.searchsorted(_LEAP_STARTS, jd, side='right') - 1
+    return _LEAP_OFFSETS[np.clip(index, 0, None)]
+
+def utc_to_tt(jd1, jd2):
+    """Split UTC Julian Dates to split TT"""
+    offset = (tai_minus_utc(jd1, jd2) + TT_MINUS_TAI) / SECONDS_PER_DAY
+    return _normalize(np.asarray(jd1, dtype=np.float64), np.asarray(jd2, dtype=np.float64) + offset)
+
+def tdb_minus_tt(jd1, jd2):
+    """TDB - TT in seconds (periodic terms of the Earth's orbit)"""
+    g = np.radians(357.53 + 0.98560028 * ((np.asarray(jd1) - J2000) + np.asarray(jd2)))
+    return 0.001657 * np.sin(g) + 0.000014 * np.sin(2.0 * g)
+
+def tt_to_tdb(jd1, jd2):
+    """Split TT Julian Dates to split TDB"""
+    return _normalize(np.asarray(jd1, dtype=np.float64),
+                      np.asarray(jd2, dtype=np.float64) + tdb_minus_tt(jd1, jd2) / SECONDS_PER_DAY)
+
+def utc_to_tdb_split(jd1, jd2):
+    """Split UTC Julian Dates to split TDB"""
+    return tt_to_tdb(*utc_to_tt(jd1, jd2))
+
+def utc_to_tdb(jd_utc):
+    """
+    Convert UTC Julian Dates to TDB
+
+    Args:
+        jd_utc: Array of UTC Julian Dates (1972 onwards)
+
+    Returns:
+        Array of TDB Julian Dates
+    """
+    jd_utc = np.asarray(jd_utc, dtype=np.float64)
+    jd1 = np.floor(jd_utc - 0.5) + 0.5
+    jd1, jd2 = utc_to_tdb_split(jd1, jd_utc - jd1)
+    return jd1 + jd2
+
+def mpc_to_jd(timestamps, scale='utc'):
+    """
+    MPC timestamps to Julian Dates in one time scale
+
+    Args:
+        timestamps: Sequence of "YYYY MM DD.dddddd" strings
+        scale: 'utc', 'tt' or 'tdb'
+
+    Returns:
+        Tuple of float arrays (jd1, jd2)
+    """
+    jd1, jd2 = mpc_to_utc(timestamps)
+    if scale == 'utc':
+        return jd1, jd2
+    if scale == 'tt':
+        return utc_to_tt(jd1, jd2)
+    if scale == 'tdb':
+        return utc_to_tdb_split(jd1, jd2)
+    raise ValueError(f"Unknown time scale: {scale}")
+
+def format_utc(jd1, jd2, digits=3):
+    """
+    Format split UTC Julian Dates as 'YYYY-MM-DD HH:MM:SS.sss'
+
+    The time is rounded once, in integer units of the last digit, and a
+    rounding carry moves into the next minute, hour or day, so seconds
+    never read 60.
+
+    Returns:
+        List of strings
+    """
+    jd1, jd2 = _normalize(np.asarray(jd1, dtype=np.float64), np.asarray(jd2, dtype=np.float64))
+    # jd1 is at 0h (.5) for dates from mpc_to_utc; shift other splits to 0h
+    shift = jd1 - (np.floor(jd1 - 0.5) + 0.5)
+    jd1, jd2 = _normalize(jd1 - shift, jd2 + shift)
+
+    units_per_day = 86400 * 10 ** digits
+    ticks = np.rint(jd2 * units_per_day).astype(np.int64)
+    carry = ticks // units_per_day
+    ticks -= carry * units_per_day
+    year, month, day = jd_to_calendar(jd1 + carry)
+
+    seconds, sub = np.divmod(ticks, 10 ** digits)
+    hours, seconds = np.divmod(seconds, 3600)
+    minutes, seconds = np.divmod(seconds, 60)
+    if digits:
+        return [f"{y:04d}-{mo:02d}-{d:02d} {h:02d}:{mi:02d}:{s:02d}.{f:0{digits}d}"
+                for y, mo, d, h, mi, s, f in zip(year.tolist(), month.tolist(), day.tolist(),
+                                                 hours.tolist(), minutes.tolist(),
+                                                 seconds.tolist(), sub.tolist())]
+    return [f"{y:04d}-{mo:02d}-{d:02d} {h:02d}:{mi:02d}:{s:02d}"
+            for y, mo, d, h, mi, s in zip(year.tolist(), month.tolist(), day.tolist(),
+                                          hours.tolist(), minutes.tolist(), seconds.tolist())]
+
+def mpc_to_utc_strings(timestamps, digits=3):
+    """MPC timestamps as Horizons TLIST times ('YYYY-MM-DD HH:MM:SS.sss')"""
+    return format_utc(*mpc_to_utc(timestamps), digits=digits)
+
+def main():
+    """Show the time scales of MPC timestamps, or time the engine"""
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__.split('Usage:', 1)[1].rstrip())
+        sys.exit(1)
+
+    if args[0] == '--bench':
+        import random
+        import time
+        n = int(args[1]) if len(args) > 1 else 1000000
+        rng = random.Random(44)
+        timestamps = [f"2025 {rng.randint(1, 12):02d} {rng.uniform(1, 28.99):09.6f}" for _ in range(n)]
+        start = time.perf_counter()
+        jd1, jd2 = mpc_to_jd(timestamps, 'tdb')
+        elapsed = time.perf_counter() - start
+        print(f"Timestamps:  {n:,}")
+        print(f"Elapsed:     {elapsed * 1000:.1f} ms (MPC -> TDB)")
+        print(f"Throughput:  {n / elapsed:,.0f} epochs/s")
+        return
+
+    try:
+        utc = mpc_to_utc(args)
+    except ValueError as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+    tt = utc_to_tt(*utc)
+    tdb = tt_to_tdb(*tt)
+    print(f"{'MPC timestamp':<22} {'UTC':<26} {'JD (UTC)':>18} {'JD (TT)':>18} {'JD (TDB)':>18}")
+    print("-"*106)
+    for timestamp, text, u1, u2, t1, t2, b1, b2 in zip(args, format_utc(*utc), *utc, *tt, *tdb):
+        print(f"{timestamp:<22} {text:<26} {u1 + u2:>18.8f} {t1 + t2:>18.8f} {b1 + b2:>18.8f}")
+
+if __name__ == '__main__':
+    main()
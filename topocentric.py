@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Local Topocentric Reduction
+Astrometric RA/Dec for any MPC observatory from one geocentric Horizons query
+
+query_horizons prepends '@' to the observatory code, so observations from
+G96, T05, F51 ... each need their own upstream query. Here the object's
+geocentric state vectors (VECTORS ephemeris, light-time corrected, ICRF)
+are fetched once on a time grid covering all observations, and the
+topocentric direction for each observation is computed locally:
+
+    1. Interpolate the geocentric astrometric state at the observation TDB
+    2. Place the observer with the MPC parallax constants (rho*cos(phi'),
+       rho*sin(phi'), longitude), rotated by Greenwich mean sidereal time
+       and precessed from the mean equator of date to ICRF
+    3. Correct for the difference between the geocentric and topocentric
+       light time, then convert the observer-to-object vector to RA/Dec
+
+Everything is vectorized over observations. The bundled observatory table
+covers common survey sites; load the full MPC list with load_obscodes().
+
+Requires: numpy
+
+Usage:
+    python topocentric.py <object_id> <code>:<mpc_timestamp> [<code>:<mpc_timestamp> ...]
+
+Example:
+    python topocentric.py 1004083 "G96:2025 12 19.007280" "T05:2025 12 19.301250" "F51:2025 12 19.402000"
+"""
+
+import io
+import math
+import sys
+
+import numpy as np
+
+from ephemeris_interpolation import hermite_interpolate
+from jpl_horizons_query import build_range_params, iter_ephemeris_lines, request_horizons
+from time_scales import mpc_to_utc, utc_to_tdb, utc_to_tdb_split
+
+EARTH_RADIUS_KM = 6378.137
+AU_KM = 149597870.7
+C_AU_PER_DAY = 299792.458 * 86400.0 / AU_KM
+J2000 = 2451545.0
+
+# MPC observatory codes: longitude (deg E), rho*cos(phi'), rho*sin(phi'), name
+# Transcribed from the MPC list of observatory codes
+BUNDLED_OBSERVATORIES = """\
+500   0.0000 0.000000 +0.000000 Geocentric
+568 204.5278 0.941710 +0.337250 Mauna Kea
+675 243.1370 0.836245 +0.546877 Palomar Mountain
+691 248.3997 0.849518 +0.526558 Steward Observatory, Kitt Peak-Spacewatch
+695 248.4053 0.849504 +0.526595 Kitt Peak
+703 249.2674 0.845999 +0.531699 Catalina Sky Survey
+950 342.1176 0.877640 +0.478470 La Palma
+F51 203.7441 0.936241 +0.351543 Pan-STARRS 1, Haleakala
+F52 203.7441 0.936239 +0.351545 Pan-STARRS 2, Haleakala
+G96 249.2113 0.845111 +0.533614 Mt. Lemmon Survey
+I41 243.1402 0.836325 +0.546877 Palomar Mountain--ZTF
+I52 249.2112 0.845111 +0.533614 Steward Observatory, Mt. Lemmon Station
+M22  20.8107 0.846470 -0.531590 ATLAS South Africa, Sutherland
+T05 203.7424 0.936230 +0.351560 ATLAS-HKO, Haleakala
+T08 204.4238 0.942070 +0.335290 ATLAS-MLO, Mauna Loa
+V00 248.3989 0.849498 +0.526581 Kitt Peak-Bok
+W68 289.1941 0.866630 -0.497580 ATLAS Chile, Rio Hurtado
+X05 289.2634 0.864981 -0.500958 Simonyi Survey Telescope, Rubin Observatory
+"""
+
+class ObservatoryTable:
+    """
+    Array-backed table of MPC observatory parallax constants
+
+    Args:
+        codes: Sequence of observatory codes
+        longitude: East longitudes in degrees
+        rho_cos_phi: rho*cos(phi') in Earth radii
+        rho_sin_phi: rho*sin(phi') in Earth radii
+        names: Optional observatory names
+    """
+
+    def __init__(self, codes, longitude, rho_cos_phi, rho_sin_phi, names=None):
+        self.codes = list(codes)
+        self.longitude = np.asarray(longitude, dtype=np.float64)
+        self.rho_cos_phi = np.asarray(rho_cos_phi, dtype=np.float64)
+        self.rho_sin_phi = np.asarray(rho_sin_phi, dtype=np.float64)
+        self.names = list(names) if names is not None else [''] * len(self.codes)
+        self._index = {code: i for i, code in enumerate(self.codes)}
+
+    def __contains__(self, code):
+        return code.lstrip('@') in self._index
+
+    def indices(self, codes):
+        """
+        Row indices for a sequence of observatory codes
+
+        Raises:
+            ValueError if a code is not in the table
+        """
+        try:
+            return np.fromiter((self._index[code.lstrip('@')] for code in codes), dtype=np.intp)
+        except KeyError as e:
+            raise ValueError(f"Unknown observatory code: {e.args[0]}")
+
+    def geocentric_positions(self, codes, jd_utc, jd_tt=None):
+        """
+        Geocentric ICRF positions of observatories
+
+        Args:
+            codes: Observatory code for each observation
+            jd_utc: UTC Julian Date for each observation (UT1 ~ UTC)
+            jd_tt: Optional TT Julian Dates used for precession
+
+        Returns:
+            (n, 3) array of positions in AU
+        """
+        idx = self.indices(codes)
+        jd_utc = np.asarray(jd_utc, dtype=np.float64)
+        if jd_tt is None:
+            jd_tt = jd_utc
+
+        local_sidereal = np.radians(greenwich_mean_sidereal_time(jd_utc) + self.longitude[idx])
+        scale = EARTH_RADIUS_KM / AU_KM
+        mean_of_date = np.stack([
+            self.rho_cos_phi[idx] * np.cos(local_sidereal),
+            self.rho_cos_phi[idx] * np.sin(local_sidereal),
+            self.rho_sin_phi[idx],
+        ], axis=-1) * scale
+
+        # Mean equator of date -> ICRF (J2000)
+        return np.einsum('nji,nj->ni', precession_matrix(jd_tt), mean_of_date)
+
+def load_obscodes(path):
+    """
+    Load an observatory table from the MPC ObsCodes list
+
+    Args:
+        path: Path to ObsCodes.html / ObsCodes.txt
+
+    Returns:
+        ObservatoryTable (space-based and roving entries are skipped)
+    """
+    codes, longitude, rho_cos, rho_sin, names = [], [], [], [], []
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            parts = line[3:].split(None, 3)
+            if len(line) < 4 or len(parts) < 3 or line.startswith('Code'):
+                continue
+            try:
+                lon, cos_value, sin_value = (float(value) for value in parts[:3])
+            except ValueError:
+                # Space-based and roving observers have no parallax constants
+                continue
+            codes.append(line[0:3])
+            longitude.append(lon)
+            rho_cos.append(cos_value)
+            rho_sin.append(sin_value)
+            names.append(parts[3].strip() if len(parts) > 3 else '')
+    return ObservatoryTable(codes, longitude, rho_cos, rho_sin, names)
+
+def _parse_bundled():
+    codes, longitude, rho_cos, rho_sin, names = [], [], [], [], []
+    for line in BUNDLED_OBSERVATORIES.splitlines():
+        parts = line.split(None, 4)
+        codes.append(parts[0])
+        longitude.append(float(parts[1]))
+        rho_cos.append(float(parts[2]))
+        rho_sin.append(float(parts[3]))
+        names.append(parts[4])
+    return ObservatoryTable(codes, longitude, rho_cos, rho_sin, names)
+
+OBSERVATORIES = _parse_bundled()
+
+def greenwich_mean_sidereal_time(jd_ut1):
+    """
+    Greenwich mean sidereal time (IAU 1982) in degrees
+
+    Args:
+        jd_ut1: Array of UT1 Julian Dates
+
+    Returns:
+        Array of GMST in degrees [0, 360)
+    """
+    d = np.asarray(jd_ut1, dtype=np.float64) - J2000
+    t = d / 36525.0
+    gmst = 280.46061837 + 360.98564736629 * d + 0.000387933 * t**2 - t**3 / 38710000.0
+    return np.mod(gmst, 360.0)
+
+def precession_matrix(jd_tt):
+    """
+    IAU 1976 precession matrices from J2000 to the mean equator of date
+
+    Args:
+        jd_tt: Array of TT Julian Dates
+
+    Returns:
+        (n, 3, 3) array P with r_date = P @ r_j2000
+    """
+    t = (np.atleast_1d(np.asarray(jd_tt, dtype=np.float64)) - J2000) / 36525.0
+    arcsec = math.pi / (180.0 * 3600.0)
+    zeta = (2306.2181 * t + 0.30188 * t**2 + 0.017998 * t**3) * arcsec
+    z = (2306.2181 * t + 1.09468 * t**2 + 0.018203 * t**3) * arcsec
+    theta = (2004.3109 * t - 0.42665 * t**2 - 0.041833 * t**3) * arcsec
+
+    cz, sz = np.cos(zeta), np.sin(zeta)
+    cZ, sZ = np.cos(z), np.sin(z)
+    ct, st = np.cos(theta), np.sin(theta)
+
+    p = np.empty(t.shape + (3, 3))
+    p[:, 0, 0] = cz * ct * cZ - sz * sZ
+    p[:, 0, 1] = -sz * ct * cZ - cz * sZ
+    p[:, 0, 2] = -st * cZ
+    p[:, 1, 0] = cz * ct * sZ + sz * cZ
+    p[:, 1, 1] = -sz * ct * sZ + cz * cZ
+    p[:, 1, 2] = -st * sZ
+    p[:, 2, 0] = cz * st
+    p[:, 2, 1] = -sz * st
+    p[:, 2, 2] = ct
+    return p
+
+class GeocentricEphemeris:
+    """
+    Geocentric astrometric (light-time corrected) state of an object on a grid
+
+    Args:
+        jd_tdb: Grid epochs (TDB Julian Dates, increasing)
+        position: (n, 3) ICRF positions in AU
+        velocity: (n, 3) ICRF velocities in AU/day
+    """
+
+    def __init__(self, jd_tdb, position, velocity, object_id=None, solution=None):
+        self.jd_tdb = np.asarray(jd_tdb, dtype=np.float64)
+        self.position = np.asarray(position, dtype=np.float64)
+        self.velocity = np.asarray(velocity, dtype=np.float64)
+        self.object_id = object_id
+        self.solution = solution
+
+    def state(self, jd_tdb):
+        """
+        Interpolate the state at arbitrary TDB epochs inside the grid
+
+        Returns:
+            Tuple of ((n, 3) position in AU, (n, 3) velocity in AU/day)
+        """
+        jd_tdb = np.atleast_1d(np.asarray(jd_tdb, dtype=np.float64))
+        if jd_tdb.size and (jd_tdb.min() < self.jd_tdb[0] or jd_tdb.max() > self.jd_tdb[-1]):
+            raise ValueError("Epochs outside the fetched vector grid")
+
+        position, index = hermite_interpolate(self.jd_tdb, self.position, self.velocity, jd_tdb)
+        # Velocity is interpolated linearly; it is only used for the light-time term
+        t0 = self.jd_tdb[index]
+        s = ((jd_tdb - t0) / (self.jd_tdb[index + 1] - t0))[:, None]
+        velocity = (1 - s) * self.velocity[index] + s * self.velocity[index + 1]
+        return position, velocity
+
+def build_vector_params(object_id, start_time, stop_time, step_size):
+    """
+    Horizons parameters for geocentric ICRF state vectors (light-time corrected)
+
+    Args:
+        object_id: SPK-ID or object name
+        start_time, stop_time: Grid limits as TDB Julian Dates or calendar strings
+        step_size: Horizons step size (e.g., '1 h')
+
+    Returns:
+        Dictionary of query parameters
+    """
+    params = build_range_params(object_id, '500@399', start_time, stop_time, step_size)
+    for key in ('QUANTITIES', 'EXTRA_PREC'):
+        params.pop(key, None)
+    params.update({
+        'EPHEM_TYPE': "'VECTORS'",
+        'REF_PLANE': "'FRAME'",
+        'VEC_TABLE': "'2'",
+        'VEC_CORR': "'LT'",
+        'OUT_UNITS': "'AU-D'",
+        'CSV_FORMAT': "'YES'",
+    })
+    return params
+
+def fetch_geocentric_vectors(object_id, jd_tdb_start, jd_tdb_stop, step_size='1 h'):
+    """
+    Fetch the object's geocentric state vectors once for a time span
+
+    Args:
+        object_id: SPK-ID or object name
+        jd_tdb_start, jd_tdb_stop: Span to cover (TDB Julian Dates)
+        step_size: Horizons step size
+
+    Returns:
+        GeocentricEphemeris
+    """
+    params = build_vector_params(object_id, f"JD{jd_tdb_start:.6f}", f"JD{jd_tdb_stop:.6f}", step_size)
+
+    header = {}
+    rows = []
+    for line in iter_ephemeris_lines(io.StringIO(request_horizons(params)), header):
+        fields = [field.strip() for field in line.split(',')]
+        rows.append([float(fields[0])] + [float(value) for value in fields[2:8]])
+
+    if len(rows) < 2:
+        raise Exception("No state vector data found in response")
+
+    data = np.array(rows)
+    return GeocentricEphemeris(data[:, 0], data[:, 1:4], data[:, 4:7],
+                               object_id=object_id, solution=header.get('solution'))
+
+def topocentric_radec(ephemeris, codes, jd_utc, observatories=OBSERVATORIES):
+    """
+    Astrometric topocentric RA/Dec for many observations
+
+    Args:
+        ephemeris: GeocentricEphemeris covering all observation epochs
+        codes: MPC observatory code for each observation
+        jd_utc: UTC Julian Date for each observation
+        observatories: ObservatoryTable with the parallax constants
+
+    Returns:
+        Tuple of arrays (ra_deg, dec_deg, distance_au)
+    """
+    jd_utc = np.asarray(jd_utc, dtype=np.float64)
+    jd_tdb = utc_to_tdb(jd_utc)
+
+    geocentric, velocity = ephemeris.state(jd_tdb)
+    observer = observatories.geocentric_positions(codes, jd_utc, jd_tdb)
+
+    # The grid is light-time corrected for the geocenter. The topocentric
+    # light time differs by up to R_earth/c; move the object along its
+    # apparent motion by that difference.
+    geocentric_lt = np.linalg.norm(geocentric, axis=-1) / C_AU_PER_DAY
+    topocentric = geocentric - observer
+    for _ in range(2):
+        topocentric_lt = np.linalg.norm(topocentric, axis=-1) / C_AU_PER_DAY
+        topocentric = geocentric - observer - velocity * (topocentric_lt - geocentric_lt)[:, None]
+
+    x, y, z = topocentric[:, 0], topocentric[:, 1], topocentric[:, 2]
+    ra = np.degrees(np.arctan2(y, x)) % 360.0
+    dec = np.degrees(np.arctan2(z, np.hypot(x, y)))
+    return ra, dec, np.linalg.norm(topocentric, axis=-1)
+
+def compute_topocentric(object_id, codes, mpc_timestamps, observatories=OBSERVATORIES, step_size='1 h'):
+    """
+    Topocentric RA/Dec for observations from any mix of observatories
+
+    Makes a single Horizons VECTORS query covering all epochs.
+
+    Args:
+        object_id: SPK-ID or object name
+        codes: MPC observatory code for each observation
+        mpc_timestamps: MPC timestamp (YYYY MM DD.dddddd) for each observation
+        observatories: ObservatoryTable with the parallax constants
+        step_size: Grid step of the vector query
+
+    Returns:
+        Tuple of (ra_deg, dec_deg, distance_au, GeocentricEphemeris)
+    """
+    jd1, jd2 = mpc_to_utc(mpc_timestamps)
+    jd_utc = jd1 + jd2
+    jd_tdb = np.add(*utc_to_tdb_split(jd1, jd2))
+
+    # Pad by a step on each side and align to whole hours so that repeated
+    # runs over the same night reuse the cached response
+    start = math.floor(jd_tdb.min() * 24.0 - 1) / 24.0
+    stop = math.ceil(jd_tdb.max() * 24.0 + 1) / 24.0
+    ephemeris = fetch_geocentric_vectors(object_id, start, stop, step_size)
+
+    ra, dec, distance = topocentric_radec(ephemeris, codes, jd_utc, observatories)
+    return ra, dec, distance, ephemeris
+
+def main():
+    """Main function"""
+    if len(sys.argv) < 3:
+        print(__doc__.split('Usage:', 1)[1].rstrip())
+        sys.exit(1)
+
+    object_id = sys.argv[1]
+    codes, timestamps = [], []
+    for arg in sys.argv[2:]:
+        code, _, timestamp = arg.partition(':')
+        codes.append(code.strip())
+        timestamps.append(timestamp.strip())
+
+    print("="*70)
+    print("TOPOCENTRIC EPHEMERIS (local reduction)")
+    print("="*70)
+    print()
+
+    try:
+        ra, dec, distance, ephemeris = compute_topocentric(object_id, codes, timestamps)
+    except Exception as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    from sexagesimal import degrees_to_dms, degrees_to_hms
+
+    if ephemeris.solution:
+        print(f"Solution:     {ephemeris.solution}")
+    print(f"Observations: {len(codes)} from {len(set(codes))} observatories (1 Horizons query)")
+    print()
+    print(f"{'Code':<6} {'MPC Time':<20} {'RA (ICRF)':<16} {'DEC (ICRF)':<16} {'Delta (AU)':<12}")
+    print("-"*70)
+    for code, timestamp, ra_text, dec_text, delta in zip(
+            codes, timestamps, degrees_to_hms(ra, 4, ' '), degrees_to_dms(dec, 3, ' '), distance):
+        print(f"{code:<6} {timestamp:<20} {ra_text:<16} {dec_text:<16} {delta:.9f}")
+    print("="*70)
+
+if __name__ == '__main__':
+    main()
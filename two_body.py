@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Two-Body Propagator
+Approximate positions from the osculating elements Horizons prints with
+OBJ_DATA='YES', for screening many epochs before precise Horizons calls
+
+Every query already carries the solution's heliocentric ecliptic
+(IAU76/J2000) elements; parse_header() returns them under 'elements'.
+The orbit is propagated as a pure two-body conic from the perihelion time
+TP, vectorized over epochs:
+
+    e < 1   Kepler's equation        E - e sin E = M
+    e > 1   hyperbolic equation      e sinh H - H = M   (e.g. 3I/ATLAS, e = 6.14)
+    e = 1   Barker's equation
+
+Geocentric (or topocentric) astrometric RA/Dec adds the Earth's position
+from the JPL approximate elements of the Earth-Moon barycenter and a
+light-time iteration. Planetary perturbations and nongravitational forces
+are ignored, so errors grow with distance from the osculating epoch;
+expect arcseconds to arcminutes, not the milliarcseconds of Horizons.
+
+Requires: numpy
+
+Usage:
+    python two_body.py <object_id> <observatory_code> <mpc_timestamp> [<mpc_timestamp> ...]
+    python two_body.py --bench [N]
+
+Example:
+    python two_body.py 1004083 500 "2025 12 19.007280" "2026 01 19.000000"
+"""
+
+import io
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from topocentric import C_AU_PER_DAY, J2000
+
+# Heliocentric gravitational parameter (au^3/day^2), as used by Horizons for osculating elements
+GM_SUN = 2.9591220828411951e-04
+
+# Obliquity of the J2000 ecliptic (IAU 1976), the plane of the Horizons elements
+OBLIQUITY_J2000 = np.radians(84381.448 / 3600.0)
+
+# Eccentricities within this of 1 are propagated as parabolas
+PARABOLIC_TOLERANCE = 1e-9
+
+# Earth-Moon barycenter, J2000 ecliptic (Standish, "Keplerian Elements for
+# Approximate Positions of the Major Planets", 1800-2050): value and rate per century of
+# a (au), e, I, L, longitude of perihelion, longitude of node (deg)
+_EMB_ELEMENTS = np.array([
+    [1.00000261, 0.00000562],
+    [0.01671123, -0.00004392],
+    [-0.00001531, -0.01294668],
+    [100.46457166, 35999.37244981],
+    [102.93768193, 0.32327364],
+    [0.0, 0.0],
+])
+
+OrbitalElements = namedtuple('OrbitalElements', [
+    'epoch',        # osculating epoch (TDB JD)
+    'e',            # eccentricity
+    'q',            # perihelion distance (au)
+    'tp',           # perihelion time (TDB JD)
+    'node',         # longitude of ascending node (deg)
+    'peri',         # argument of perihelion (deg)
+    'inc',          # inclination (deg)
+    'solution',     # orbit solution name, if known
+])
+
+def elements_from_header(header):
+    """
+    OrbitalElements from a header dictionary (see parse_header)
+
+    Raises:
+        ValueError: if the header has no complete element set
+    """
+    values = header.get('elements') or {}
+    missing = [key for key in ('EC', 'QR', 'TP', 'OM', 'W', 'IN') if key not in values]
+    if missing:
+        raise ValueError(f"Osculating elements missing from response header: {', '.join(missing)}")
+    return OrbitalElements(
+        epoch=values.get('EPOCH'), e=values['EC'], q=values['QR'], tp=values['TP'],
+        node=values['OM'], peri=values['W'], inc=values['IN'], solution=header.get('solution'))
+
+def parse_elements(response_text):
+    """OrbitalElements from the header of a Horizons response (OBJ_DATA='YES')"""
+    from jpl_horizons_query import parse_header
+    return elements_from_header(parse_header(response_text))
+
+def fetch_elements(object_id, utc_time):
+    """
+    Fetch an object's osculating elements with a one-epoch geocentric query
+
+    The request is an ordinary observer query, so it shares the response
+    cache with other lookups of the same epoch.
+    """
+    from jpl_horizons_query import build_params, iter_ephemeris_lines, request_horizons
+    header = {}
+    for _ in iter_ephemeris_lines(io.StringIO(request_horizons(build_params(object_id, '@500', [utc_time]))), header):
+        break
+    return elements_from_header(header)
+
+def solve_kepler(mean_anomaly, e, tol=1e-14, max_iter=50):
+    """
+    Eccentric anomaly E of elliptic orbits (E - e sin E = M)
+
+    Args:
+        mean_anomaly: Array of mean anomalies (radians)
+        e: Eccentricity (scalar or array), 0 <= e < 1
+
+    Returns:
+        Array of eccentric anomalies (radians, -pi..pi)
+    """
+    m = np.remainder(np.asarray(mean_anomaly, dtype=np.float64) + np.pi, 2.0 * np.pi) - np.pi
+    # Danby's starting value converges for every e < 1
+    anomaly = m + 0.85 * e * np.sign(np.sin(m))
+    for _ in range(max_iter):
+        delta = (anomaly - e * np.sin(anomaly) - m) / (1.0 - e * np.cos(anomaly))
+        anomaly -= delta
+        if np.all(np.abs(delta) < tol):
+            break
+    return anomaly
+
+def solve_hyperbolic_kepler(mean_anomaly, e, tol=1e-14, max_iter=100):
+    """
+    Hyperbolic anomaly H of hyperbolic orbits (e sinh H - H = M)
+
+    Args:
+        mean_anomaly: Array of hyperbolic mean anomalies (radians)
+        e: Eccentricity, e > 1
+
+    Returns:
+        Array of hyperbolic anomalies
+    """
+    m = np.asarray(mean_anomaly, dtype=np.float64)
+    # asinh(M / (e - 1)) lies beyond the root on the same side, where the
+    # function is convex, so Newton steps approach the root monotonically
+    anomaly = np.arcsinh(m / (e - 1.0))
+    for _ in range(max_iter):
+        delta = (e * np.sinh(anomaly) - anomaly - m) / (e * np.cosh(anomaly) - 1.0)
+        anomaly -= delta
+        if np.all(np.abs(delta) <= tol * np.maximum(1.0, np.abs(anomaly))):
+            break
+    return anomaly
+
+def _perifocal_axes(node, peri, inc):
+    """Unit vectors toward perihelion (P) and 90 deg ahead (Q), ecliptic frame"""
+    node, peri, inc = np.radians(node), np.radians(peri), np.radians(inc)
+    cn, sn = np.cos(node), np.sin(node)
+    cw, sw = np.cos(peri), np.sin(peri)
+    ci, si = np.cos(inc), np.sin(inc)
+    p = np.stack([cn * cw - sn * sw * ci, sn * cw + cn * sw * ci, sw * si], axis=-1)
+    q = np.stack([-cn * sw - sn * cw * ci, -sn * sw + cn * cw * ci, cw * si], axis=-1)
+    return p, q
+
+def ecliptic_to_icrf(vectors):
+    """Rotate (..., 3) J2000 ecliptic vectors to the equator (ICRF to ~0.02 arcsec)"""
+    vectors = np.asarray(vectors, dtype=np.float64)
+    c, s = np.cos(OBLIQUITY_J2000), np.sin(OBLIQUITY_J2000)
+    x, y, z = vectors[..., 0], vectors[..., 1], vectors[..., 2]
+    return np.stack([x, c * y - s * z, s * y + c * z], axis=-1)
+
+class TwoBodyOrbit:
+    """
+    Heliocentric conic of one set of osculating elements
+
+    Args:
+        elements: OrbitalElements (see parse_elements / fetch_elements)
+        gm: Gravitational parameter in au^3/day^2
+
+    Usage:
+        orbit = TwoBodyOrbit(parse_elements(response_text))
+        position, velocity = orbit.state(jd_tdb)       # heliocentric ICRF
+        ra, dec, delta = orbit.radec(jd_tdb)           # geocentric astrometric
+    """
+
+    def __init__(self, elements, gm=GM_SUN):
+        self.elements = elements
+        self.gm = gm
+        e, q = elements.e, elements.q
+        self.semi_latus_rectum = q * (1.0 + e)
+        if abs(e - 1.0) < PARABOLIC_TOLERANCE:
+            self.kind = 'parabolic'
+            self.mean_motion = 1.5 * np.sqrt(gm / (2.0 * q ** 3))
+        else:
+            self.kind = 'elliptic' if e < 1.0 else 'hyperbolic'
+            self.semi_major_axis = q / abs(1.0 - e)
+            self.mean_motion = np.sqrt(gm / self.semi_major_axis ** 3)
+        p, q_axis = _perifocal_axes(elements.node, elements.peri, elements.inc)
+        self._p = ecliptic_to_icrf(p)
+        self._q = ecliptic_to_icrf(q_axis)
+
+    def perifocal(self, jd_tdb):
+        """
+        In-plane position at TDB epochs
+
+        Returns:
+            Tuple of arrays (x toward perihelion, y, r) in au
+        """
+        dt = np.asarray(jd_tdb, dtype=np.float64) - self.elements.tp
+        e = self.elements.e
+        if self.kind == 'elliptic':
+            anomaly = solve_kepler(self.mean_motion * dt, e)
+            a = self.semi_major_axis
+            x = a * (np.cos(anomaly) - e)
+            y = a * np.sqrt(1.0 - e * e) * np.sin(anomaly)
+            r = a * (1.0 - e * np.cos(anomaly))
+        elif self.kind == 'hyperbolic':
+            anomaly = solve_hyperbolic_kepler(self.mean_motion * dt, e)
+            a = self.semi_major_axis
+            x = a * (e - np.cosh(anomaly))
+            y = a * np.sqrt(e * e - 1.0) * np.sinh(anomaly)
+            r = a * (e * np.cosh(anomaly) - 1.0)
+        else:
+            # Barker's equation solved in closed form: D = tan(v / 2)
+            w = self.mean_motion * dt
+            root = np.cbrt(w + np.sqrt(w * w + 1.0))
+            d = root - 1.0 / root
+            q = self.elements.q
+            x = q * (1.0 - d * d)
+            y = 2.0 * q * d
+            r = q * (1.0 + d * d)
+        return x, y, r
+
+    def state(self, jd_tdb):
+        """
+        Heliocentric ICRF state at TDB epochs
+
+        Returns:
+            Tuple of ((n, 3) position in au, (n, 3) velocity in au/day)
+        """
+        x, y, r = self.perifocal(np.atleast_1d(jd_tdb))
+        # Valid for every conic: v = sqrt(GM/p) * (-sin(nu), e + cos(nu))
+        h = np.sqrt(self.gm / self.semi_latus_rectum)
+        vx = -h * y / r
+        vy = h * (self.elements.e + x / r)
+        position = x[:, None] * self._p + y[:, None] * self._q
+        velocity = vx[:, None] * self._p + vy[:, None] * self._q
+        return position, velocity
+
+    def position(self, jd_tdb):
+        """Heliocentric ICRF positions (n, 3) in au at TDB epochs"""
+        x, y, _ = self.perifocal(np.atleast_1d(jd_tdb))
+        return x[:, None] * self._p + y[:, None] * self._q
+
+    def radec(self, jd_tdb, observer=None, iterations=2):
+        """
+        Astrometric RA/Dec seen from the geocenter (or an observatory)
+
+        Args:
+            jd_tdb: Array of TDB Julian Dates
+            observer: Optional (n, 3) geocentric ICRF observer positions in au,
+                      e.g. ObservatoryTable.geocentric_positions()
+            iterations: Light-time iterations
+
+        Returns:
+            Tuple of arrays (ra_deg, dec_deg, distance_au)
+        """
+        jd_tdb = np.atleast_1d(np.asarray(jd_tdb, dtype=np.float64))
+        origin = earth_position(jd_tdb)
+        if observer is not None:
+            origin = origin + observer
+
+        # Light time is at most a few hours; the object's position at t - tau
+        # comes from a second-order Taylor step instead of another Kepler solve
+        # (error ~ tau^3 * jerk, far below the two-body model error)
+        position, velocity = self.state(jd_tdb)
+        r = np.sqrt(np.einsum('ij,ij->i', position, position))
+        acceleration = position * (-self.gm / r ** 3)[:, None]
+        geometric = position - origin
+        vector = geometric
+        for _ in range(iterations):
+            tau = (np.sqrt(np.einsum('ij,ij->i', vector, vector)) / C_AU_PER_DAY)[:, None]
+            vector = geometric - tau * (velocity - (0.5 * tau) * acceleration)
+
+        x, y, z = vector[:, 0], vector[:, 1], vector[:, 2]
+        ra = np.degrees(np.arctan2(y, x)) % 360.0
+        dec = np.degrees(np.arctan2(z, np.hypot(x, y)))
+        return ra, dec, np.sqrt(np.einsum('ij,ij->i', vector, vector))
+
+def earth_position(jd_tdb):
+    """
+    Approximate heliocentric ICRF position of the Earth (n, 3) in au
+
+    Uses the Earth-Moon barycenter elements with their secular rates; the
+    error is dominated by the barycenter offset (up to 4,700 km, ~1e-5 au).
+    """
+    t = (np.atleast_1d(np.asarray(jd_tdb, dtype=np.float64)) - J2000) / 36525.0
+    a, e, inc, mean_longitude, perihelion, _ = (
+        value + rate * t for value, rate in _EMB_ELEMENTS)
+    anomaly = solve_kepler(np.radians(mean_longitude - perihelion), e)
+    x = a * (np.cos(anomaly) - e)
+    y = a * np.sqrt(1.0 - e * e) * np.sin(anomaly)
+    # The node is fixed at 0, so the perihelion longitude is the argument of perihelion
+    peri = np.radians(perihelion)
+    inc = np.radians(inc)
+    in_plane = x * np.sin(peri) + y * np.cos(peri)
+    return ecliptic_to_icrf(np.stack([
+        x * np.cos(peri) - y * np.sin(peri), in_plane * np.cos(inc), in_plane * np.sin(inc)], axis=-1))
+
+def _bench(n):
+    """Time geocentric positions of a hyperbolic orbit (C/2025 N1, Solution 44 elements)"""
+    import time
+    orbit = TwoBodyOrbit(OrbitalElements(
+        epoch=2460894.5, e=6.139422831829797, q=1.356418761995381, tp=2460977.982217866,
+        node=322.1566239181344, peri=128.0096924001076, inc=175.1130917268881, solution='JPL#44'))
+    jd_tdb = np.linspace(2460800.5, 2461200.5, n)
+    start = time.perf_counter()
+    orbit.radec(jd_tdb)
+    elapsed = time.perf_counter() - start
+    print(f"Epochs:      {n:,}")
+    print(f"Elapsed:     {elapsed * 1000:.1f} ms (geocentric RA/Dec, light-time corrected)")
+    print(f"Throughput:  {n / elapsed / 1000:,.0f} epochs/ms")
+
+def main():
+    """Approximate RA/Dec of an object from its osculating elements"""
+    args = sys.argv[1:]
+    if args and args[0] == '--bench':
+        _bench(int(args[1]) if len(args) > 1 else 1000000)
+        return
+    if len(args) < 3:
+        print(__doc__.split('Usage:', 1)[1].rstrip())
+        sys.exit(1)
+
+    from jpl_horizons_query import convert_mpc_timestamp
+    from sexagesimal import degrees_to_dms, degrees_to_hms
+    from time_scales import mpc_to_utc, utc_to_tdb_split
+    from topocentric import OBSERVATORIES
+
+    object_id, code, timestamps = args[0], args[1].lstrip('@'), args[2:]
+    try:
+        elements = fetch_elements(object_id, convert_mpc_timestamp(timestamps[0]))
+        jd1, jd2 = mpc_to_utc(timestamps)
+        jd_tdb = np.add(*utc_to_tdb_split(jd1, jd2))
+        observer = OBSERVATORIES.geocentric_positions([code] * len(timestamps), jd1 + jd2, jd_tdb)
+        ra, dec, distance = TwoBodyOrbit(elements).radec(jd_tdb, observer)
+    except Exception as e:
+        print(f"ERROR: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+    print("="*70)
+    print("TWO-BODY EPHEMERIS (approximate)")
+    print("="*70)
+    print()
+    if elements.solution:
+        print(f"Solution:     {elements.solution}")
+    print(f"Elements:     e={elements.e:.6f} q={elements.q:.6f} au i={elements.inc:.4f} deg "
+          f"(TP JD {elements.tp:.5f})")
+    print()
+    print(f"{'MPC Time':<20} {'RA (ICRF)':<16} {'DEC (ICRF)':<16} {'Delta (AU)':<12}")
+    print("-"*70)
+    for timestamp, ra_text, dec_text, delta in zip(
+            timestamps, degrees_to_hms(ra, sep=' '), degrees_to_dms(dec, sep=' '), distance):
+        print(f"{timestamp:<20} {ra_text:<16} {dec_text:<16} {delta:<12.6f}")
+    print("="*70)
+
+if __name__ == '__main__':
+    main()